@@ -2,8 +2,12 @@ import os
 import sys
 import re
 import string
+import time
+import atexit
+import StringIO
 import cPickle as pickle
 import SCons.Script
+import SCons.Action
 import SCons.Node.FS
 
 import model
@@ -31,6 +35,22 @@ def modify_path_ba(moduleList, path):
     TMP_BSC_DIR = moduleList.env['DEFS']['TMP_BSC_DIR']
     return  moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + '/'.join(array) + '/' + TMP_BSC_DIR + '/' + file
 
+##
+## con_size_bsh --
+##   The connection size header of a synthesis boundary, computed from the
+##   dangling connections in its log.
+##
+def con_size_bsh(moduleName, logfiles):
+    liGraph = LIGraph(li_module.parseLogfiles(logfiles))
+    # Should have only one module...
+    if(len(liGraph.modules) == 0):
+        bshModule = LIModule(moduleName, moduleName)
+    else:
+        bshModule = liGraph.modules.values()[0]
+    bsh_handle = StringIO.StringIO()
+    wrapper_gen_tool.generateConnectionBSH(bshModule, bsh_handle)
+    return bsh_handle.getvalue()
+
 def getUserModules(liGraph):
     if(liGraph is None):
         return []
@@ -41,12 +61,43 @@ def getPlatformModules(liGraph):
         return []
     return [module for module in liGraph.modules.values() if not ((module.getAttribute('PLATFORM_MODULE') is None))]
 
+##
+## count_nodes --
+##   Count the nodes SCons knows about (files and directories), those
+##   built by a builder and the distinct executors (builder calls)
+##   building them.  Count them before the build:  SCons releases the
+##   executors of the nodes it builds.
+##
+def count_nodes(env):
+    nodes = 0
+    built = 0
+    executors = set()
+
+    pending = [env.fs.Top.root]
+    seen = set(pending)
+    while pending:
+        node = pending.pop()
+        nodes += 1
+        if (node.has_builder()):
+            built += 1
+            executor = getattr(node, 'executor', None)
+            if (executor is not None):
+                executors.add(id(executor))
+        for (name, entry) in getattr(node, 'entries', {}).iteritems():
+            if (name not in ('.', '..') and not entry in seen):
+                seen.add(entry)
+                pending.append(entry)
+
+    return (nodes, built, len(executors))
+
 #this might be better implemented as a 'Node' in scons, but
 #I want to get something working before exploring that path
 # This is going to recursively build all the bsvs
 class BSV():
 
     def __init__(self, moduleList):
+        self.start_time = time.time()
+
         # some definitions used during the bsv compilation process
         env = moduleList.env
         self.moduleList = moduleList
@@ -93,9 +144,32 @@ class BSV():
         self.TMP_BSC_DIR = moduleList.env['DEFS']['TMP_BSC_DIR']
         self.BUILD_LOGS_ONLY = moduleList.getAWBParam('bsv_tool', 'BUILD_LOGS_ONLY')
         self.USE_BVI = moduleList.getAWBParam('bsv_tool', 'USE_BVI')
+        self.BSV_IFC_JSON = moduleList.getAWBParam('bsv_tool', 'BSV_IFC_JSON')
+        self.BSV_NODE_REPORT = moduleList.getAWBParam('bsv_tool', 'BSV_NODE_REPORT')
+
+        ## Compile synthesis boundaries without the log-only pass when the
+        ## connection sizes of the previous build still hold.  See
+        ## speculative_build().
+        self.SPECULATE_CON_SIZES = moduleList.getAWBParam('bsv_tool', 'SPECULATE_CON_SIZES')
+        self.speculation = {'hit': 0, 'miss': 0, 'cold': 0}
+        if (self.SPECULATE_CON_SIZES):
+            atexit.register(self.print_speculation_report)
+
+        ## Introspection of compiled wrappers (BUILD_LOGS_ONLY).  Out of
+        ## date targets of all modules are built by a single action.
+        ## Only they ($CHANGED_TARGETS) are removed before it runs.
+        bsv_introspect = env.Builder(action = SCons.Action.Action(self.introspect_batch,
+                                                                  'Introspecting $CHANGED_TARGETS',
+                                                                  batch_key = True,
+                                                                  targets = '$CHANGED_TARGETS'))
+        env.Append(BUILDERS = {'BSV_INTROSPECT' : bsv_introspect})
 
         self.pipeline_debug = model.getBuildPipelineDebug(moduleList)
 
+        ## Intra-Bluespec file dependence, computed by the depends-init
+        ## build and loaded by the normal build.
+        self.bsvDepends = bsv_tool.BSVDependenceDB(self.TMP_BSC_DIR, self.ALL_LIB_DIR_PATHS)
+
         # Should we be building in events?
         if (model.getEvents(moduleList) == 0):
             bsc_events_flag = ' -D HASIM_EVENTS_ENABLED=False '
@@ -142,6 +216,8 @@ class BSV():
             ## code generation.  If the first pass li graph exists, it
             ## subsumes awb-style synthesis boundary generation.
             ##
+            self.setup_module_build(moduleList)
+
             for module in topo:
                 self.build_synth_boundary(moduleList, module)
 
@@ -198,7 +274,7 @@ class BSV():
             ##
             ## Dependence build.  The target of this build is "depens-init".  No
             ## Bluespec modules will be compiled in this invocation of SCons.
-            ## Only .depends-bsv files will be produced.
+            ## Only the Bluespec dependence database will be produced.
             ##
 
             # We need to calculate some dependencies for the build
@@ -252,8 +328,6 @@ class BSV():
                 topo.append(tree_module)
 
 
-            deps = []
-
             useDerived = True
             first_pass_LI_graph = wrapper_gen_tool.getFirstPassLIGraph()
             if (not first_pass_LI_graph is None):
@@ -261,7 +335,7 @@ class BSV():
                 # we also need to parse the platform_synth file in th
                 platform_synth = get_build_path(moduleList, moduleList.topModule) + "/" +  moduleList.localPlatformName + "_platform_synth.bsv"
                 platform_deps = ".depends-platform"
-                deps += self.compute_dependence(moduleList, moduleList.topModule, useDerived, fileName=platform_deps, targetFiles=[platform_synth])
+                self.compute_dependence(moduleList, moduleList.topModule, useDerived, fileName=platform_deps, targetFiles=[platform_synth])
 
                 # If we have an LI graph, we need to construct and compile
                 # several LI wrappers.  do that here.
@@ -281,18 +355,29 @@ class BSV():
                     wrapper_gen_tool.generateBAImport(module, wrapper_import_handle)
                     wrapper_import_handle.close()
                     platform_deps = ".depends-" + module.name
-                    deps += self.compute_dependence(moduleList, moduleList.topModule, useDerived, fileName=platform_deps, targetFiles=[wrapper_import_path])
+                    self.compute_dependence(moduleList, moduleList.topModule, useDerived, fileName=platform_deps, targetFiles=[wrapper_import_path])
         
             for module in topo + [moduleList.topModule]:
                 # for object import builds no Wrapper code will be included. remove it.
-                deps += self.compute_dependence(moduleList, module, useDerived, fileName=module.dependsFile)
+                self.compute_dependence(moduleList, module, useDerived, fileName=module.dependsFile)
 
-            moduleList.topDependsInit += deps
+            # One rule computes the dependence of all modules.
+            moduleList.topDependsInit += self.bsvDepends.rule(moduleList,
+                                                              moduleList.topModule.moduleDependency['IFACE_HEADERS'])
+
+        ## Size of the SCons graph and time spent declaring and walking it.
+        self.rules_time = time.time()
+        if (self.BSV_NODE_REPORT):
+            self.node_counts = count_nodes(moduleList.env)
+            atexit.register(self.print_node_report)
 
 
     ##
     ## compute_dependence --
-    ##   Build rules for computing intra-Bluespec file dependence.
+    ##   Note the intra-Bluespec file dependence to compute for a module.
+    ##   The dependence is stored in the Bluespec dependence database
+    ##   (see BSVDepends.py) under the name of the module's dependence
+    ##   file (fileName).
     ##
     def compute_dependence(self, moduleList, module, useDerived, fileName='.depends-bsv', targetFiles=[]):
         MODULE_PATH =  get_build_path(moduleList, module)
@@ -313,59 +398,19 @@ class BSV():
                 SURROGATE_BSVS += moduleList.env['DEFS']['ROOT_DIR_HW'] + '/' + child.buildPath +'/' + child.name + '.bsv '
 
         if (useDerived and SURROGATE_BSVS != ''):
-            DERIVED = ' -derived "' + SURROGATE_BSVS + '"'
+            DERIVED = SURROGATE_BSVS
         else:
             DERIVED = ''
 
-        depends_bsv = MODULE_PATH + '/' + fileName
-        moduleList.env.NoCache(depends_bsv)
-        compile_deps = 'leap-bsc-mkdepend -ignore ' + MODULE_PATH + '/.ignore' + ' -bdir ' + self.TMP_BSC_DIR + DERIVED + ' -p +:' + self.ALL_LIB_DIR_PATHS + ' ' + ' '.join(targetFiles) + ' > ' + depends_bsv
-
-        # Delete depends_bsv if it is empty under the assumption that something
-        # went wrong when creating it.  An empty dependence file would never be
-        # rebuilt without this.
-        try:
-            if (os.path.getsize(depends_bsv) == 0):
-                os.unlink(depends_bsv)
-        except:
-            None
-
-        dep = moduleList.env.Command(depends_bsv,
-                                     targetFiles +
-                                     moduleList.topModule.moduleDependency['IFACE_HEADERS'],
-                                     compile_deps)
-
-        # Load an old .depends-bsv file if it exists.  The file describes
-        # the previous dependence among Bluespec files, giving a clue of whether
-        # anything changed.  The file describes dependence between derived objects
-        # and sources.  Here, we need to know about all possible source changes.
-        # Scan the file looking for source file names.
-        if os.path.isfile(depends_bsv):
-            df = open(depends_bsv, 'r')
-            dep_lines = df.readlines()
-
-            # Match .bsv and .bsh files
-            bsv_file_pattern = re.compile('\S+.[bB][sS][vVhH]$')
-
-            all_bsc_files = []
-            for ln in dep_lines:
-                all_bsc_files += [f for f in re.split('[:\s]+', ln) if (bsv_file_pattern.match(f))]
-
-            # Sort dependence in case SCons cares
-            for f in sorted(all_bsc_files):
-                if os.path.exists(f):
-                    moduleList.env.Depends(dep, f)
-
-            df.close()
-
-        return dep
+        self.bsvDepends.addSection(MODULE_PATH + '/' + fileName, targetFiles, DERIVED,
+                                   MODULE_PATH + '/.ignore')
 
 
     ##
     ## build_synth_boundary --
     ##   Build rules for generating a single synthesis boundary.  This function
     ##   may only be run after inter-Bluespec file dependence has been computed
-    ##   and written to dependence files.  This requirement is met by running
+    ##   and written to the dependence database.  This requirement is met by running
     ##   a separate instance of SCons first that uses compute_dependence() above.
     ##
     def build_synth_boundary(self, moduleList, module):
@@ -385,14 +430,9 @@ class BSV():
         ## Load intra-Bluespec dependence already computed.  This information will
         ## ultimately drive the building of Bluespec modules.
         ##
-        env.ParseDepends(MODULE_PATH + '/' + module.dependsFile,
-                         must_exist = not moduleList.env.GetOption('clean'))
-
+        self.bsvDepends.parseDepends(env, MODULE_PATH + '/' + module.dependsFile,
+                                     must_exist = not moduleList.env.GetOption('clean'))
 
-        # This function is responsible for creating build rules for
-        # subdirectories.  It must be called or no subdirectory builds
-        # will happen since scons won't have the recipe.
-        self.setup_module_build(moduleList, MODULE_PATH)
 
         if not os.path.isdir(self.TMP_BSC_DIR):
             os.mkdir(self.TMP_BSC_DIR)
@@ -432,56 +472,84 @@ class BSV():
             ##
             logfile = model.get_logfile(moduleList, module)
             module.moduleDependency['BSV_LOG'] += [logfile]
+            # The log's index of dangling connections (see liLog.py).
+            env.Clean(logfile, li_module.logIndexPath(logfile))
             module.moduleDependency['GEN_LOGS'] = [logfile]
             if (module.name != moduleList.topModule.name):
-                log = env.BSC_LOG_ONLY(logfile, MODULE_PATH + '/' + bsv.replace('Wrapper.bsv', 'Log'))
+                stub_name = bsv.replace('.bsv', '_con_size.bsh')
 
-                ##
-                ## Parse the log, generate a stub file
-                ##
+                if (self.SPECULATE_CON_SIZES):
+                    ## The connection size stub is built along with the
+                    ## wrapper by the speculative build below.
+                    stub = MODULE_PATH + '/' + stub_name
+                else:
+                    log = env.BSC_LOG_ONLY(logfile, MODULE_PATH + '/' + bsv.replace('Wrapper.bsv', 'Log'))
 
-                stub_name = bsv.replace('.bsv', '_con_size.bsh')
+                    ##
+                    ## Parse the log, generate a stub file
+                    ##
 
-                def build_con_size_bsh_closure(target, source, env):
-                    liGraph = LIGraph(li_module.parseLogfiles(source))
-                    # Should have only one module...
-                    if(len(liGraph.modules) == 0):
-                        bshModule = LIModule(module.name, module.name)
-                    else:
-                        bshModule = liGraph.modules.values()[0]
-                    bsh_handle = open(str(target[0]), 'w')
-                    wrapper_gen_tool.generateConnectionBSH(bshModule, bsh_handle)
-                    bsh_handle.close()
+                    def build_con_size_bsh_closure(target, source, env):
+                        bsh_handle = open(str(target[0]), 'w')
+                        bsh_handle.write(con_size_bsh(module.name, source))
+                        bsh_handle.close()
+
+                    stub = env.Command(MODULE_PATH + '/' + stub_name, log, build_con_size_bsh_closure)
+
+            ##
+            ## The compiler writes the mk_<wrapper>.v file, this synth
+            ## boundary's GEN_VS, the .ba file and global strings (.str)
+            ## along with the binary.  They are noted as targets of the
+            ## compilation itself, so that each compilation is one group of
+            ## nodes in the SCons graph.
+            ##
+            wrapper_base = MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + bsv.replace('.bsv', '')
+
+            ext_gen_v = []
+            for v in moduleList.getSynthBoundaryDependencies(module, 'GEN_VS'):
+                ext_gen_v += [MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + v]
 
-                stub = env.Command(MODULE_PATH + '/' + stub_name, log, build_con_size_bsh_closure)
+            bld_v_files = [MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + module.wrapperName() + '.v'] + ext_gen_v
+            bld_ba_file = MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + module.wrapperName() + '.ba'
+            glob_str_file = wrapper_base + '.str'
+            wrapper_targets = [wrapper_base] + bld_v_files + [bld_ba_file, glob_str_file]
 
             ##
             ## Now we are ready for the real build
             ##
             if (module.name != moduleList.topModule.name):
-                wrapper_bo = env.BSC(MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + bsv.replace('.bsv', ''), MODULE_PATH + '/' + bsv)
-                moduleList.env.Depends(wrapper_bo, stub)
+                if (self.SPECULATE_CON_SIZES):
+                    wrapper_out = env.BSC_SPECULATIVE(wrapper_targets,
+                                                      [MODULE_PATH + '/' + bsv,
+                                                       MODULE_PATH + '/' + bsv.replace('Wrapper.bsv', 'Log.bsv')])
+                else:
+                    wrapper_out = env.BSC(wrapper_targets, MODULE_PATH + '/' + bsv)
+                    moduleList.env.Depends(wrapper_out, stub)
+
+                # The binary and the targets the builder's emitter adds.
+                wrapper_bo = wrapper_out[:1] + wrapper_out[len(wrapper_targets):]
                 module.moduleDependency['BO'] = [wrapper_bo]
                 if (self.BUILD_LOGS_ONLY):
-                    model_dir = self.hw_dir.Dir(moduleList.env['DEFS']['ROOT_DIR_MODEL'])
+                    ## Schedule, path and interface introspection of the
+                    ## compiled wrapper.  Requests of all modules are
+                    ## batched into one bluetcl session (see introspect_batch).
+                    introspect_base = MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + module.wrapperName()
 
                     module.moduleDependency['BSV_SCHED'] = \
-                        [moduleList.env.Command(MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + module.wrapperName() + '.ba.sched',
-                                                wrapper_bo,
-                                                'bluetcl ' + model_dir.File('sched.tcl').path + ' -p ' + self.ALL_BUILD_DIR_PATHS + ' --m ' + module.wrapperName() + ' > $TARGET')]
+                        env.BSV_INTROSPECT(introspect_base + '.ba.sched', wrapper_bo[0])
 
                     module.moduleDependency['BSV_PATH'] = \
-                        [moduleList.env.Command(MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + module.wrapperName() + '.ba.path',
-                                                wrapper_bo,
-                                                'bluetcl ' + model_dir.File('path.tcl').path + ' -p ' + self.ALL_BUILD_DIR_PATHS + ' --m ' + module.wrapperName() + ' > $TARGET')]
+                        env.BSV_INTROSPECT(introspect_base + '.ba.path', wrapper_bo[0])
 
                     moduleList.topDependency += \
                         module.moduleDependency['BSV_SCHED'] + module.moduleDependency['BSV_PATH']
 
+                    ifc_targets = [introspect_base + '.ba.ifc']
+                    if (self.BSV_IFC_JSON):
+                        ifc_targets += [introspect_base + '.ba.ifc.json']
+
                     module.moduleDependency['BSV_IFC'] = \
-                        [moduleList.env.Command(MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + module.wrapperName() + '.ba.ifc',
-                                                wrapper_bo,
-                                                'bluetcl ' + model_dir.File('interfaceType.tcl').path + ' -p ' + self.ALL_BUILD_DIR_PATHS + ' --m ' + module.wrapperName() + ' | python site_scons/model/PythonTidy.py > $TARGET')]
+                        env.BSV_INTROSPECT(ifc_targets, wrapper_bo[0])
 
                     moduleList.topDependency += module.moduleDependency['BSV_IFC']
 
@@ -491,8 +559,8 @@ class BSV():
             else:
                 ## Top level build can generate the log in a single pass since no
                 ## connections are exposed
-                wrapper_bo = env.BSC_LOG(MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + bsv.replace('.bsv', ''),
-                                         MODULE_PATH + '/' + bsv)
+                wrapper_out = env.BSC_LOG(wrapper_targets, MODULE_PATH + '/' + bsv)
+                wrapper_bo = wrapper_out[:1] + wrapper_out[len(wrapper_targets):]
 
                 ## SCons doesn't deal well with logfile as a 2nd target to BSC_LOG rule,
                 ## failing to derive dependence correctly.
@@ -509,9 +577,7 @@ class BSV():
             ##
             ## Meta-data written during compilation to separate files.
             ##
-            glob_str = env.Command(MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + bsv.replace('.bsv', '.str'),
-                                   wrapper_bo,
-                                   '')
+            glob_str = env.File(glob_str_file)
 
             env.Precious(glob_str)
             module.moduleDependency['STR'] = [glob_str]
@@ -553,22 +619,11 @@ class BSV():
                             build_synth_stub)
 
             ##
-            ## The mk_<wrapper>.v file is really built by the Wrapper() builder
-            ## above.  We use NULL commands to convince SCons the file is generated.
-            ## This seems easier than SCons SideEffect() calls, which don't clean
-            ## targets.
-            ##
-            ## We also generate all this synth boundary's GEN_VS
+            ## The mk_<wrapper>.v file and this synth boundary's GEN_VS are
+            ## targets of the wrapper build above.  (They used to be targets of
+            ## NULL commands depending on the binary.)
             ##
-            ext_gen_v = []
-            for v in moduleList.getSynthBoundaryDependencies(module, 'GEN_VS'):
-                ext_gen_v += [MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + v]
-
-
-            # Add the dependence for all Verilog noted above
-            bld_v = env.Command([MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + module.wrapperName() + '.v'] + ext_gen_v,
-                                MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + bsv.replace('.bsv', '.bo'),
-                                '')
+            bld_v = [env.File(v) for v in bld_v_files]
             env.Precious(bld_v)
 
             if (moduleList.getAWBParam('bsv_tool', 'BUILD_VERILOG') == 1):
@@ -581,9 +636,7 @@ class BSV():
                 print "Name: " + module.name
 
             # each synth boundary will produce a ba
-            bld_ba = [env.Command([MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' +  module.wrapperName() + '.ba'],
-                                  MODULE_PATH + '/' + self.TMP_BSC_DIR + '/' + bsv.replace('.bsv', '.bo'),
-                                  '')]
+            bld_ba = [env.File(bld_ba_file)]
 
             module.moduleDependency['BA'] += bld_ba
             env.Precious(bld_ba)
@@ -697,8 +750,18 @@ class BSV():
                ' -fdir ' + bdir_path
 
 
-    def compile_bo(self, module_path):
+    ##
+    ## target_module_path --
+    ##   The build path of the module a compilation belongs to.  Compiler
+    ##   targets are written to the module's TMP_BSC_DIR.
+    ##
+    def target_module_path(self, target):
+        return target[0].get_dir().up().path
+
+
+    def compile_bo(self):
         def compile_bo_closure(source, target, env, for_signature):
+            module_path = self.target_module_path(target)
             cmd = ''
 
             if (str(source[0]) != get_build_path(self.moduleList, self.moduleList.topModule) + '/' + self.moduleList.topModule.name + '.bsv'):
@@ -713,8 +776,9 @@ class BSV():
     ## connections and to generate the global string table.
     ## Kill compilation as soon as all the log data is generated, since
     ## no binary is needed.
-    def compile_log_only(self, module_path):
+    def compile_log_only(self):
         def compile_log_only_closure(source, target, env, for_signature):
+            module_path = self.target_module_path(target)
             cmd = self.compile_bo_bsc_base(target, module_path) + ' -KILLexpanded ' + str(source[0]) + \
                   ' 2>&1 | tee ' + str(target[0]) + ' ; test $${PIPESTATUS[0]} -eq 0'
             return cmd
@@ -722,14 +786,215 @@ class BSV():
 
 
     ## Builder for generating a binary and a log file.
-    def compile_bo_log(self, module_path):
+    def compile_bo_log(self):
         def compile_bo_log_closure(source, target, env, for_signature):
+            module_path = self.target_module_path(target)
             cmd = self.compile_bo_bsc_base(target, module_path) + ' -D CONNECTION_SIZES_KNOWN ' + str(source[0]) + \
                   ' 2>&1 | tee ' + str(target[0]).replace('.bo', '.log') + ' ; test $${PIPESTATUS[0]} -eq 0'
             return cmd
         return compile_bo_log_closure
 
 
+    ## Builder for compiling a synthesis boundary wrapper speculatively.
+    ## Sources are the wrapper and the log pass source (_Log.bsv).  Along
+    ## with the binary the builder produces the log file and the
+    ## connection size header, which are otherwise built by separate
+    ## BSC_LOG_ONLY and header rules.  For signatures the generator returns
+    ## both compiler commands, so flag changes still force a rebuild.
+    def compile_bo_speculative(self):
+        def compile_bo_speculative_closure(source, target, env, for_signature):
+            module_path = self.target_module_path(target)
+            if (for_signature):
+                return self.compile_bo_bsc_base(target, module_path) + ' -D CONNECTION_SIZES_KNOWN ' + str(source[0]) + \
+                       ' ; ' + self.compile_bo_bsc_base(target, module_path) + ' -KILLexpanded ' + str(source[1])
+
+            def speculative_build_closure(target, source, env):
+                return self.speculative_build(module_path, target, source, env)
+            return SCons.Action.Action(speculative_build_closure, 'Compiling (speculative connection sizes) $TARGET')
+        return compile_bo_speculative_closure
+
+
+    def emitter_bo_speculative(self):
+        emitter = self.emitter_bo()
+        def emitter_bo_speculative_closure(target, source, env):
+            target, source = emitter(target, source, env)
+            bo = str(target[0])
+            target.append(bo.replace('.bo', '.log'))
+            target.append(os.path.dirname(os.path.dirname(bo)) + '/' + os.path.basename(bo).replace('.bo', '_con_size.bsh'))
+            ## SCons removes targets before building them.  The log and
+            ## the header of the previous build are the assumption of the
+            ## next one, so they must survive until the build reads them.
+            env.Precious(target[-2:])
+            return target, source
+        return emitter_bo_speculative_closure
+
+
+    ##
+    ## speculative_build --
+    ##   Build a synthesis boundary wrapper, its log and its connection size
+    ##   header, skipping the log-only compiler pass when possible.
+    ##
+    ##   The usual build runs the compiler twice:  a log-only pass (the
+    ##   _Log.bsv source, with oversized connection vectors) whose dangling
+    ##   connection messages size the header, then the real compilation
+    ##   including the header.  The connections of a boundary rarely
+    ##   change, so the real compilation is run first, assuming the header
+    ##   and the connections of the previous build.  Its log lists the
+    ##   dangling connections, too.  If they are the connections assumed,
+    ##   and so produce the same header, the build is complete.  Otherwise
+    ##   (or if the compilation fails, or there is no previous build) the
+    ##   usual two passes run.
+    ##
+    def speculative_build(self, module_path, target, source, env):
+        bo = str(target[0])
+        logfile = bo.replace('.bo', '.log')
+        bsh = os.path.dirname(os.path.dirname(bo)) + '/' + os.path.basename(bo).replace('.bo', '_con_size.bsh')
+        moduleName = os.path.basename(bsh).replace('_Wrapper_con_size.bsh', '')
+
+        compile_cmd = self.compile_bo_bsc_base([target[0]], module_path) + ' -D CONNECTION_SIZES_KNOWN ' + str(source[0])
+
+        if (os.path.exists(logfile) and os.path.exists(bsh)):
+            assumed = li_module.indexLogfile(logfile)['connections']
+
+            bsh_handle = open(bsh, 'r')
+            assumed_bsh = bsh_handle.read()
+            bsh_handle.close()
+
+            speculative_log = logfile + '.speculative'
+            ## Commands are passed as actions.  env.Execute() substitutes
+            ## strings before the action does, which would expand
+            ## $${PIPESTATUS[0]} twice.
+            status = env.Execute(SCons.Action.Action(compile_cmd + ' 2>&1 | tee ' + speculative_log +
+                                                     ' ; test $${PIPESTATUS[0]} -eq 0'))
+            if ((status == 0) and
+                (sorted(li_module.indexLogfile(speculative_log)['connections']) == sorted(assumed)) and
+                (con_size_bsh(moduleName, [speculative_log]) == assumed_bsh)):
+                os.rename(speculative_log, logfile)
+                os.rename(li_module.logIndexPath(speculative_log), li_module.logIndexPath(logfile))
+                self.speculation['hit'] += 1
+                return 0
+
+            for f in [speculative_log, li_module.logIndexPath(speculative_log)]:
+                if (os.path.exists(f)):
+                    os.unlink(f)
+            print 'Connections of ' + moduleName + ' changed.  Rebuilding with the log pass.'
+            self.speculation['miss'] += 1
+        else:
+            self.speculation['cold'] += 1
+
+        status = env.Execute(SCons.Action.Action(self.compile_bo_bsc_base([self.moduleList.env.File(logfile)], module_path) +
+                                                 ' -KILLexpanded ' + str(source[1]) +
+                                                 ' 2>&1 | tee ' + logfile + ' ; test $${PIPESTATUS[0]} -eq 0'))
+        if (status != 0):
+            return status
+
+        bsh_handle = open(bsh, 'w')
+        bsh_handle.write(con_size_bsh(moduleName, [logfile]))
+        bsh_handle.close()
+
+        return env.Execute(SCons.Action.Action(compile_cmd))
+
+
+    def print_speculation_report(self):
+        print 'Connection size speculation: ' + str(self.speculation['hit']) + ' compiled once, ' + \
+              str(self.speculation['miss']) + ' rebuilt after a connection change, ' + \
+              str(self.speculation['cold']) + ' without a previous build'
+
+
+    ##
+    ## print_node_report --
+    ##   Report the graph counted by count_nodes() once the Bluespec rules
+    ##   were declared, the time spent declaring them and, from then to the
+    ##   end of the run, in the rest of the pipeline and in the build
+    ##   itself.  During a null build the latter is mostly SCons walking
+    ##   the graph and checking signatures.
+    ##
+    def print_node_report(self):
+        (nodes, built, executors) = self.node_counts
+        end_time = time.time()
+        print 'SCons graph: ' + str(nodes) + ' nodes, ' + str(built) + ' built by ' + \
+              str(executors) + ' builder calls'
+        print 'Bluespec rules declared in %.2fs, %.2fs from then to the end of the build' % \
+              (self.rules_time - self.start_time, end_time - self.rules_time)
+
+
+    ##
+    ## introspect_batch --
+    ##   Build .ba.sched, .ba.path and .ba.ifc introspection targets, as
+    ##   sched.tcl, path.tcl and interfaceType.tcl (reformatted by
+    ##   PythonTidy) would.  All requests are answered by one bluetcl
+    ##   session running introspect.tcl.  Interface descriptions are then
+    ##   formatted here (see BSVInterfaceDump.py), along with their JSON
+    ##   descriptions (.ba.ifc.json) when those are targets, too.
+    ##   introspectCheck.py compares the results with those of the
+    ##   per-module scripts.
+    ##
+    def introspect_batch(self, target, source, env):
+        model_dir = self.hw_dir.Dir(self.moduleList.env['DEFS']['ROOT_DIR_MODEL'])
+
+        ## The action is handed the targets of every builder call in the
+        ## batch, up to date or not.  Request those of out of date calls
+        ## only.
+        changed = set([str(t) for t in target[0].get_executor().get_action_targets()])
+
+        requests = []
+        json_targets = set()
+        for t in target:
+            if (not str(t) in changed):
+                continue
+            (base, analysis) = os.path.splitext(str(t))
+            if (analysis == '.json'):
+                # Written along with the .ifc target it describes.
+                json_targets.add(str(t))
+                continue
+            requests.append((os.path.basename(os.path.splitext(base)[0]), analysis[1:], str(t)))
+
+        request_file = self.TMP_BSC_DIR + '/introspect.requests'
+        request_handle = open(request_file, 'w')
+        for request in requests:
+            request_handle.write(' '.join(request) + '\n')
+        request_handle.close()
+
+        status = env.Execute('bluetcl ' + model_dir.File('introspect.tcl').path +
+                             ' -p ' + self.ALL_BUILD_DIR_PATHS + ' --batch ' + request_file)
+        if (status != 0):
+            return status
+
+        for (wrapper, analysis, output) in requests:
+            if (analysis == 'ifc'):
+                ifc_handle = open(output, 'r')
+                ifc = ifc_handle.read()
+                ifc_handle.close()
+
+                try:
+                    tidy = bsv_tool.formatInterfaceDump(ifc)
+                except bsv_tool.InterfaceDumpError:
+                    # Not a plain dump.  Let PythonTidy have a go at it.
+                    tidy_handle = StringIO.StringIO()
+                    try:
+                        model.tidy_up(StringIO.StringIO(ifc), tidy_handle)
+                    except Exception, e:
+                        print 'Failed to format the interface of ' + wrapper + ': ' + str(e)
+                        return 1
+                    tidy = tidy_handle.getvalue()
+
+                ifc_handle = open(output, 'w')
+                ifc_handle.write(tidy)
+                ifc_handle.close()
+
+                if (output + '.json' in json_targets):
+                    json_handle = open(output + '.json', 'w')
+                    try:
+                        json_handle.write(bsv_tool.interfaceDumpJSON(ifc))
+                    except bsv_tool.InterfaceDumpError, e:
+                        print 'Failed to describe the interface of ' + wrapper + ' as JSON: ' + str(e)
+                        return 1
+                    finally:
+                        json_handle.close()
+
+        return 0
+
+
     def stubGenCommand(self, module_path, boundaryName, deps):
         wrapperBase = module_path + '/' + self.TMP_BSC_DIR + '/mk_' + boundaryName + '_Wrapper'
         return self.moduleList.env.Command(wrapperBase + '_stub.v',
@@ -737,19 +1002,22 @@ class BSV():
                                            'leap-gen-black-box -nohash ' + wrapperBase + '.v > ' + wrapperBase + '_stub.v')
 
 
-    ## This function binds the Builder objects for a given module and inserts them into the
-    ## SCons environment.  One wonders if inserting them into the environment is necessary.
-    def setup_module_build(self, moduleList, module_path):
-        ## create builders for this particular module.  To do this, we bind module_path local
-        ## to this module
-        bsc = moduleList.env.Builder(generator = self.compile_bo(module_path), suffix = '.bo', src_suffix = '.bsv',
+    ## This function binds the Builder objects for compiling modules and inserts them into
+    ## the SCons environment.  The builders serve all synthesis boundaries (the module path
+    ## of a build is found from its target), so they are bound once per environment.
+    def setup_module_build(self, moduleList):
+        bsc = moduleList.env.Builder(generator = self.compile_bo(), suffix = '.bo', src_suffix = '.bsv',
                                      emitter = self.emitter_bo())
 
-        bsc_log = moduleList.env.Builder(generator = self.compile_bo_log(module_path), suffix = '.bo', src_suffix = '.bsv')
+        bsc_log = moduleList.env.Builder(generator = self.compile_bo_log(), suffix = '.bo', src_suffix = '.bsv')
 
         # This guy has to depend on children existing?
         # and requires a bash shell
         moduleList.env['SHELL'] = 'bash' # coerce commands to be spanwed under bash
-        bsc_log_only = moduleList.env.Builder(generator = self.compile_log_only(module_path), suffix = '.log', src_suffix = '.bsv')
+        bsc_log_only = moduleList.env.Builder(generator = self.compile_log_only(), suffix = '.log', src_suffix = '.bsv')
+
+        bsc_speculative = moduleList.env.Builder(generator = self.compile_bo_speculative(), suffix = '.bo', src_suffix = '.bsv',
+                                                 emitter = self.emitter_bo_speculative())
 
-        moduleList.env.Append(BUILDERS = {'BSC' : bsc, 'BSC_LOG' : bsc_log, 'BSC_LOG_ONLY' : bsc_log_only})
+        moduleList.env.Append(BUILDERS = {'BSC' : bsc, 'BSC_LOG' : bsc_log, 'BSC_LOG_ONLY' : bsc_log_only,
+                                          'BSC_SPECULATIVE' : bsc_speculative})
@@ -0,0 +1,653 @@
+##
+## Bluespec dependence --
+##
+## The depends-init build used to run leap-bsc-mkdepend once per module.
+## Each run preprocessed (one ivlpp or bsc -E process per file) and scanned
+## the same shared library packages again.  The scanner below computes the
+## same dependence in-process:
+##
+##   - Each Bluespec file is preprocessed and scanned once per build, no
+##     matter how many modules import it.  Scans are kept in a database
+##     across builds and reused as long as the file and its includes have
+##     the same contents (by MD5) and the includes still resolve to the
+##     same files.
+##
+##   - The dependence of all modules is written to a single database in
+##     the build directory (BSV_DEPENDS_DB) instead of one .depends-*
+##     file per module.  Sections of the database are still named by the
+##     .depends-* paths, and parseDepends() replaces env.ParseDepends()
+##     for them.
+##
+## Preprocessing follows ivlpp, the preprocessor leap-bsc-mkdepend used
+## when iverilog is available:  `define, `undef, `ifdef, `ifndef, `elsif,
+## `else, `endif and `include directives at the start of a line are
+## honored.  Includes are searched for in the Bluespec search path only and
+## a missing include ends the preprocessing of the file, as in ivlpp.
+## Macros are not expanded.  Imports are then found in the preprocessed
+## text exactly as leap-bsc-mkdepend finds them, and the rules emitted for
+## a section are the rules leap-bsc-mkdepend emitted for the module.
+##
+
+import os
+import sys
+import re
+import time
+import errno
+import hashlib
+import cPickle as pickle
+
+import model
+
+BSV_DEPENDS_DB = '.depends-bsv-db'
+
+BSV_DEPENDS_DB_VERSION = 1
+
+
+class BSVDependenceError(Exception):
+    def __init__(self, arg):
+        self.msg = arg
+
+    def __str__(self):
+        return self.msg
+
+
+##
+## BSVDependenceDB --
+##   Dependence sections requested by the BSV tool in the depends-init
+##   build, the rule building the database and the lookup of sections in
+##   the normal build.
+##
+class BSVDependenceDB():
+
+    def __init__(self, bscBDir, libDirPaths):
+        self.bscBDir = bscBDir
+        self.searchPathArg = '+:' + libDirPaths
+        self.sections = []
+        self.loaded = None
+
+    ##
+    ## addSection --
+    ##   Note the dependence of targetFiles, which leap-bsc-mkdepend computed
+    ##   for a single .depends-* file (name).  Imports of the derived files
+    ##   are not followed.
+    ##
+    def addSection(self, name, targetFiles, derived, ignoreFile):
+        self.sections.append((name, list(targetFiles), derived, ignoreFile))
+
+    ##
+    ## rule --
+    ##   The SCons rule building the database from all sections.
+    ##
+    def rule(self, moduleList, extraSources):
+        env = moduleList.env
+
+        sources = []
+        for (name, targetFiles, derived, ignoreFile) in self.sections:
+            sources += [f for f in targetFiles if not f in sources]
+        sources += [f for f in extraSources if not f in sources]
+
+        sections = self.sections
+        searchPathArg = self.searchPathArg
+        bscBDir = self.bscBDir
+
+        def build_depends_db(target, source, env):
+            try:
+                writeDependenceDB(str(target[0]), sections, searchPathArg, bscBDir,
+                                  env['ENV'].get('BLUESPECDIR', os.environ.get('BLUESPECDIR')))
+            except BSVDependenceError, e:
+                sys.stderr.write('Bluespec dependence error: ' + str(e) + '\n')
+                return 1
+            return None
+
+        db = env.Command(BSV_DEPENDS_DB, sources, build_depends_db)
+        env.NoCache(db)
+
+        # Previous dependence describes which source changes may change
+        # the dependence.
+        for f in previousSources(BSV_DEPENDS_DB):
+            if os.path.exists(f):
+                env.Depends(db, f)
+
+        return db
+
+    ##
+    ## parseDepends --
+    ##   Add the dependence rules of section name to env, as
+    ##   env.ParseDepends() did for the section's .depends-* file.
+    ##
+    def parseDepends(self, env, name, must_exist=None):
+        if (self.loaded is None):
+            self.loaded = loadDependenceDB(BSV_DEPENDS_DB)
+
+        if ((self.loaded is None) or (not name in self.loaded['sections'])):
+            if must_exist:
+                raise IOError(errno.ENOENT, 'No Bluespec dependence (build depends-init first)', name)
+            return
+
+        for (target, source) in self.loaded['sections'][name]:
+            env.Depends(target, source)
+
+
+def loadDependenceDB(fileName):
+    try:
+        handle = open(fileName, 'rb')
+        db = pickle.load(handle)
+        handle.close()
+    except (IOError, EOFError, pickle.UnpicklingError):
+        return None
+
+    if (db.get('version') != BSV_DEPENDS_DB_VERSION):
+        return None
+    return db
+
+
+##
+## previousSources --
+##   Bluespec sources (.bsv and .bsh) named by the current database.
+##
+def previousSources(fileName):
+    db = loadDependenceDB(fileName)
+    if (db is None):
+        return []
+
+    bsv_file_pattern = re.compile('\S+.[bB][sS][vVhH]$')
+
+    sources = set()
+    for rules in db['sections'].values():
+        sources.update([src for (tgt, src) in rules if bsv_file_pattern.match(src)])
+    return sorted(sources)
+
+
+def writeDependenceDB(fileName, sections, searchPathArg, bscBDir, bluespecDir):
+    start = time.time()
+
+    old = loadDependenceDB(fileName)
+    scanner = BSVDependenceScanner(bscSearchPath(searchPathArg), bluespecDir,
+                                   old['scans'] if old else {})
+
+    db = {'version': BSV_DEPENDS_DB_VERSION, 'sections': {}}
+    for (name, targetFiles, derived, ignoreFile) in sections:
+        db['sections'][name] = scanner.dependence(targetFiles, derived, ignoreFile, bscBDir)
+    db['scans'] = scanner.scans
+
+    handle = open(fileName + '.tmp', 'wb')
+    pickle.dump(db, handle, protocol=-1)
+    handle.close()
+    os.rename(fileName + '.tmp', fileName)
+
+    print 'Bluespec dependence: %d sections, %d files (%d scanned, %d unchanged) in %.2f seconds' % \
+          (len(sections), scanner.scanned + scanner.reused, scanner.scanned, scanner.reused,
+           time.time() - start)
+
+
+##
+## bscSearchPath --
+##   The search path of a -p argument, with + replaced by the Bluespec
+##   compiler's default path.
+##
+def bscSearchPath(pathArg):
+    default = None
+    for ln in model.toolProbe('bsc -help', envVars=['BLUESPECDIR']).split('\n'):
+        if ln.startswith('import path:'):
+            default = re.sub('^import path: \.:\s*', '', ln).rstrip()
+    if (default is None):
+        raise BSVDependenceError('Failed to find Bluespec default path')
+
+    path = []
+    for p in perlSplit(pathArg):
+        if (p == '+'):
+            path += perlSplit(default)
+        else:
+            path.append(p)
+    return path
+
+
+# Perl's split(':', ...) drops trailing empty fields.
+def perlSplit(path):
+    fields = path.split(':')
+    while (fields and fields[-1] == ''):
+        fields.pop()
+    return fields
+
+
+##
+## BSVDependenceScanner --
+##   Scans of Bluespec files and the dependence rules computed from them.
+##   Scans are shared by all sections.
+##
+class BSVDependenceScanner():
+
+    def __init__(self, searchPath, bluespecDir, scans):
+        self.searchPath = searchPath
+        self.bluespecDir = bluespecDir
+        # Scans by file name:  (signature, includes, imports)
+        self.scans = scans
+        self.current = {}
+        self.hashes = {}
+        self.found = {}
+        self.libraries = {}
+        self.fileDeps = {}
+        self.objects = {}
+        self.scanned = 0
+        self.reused = 0
+
+    def fileHash(self, path):
+        if (not path in self.hashes):
+            try:
+                handle = open(path, 'r')
+                self.hashes[path] = hashlib.md5(handle.read()).digest()
+                handle.close()
+            except IOError:
+                self.hashes[path] = None
+        return self.hashes[path]
+
+    def findInclude(self, name):
+        key = ('include', name)
+        if (not key in self.found):
+            self.found[key] = None
+            if (name.startswith('/')):
+                if os.path.isfile(name):
+                    self.found[key] = name
+            else:
+                for s in self.searchPath:
+                    p = s + '/' + name
+                    if os.path.isfile(p):
+                        self.found[key] = p
+                        break
+        return self.found[key]
+
+    ##
+    ## scan --
+    ##   The includes and imports of a file, after preprocessing.
+    ##
+    def scan(self, path):
+        if (path in self.current):
+            return self.current[path]
+
+        result = None
+        if (path in self.scans):
+            (signature, includes, imports) = self.scans[path]
+            if self.signatureHolds(signature):
+                result = (includes, imports)
+                self.reused += 1
+
+        if (result is None):
+            # Known divergence from ivlpp:  macros are not expanded and
+            # directives are honored only at the start of a line.  An
+            # import or `include naming a macro, or a directive following
+            # other text on a line, may give a different dependence than
+            # leap-bsc-mkdepend found.  bsvDependsCheck.py compares the
+            # two within the subset.
+            preprocessor = BSVPreprocessor(self)
+            lines = preprocessor.run(path)
+            imports = findImports(lines)
+            includes = [p for (name, p) in preprocessor.includes]
+            signature = ([(p, self.fileHash(p)) for p in [path] + includes],
+                         preprocessor.includes)
+            self.scans[path] = (signature, includes, imports)
+            result = (includes, imports)
+            self.scanned += 1
+
+        self.current[path] = result
+        return result
+
+    def signatureHolds(self, signature):
+        (hashes, includes) = signature
+        for (p, h) in hashes:
+            if (self.fileHash(p) != h):
+                return False
+        for (name, p) in includes:
+            if (self.findInclude(name) != p):
+                return False
+        return True
+
+    def findBSVFile(self, f, derivedBSV):
+        # Is file a generated file for a subdirectory?
+        if (f in derivedBSV):
+            return intern('./' + derivedBSV[f])
+
+        key = ('bsv', f)
+        if (not key in self.found):
+            self.found[key] = None
+            for s in self.searchPath:
+                p = s + '/' + f
+                if os.path.isfile(p):
+                    self.found[key] = intern(p)
+                    break
+        return self.found[key]
+
+    def isBSVLibrary(self, f):
+        if (self.bluespecDir is None):
+            raise BSVDependenceError('BLUESPECDIR undefined in environment.')
+
+        if (not f in self.libraries):
+            self.libraries[f] = (os.path.isfile(self.bluespecDir + '/Prelude/' + f) or
+                                 os.path.isfile(self.bluespecDir + '/Libraries/' + f))
+        return self.libraries[f]
+
+    ##
+    ## dependence --
+    ##   The (target, source) rules leap-bsc-mkdepend printed for
+    ##   targetFiles.
+    ##
+    def dependence(self, targetFiles, derived, ignoreFile, bscBDir):
+        derivedBSV = {}
+        for d in derived.split():
+            derivedBSV[os.path.basename(d)] = d
+
+        ignore = set()
+        try:
+            handle = open(ignoreFile, 'r')
+            ignore = set([ln.rstrip('\n') for ln in handle])
+            handle.close()
+        except IOError:
+            pass
+
+        # Files parsed, in order, and the dependence of each on its
+        # includes (False) and imports (True), in the order found.
+        bsvFiles = []
+        bsvDep = {}
+
+        pending = list(reversed(targetFiles))
+        while pending:
+            fName = pending.pop()
+            if (fName in bsvDep):
+                continue
+            bsvFiles.append(fName)
+            flags = {}
+            deps = []
+            bsvDep[fName] = (flags, deps)
+
+            # Don't parse the contents of derived files.
+            if (os.path.basename(fName) in derivedBSV):
+                continue
+
+            (includes, imports) = self.fileDependence(fName)
+
+            # A file may enter an include more than once (e.g. a guarded
+            # header included by two of its includes).
+            for inc in includes:
+                if (not inc in flags):
+                    deps.append(inc)
+                flags[inc] = False
+
+            imported = []
+            for impName in imports:
+                imp = self.findBSVFile(impName + '.bsv', derivedBSV)
+                if (imp is None):
+                    raise BSVDependenceError('Failed to find ' + impName + ' imported by ' + fName)
+                if (not imp in flags):
+                    deps.append(imp)
+                flags[imp] = True
+                imported.append(imp)
+
+            # Parse imports depth first, as leap-bsc-mkdepend did.
+            pending += reversed(imported)
+
+        rules = []
+
+        def printBODep(tgt, src):
+            if (not src in ignore):
+                rules.append((tgt, src))
+                # Hack for wrapper log files (two pass compilation for soft connections)
+                if tgt.endswith('_Log.bo'):
+                    rules.append((intern(tgt[:-len('_Log.bo')] + '_Wrapper.log'), src))
+
+        for bsv in bsvFiles:
+            tgt = self.objectPath(bsv, bscBDir)
+
+            localBsv = bsv[2:] if bsv.startswith('./') else bsv
+            if (not localBsv in derivedBSV):
+                printBODep(tgt, bsv)
+
+            (flags, deps) = bsvDep[bsv]
+            for dep in deps:
+                if flags[dep]:
+                    # For imports add dependence on built object
+                    printBODep(tgt, self.objectPath(dep, bscBDir))
+                else:
+                    printBODep(tgt, dep)
+
+        return rules
+
+    ##
+    ## fileDependence --
+    ##   The includes of a file, other than the file itself, and the
+    ##   packages it imports that are not Bluespec libraries.  The same in
+    ##   all sections.
+    ##
+    def fileDependence(self, fName):
+        if (not fName in self.fileDeps):
+            if (not os.path.isfile(fName) and not os.path.islink(fName)):
+                raise BSVDependenceError("Can't find file " + fName)
+
+            (includes, imports) = self.scan(fName)
+
+            f_ino = inode(fName, -1)
+            includes = [intern(inc) for inc in includes if inode(inc, -2) != f_ino]
+            imports = [impName for impName in imports
+                       if ((impName != 'BDPI') and (impName != 'BVI') and
+                           not self.isBSVLibrary(impName + '.bo'))]
+            self.fileDeps[fName] = (includes, imports)
+        return self.fileDeps[fName]
+
+    ##
+    ## objectPath --
+    ##   The object file compiled from a Bluespec source.
+    ##
+    def objectPath(self, bsv, bscBDir):
+        if (not bsv in self.objects):
+            (bdir, bo) = splitPath(re.sub(r'\.bsv$', '.bo', bsv))
+            self.objects[bsv] = intern(bdir + bscBDir + '/' + bo)
+        return self.objects[bsv]
+
+
+# The directory (with a trailing slash, or empty) and leaf of a path.
+def splitPath(path):
+    i = path.rfind('/')
+    if (i < 0):
+        return ('', path)
+    return (path[:i + 1], path[i + 1:])
+
+
+def inode(path, missing):
+    try:
+        return os.stat(path).st_ino
+    except OSError:
+        return missing
+
+
+##
+## BSVPreprocessor --
+##   Preprocess a file as ivlpp does, returning the lines of text.  The
+##   includes entered, as (name, path) pairs, are left in includes.
+##
+class BSVPreprocessor():
+
+    directivePattern = re.compile(r'\s*`(\w+)\s*(.*)')
+    includeNamePattern = re.compile(r'["<]([^">]+)[">]')
+    tokenPattern = re.compile(r'"|//|/\*')
+    stringEndPattern = re.compile(r'(\\.|[^"\\])*"')
+
+    def __init__(self, scanner):
+        self.scanner = scanner
+        self.macros = set()
+        self.includes = []
+        self.lines = []
+
+    def run(self, path):
+        try:
+            self.expand(path, 0)
+        except IncludeNotFound:
+            # ivlpp stops at a missing include.
+            pass
+        return self.lines
+
+    def expand(self, path, depth):
+        if (depth > 100):
+            raise BSVDependenceError('Include nesting too deep in ' + path)
+
+        try:
+            handle = open(path, 'r')
+            text = handle.read()
+            handle.close()
+        except IOError:
+            return
+
+        # Conditional state:  one entry per open `ifdef, whether its code
+        # is active and whether any branch was taken yet.
+        conditions = []
+        active = True
+        inComment = False
+
+        lines = text.split('\n')
+        if (lines and lines[-1] == ''):
+            lines.pop()
+
+        i = 0
+        while (i < len(lines)):
+            line = lines[i]
+            i += 1
+
+            m = None
+            if ((not inComment) and ('`' in line)):
+                m = self.directivePattern.match(line)
+
+            if (m is None):
+                if active:
+                    self.lines.append(line)
+                inComment = self.commentState(line, inComment)
+                continue
+
+            directive = m.group(1)
+            rest = m.group(2)
+
+            if (directive in ('ifdef', 'ifndef')):
+                name = rest.split()[0] if rest.split() else ''
+                if active:
+                    taken = (name in self.macros) == (directive == 'ifdef')
+                    conditions.append((active, taken))
+                    active = taken
+                else:
+                    conditions.append((False, True))
+            elif (directive == 'elsif'):
+                (outer, taken) = conditions[-1] if conditions else (True, True)
+                name = rest.split()[0] if rest.split() else ''
+                if (outer and not taken and (name in self.macros)):
+                    active = True
+                    conditions[-1] = (outer, True)
+                else:
+                    active = False
+            elif (directive == 'else'):
+                (outer, taken) = conditions[-1] if conditions else (True, True)
+                active = outer and not taken
+                if conditions:
+                    conditions[-1] = (outer, True)
+            elif (directive == 'endif'):
+                if conditions:
+                    # Back to the enclosing state.
+                    active = conditions.pop()[0]
+                else:
+                    active = True
+            elif (not active):
+                pass
+            elif (directive == 'define'):
+                name = re.match(r'\w*', rest).group(0)
+                self.macros.add(name)
+                # Skip continuation lines of the definition.
+                while (line.rstrip().endswith('\\') and i < len(lines)):
+                    line = lines[i]
+                    i += 1
+            elif (directive == 'undef'):
+                name = re.match(r'\w*', rest).group(0)
+                self.macros.discard(name)
+            elif (directive == 'include'):
+                n = self.includeNamePattern.match(rest)
+                if n:
+                    name = n.group(1)
+                    inc = self.scanner.findInclude(name)
+                    if (inc is None):
+                        raise IncludeNotFound(name)
+                    self.includes.append((name, inc))
+                    self.expand(inc, depth + 1)
+            else:
+                # Not a preprocessor directive (e.g. a macro use).
+                self.lines.append(line)
+                inComment = self.commentState(line, inComment)
+
+    ##
+    ## commentState --
+    ##   Whether a block comment is open at the end of a line.
+    ##
+    def commentState(self, line, inComment):
+        pos = 0
+        while True:
+            if inComment:
+                end = line.find('*/', pos)
+                if (end < 0):
+                    return True
+                pos = end + 2
+                inComment = False
+            m = self.tokenPattern.search(line, pos)
+            if (m is None):
+                return False
+            token = m.group(0)
+            if (token == '//'):
+                return False
+            elif (token == '/*'):
+                inComment = True
+                pos = m.end()
+            else:
+                s = self.stringEndPattern.match(line, m.end())
+                if (s is None):
+                    return False
+                pos = s.end()
+
+
+class IncludeNotFound(Exception):
+    pass
+
+
+##
+## findImports --
+##   The packages imported by preprocessed Bluespec text, found as
+##   leap-bsc-mkdepend found them:  comments are dropped line by line, not
+##   especially smart about quotes or nesting.
+##
+def findImports(lines):
+    imports = []
+    inComment = False
+
+    for s in lines:
+        if ('//' in s):
+            s = re.sub(r'//.*', '', s)
+
+        if inComment:
+            if re.search(r'\*[\)/]', s):
+                s = re.sub(r'.*\*[\)/]', '', s, 1)
+                inComment = False
+
+        if ('*' in s):
+            s = re.sub(r'\(\*.*\*\)', '', s, 1)
+            s = re.sub(r'/\*.*\*/', '', s, 1)
+
+        if inComment:
+            s = ''
+
+        if ('*' in s and re.search(r'[\(/]\*', s)):
+            s = re.sub(r'[\(/]\*.*', '', s, 1)
+            inComment = True
+
+        s = s.lstrip()
+        if (not s.startswith('import')):
+            continue
+        s = re.sub(r'\s+', ' ', s)
+
+        if (s.startswith('import ') and not (' = module ' in s)):
+            imp = re.sub(r'[:; ].*', '', s[len('import '):], 1)
+            imp = re.sub(r'^"', '', imp)
+            imp = re.sub(r'"$', '', imp)
+            if (not imp in imports):
+                imports.append(imp)
+
+    return imports
@@ -0,0 +1,296 @@
+##
+## Interface dumps --
+##
+## interfaceType.tcl describes the interface of a synthesis boundary as a
+## single line of Python:  nested calls of the wrapper_gen classes
+## (Interface, Method, Vector, Prim_Clock, ...) whose arguments are
+## strings, integers, lists and dictionaries.  The .ifc files holding
+## these descriptions used to be formatted by PythonTidy, a general
+## Python source beautifier that tokenizes, parses and re-renders the
+## whole dump.
+##
+## formatInterfaceDump() renders the same text in one pass over the
+## dump.  It parses only the dump grammar and lays it out following the
+## PythonTidy rules that apply to it:
+##
+##   - a shebang and a coding line precede the expression;
+##   - dictionaries of more than MAX_SEPS_DICT items, and lists and calls
+##     of more than MAX_SEPS_SERIES arguments, get one entry per line;
+##   - other lines are split after separators once they would pass
+##     COL_LIMIT, continuing at PythonTidy's tab stops.
+##
+## Text outside the grammar (e.g. strings PythonTidy would respell, or
+## error messages preceding the description) raises InterfaceDumpError.
+## Callers fall back to PythonTidy for it.
+##
+## interfaceDumpJSON() describes the same dump as JSON, for tools that
+## would rather not evaluate Python:  calls become objects holding the
+## class name and the arguments, dictionaries keep their order and
+## their keys become strings.
+##
+
+import re
+import json
+import keyword
+from collections import OrderedDict
+
+COL_LIMIT = 72
+INDENTATION = '    '
+MAX_SEPS_DICT = 3
+MAX_SEPS_SERIES = 5
+
+INTERFACE_DUMP_HEADER = '#!/usr/bin/python\n# -*- coding: utf-8 -*-\n'
+
+
+class InterfaceDumpError(Exception):
+    pass
+
+
+##
+## Parsed dumps are trees of tuples:
+##   ('call', name, [args])   ('name', name)   ('dict', [(key, value)])
+##   ('list', [items])        ('str', text)    ('int', text)
+##
+dumpToken = re.compile(r"[ \t]*(?:([A-Za-z_]\w*)|(0|[1-9]\d*)|'([^'\\\n]*)'|([(){}\[\],:]))")
+
+
+class InterfaceDumpParser():
+
+    def __init__(self, text):
+        self.tokens = []
+        pos = 0
+        end = len(text.rstrip(' \t\n'))
+        while pos < end:
+            match = dumpToken.match(text, pos)
+            if (match is None):
+                raise InterfaceDumpError('unexpected text at column ' + str(pos + 1))
+            (name, number, string, punct) = match.groups()
+            if (name is not None):
+                if (keyword.iskeyword(name)):
+                    raise InterfaceDumpError('keyword ' + name)
+                self.tokens.append(('name', name))
+            elif (number is not None):
+                self.tokens.append(('int', number))
+            elif (string is not None):
+                # PythonTidy writes strings as repr() spells them.
+                if (repr(string) != "'" + string + "'"):
+                    raise InterfaceDumpError('string needs escapes: ' + string)
+                self.tokens.append(('str', string))
+            else:
+                self.tokens.append((punct, punct))
+            pos = match.end()
+        self.tokens.append(('end', None))
+        self.next = 0
+
+    def peek(self):
+        return self.tokens[self.next][0]
+
+    def take(self, kind):
+        token = self.tokens[self.next]
+        if (token[0] != kind):
+            raise InterfaceDumpError('expected ' + kind + ', found ' + str(token[1]))
+        self.next += 1
+        return token[1]
+
+    def parse(self):
+        tree = self.value()
+        self.take('end')
+        # PythonTidy drops constant statements.
+        if (tree[0] in ('str', 'int')):
+            raise InterfaceDumpError('dump is a constant')
+        return tree
+
+    def series(self, close, entry):
+        entries = []
+        while (self.peek() != close):
+            entries.append(entry())
+            if (self.peek() != close):
+                self.take(',')
+        self.take(close)
+        return entries
+
+    def item(self):
+        key = self.value()
+        self.take(':')
+        return (key, self.value())
+
+    def value(self):
+        kind = self.peek()
+        if (kind == 'name'):
+            name = self.take('name')
+            if (self.peek() == '('):
+                self.take('(')
+                return ('call', name, self.series(')', self.value))
+            return ('name', name)
+        elif (kind == '{'):
+            self.take('{')
+            return ('dict', self.series('}', self.item))
+        elif (kind == '['):
+            self.take('[')
+            return ('list', self.series(']', self.value))
+        elif (kind in ('str', 'int')):
+            return (kind, self.take(kind))
+        raise InterfaceDumpError('unexpected ' + str(self.tokens[self.next][1]))
+
+
+def parseInterfaceDump(text):
+    if ('\n' in text.rstrip('\n') or text[:1] in (' ', '\t')):
+        raise InterfaceDumpError('dump is not a single, unindented line')
+    return InterfaceDumpParser(text).parse()
+
+
+##
+## InterfaceDumpWriter --
+##   Renders a parsed dump.  A line is gathered as chunks of text that
+##   may set or clear a tab stop, or allow a line split after them, and
+##   is laid out when it ends (lineTerm), the way PythonTidy's OutputUnit
+##   lays out its lines.
+##
+class InterfaceDumpWriter():
+
+    def __init__(self):
+        self.lines = []
+        self.margin = ''
+
+    def lineInit(self):
+        self.chunks = []
+        self.tabs = []
+        self.tabSet(len(self.margin) + len(INDENTATION))
+        self.more(self.margin)
+
+    def more(self, chunk, tabSet=False, tabClear=False, splitAfter=False):
+        self.chunks.append((chunk, tabSet, tabClear, splitAfter))
+
+    def tabSet(self, col):
+        if (col > COL_LIMIT / 2):
+            if (self.tabs):
+                col = self.tabs[-1] + 4
+            else:
+                col = 4
+        self.tabs.append(col)
+
+    def lineTerm(self):
+        # Width of each chunk up to the next place the line may split.
+        widths = []
+        width = 0
+        for (chunk, tabSet, tabClear, splitAfter) in reversed(self.chunks):
+            if (splitAfter):
+                width = 0
+            width += len(chunk)
+            widths.append(width)
+        widths.reverse()
+
+        line = []
+        pos = 0
+        splitBefore = False
+        for ((chunk, tabSet, tabClear, splitAfter), width) in zip(self.chunks, widths):
+            if (splitBefore and pos > 0 and pos + width > COL_LIMIT):
+                self.lines.append(''.join(line).rstrip())
+                if (len(self.tabs) > 1):
+                    pos = self.tabs[1]
+                else:
+                    pos = self.tabs[0]
+                line = [' ' * pos]
+            line.append(chunk)
+            pos += len(chunk)
+            if (tabSet):
+                self.tabSet(pos)
+            if (tabClear and len(self.tabs) > 1):
+                self.tabs.pop()
+            splitBefore = splitAfter
+        self.lines.append(''.join(line).rstrip())
+
+    ##
+    ## vertical --
+    ##   Entries one per line, indented, each followed by a separator.
+    ##   The closing bracket goes on a line of its own at the same indent.
+    ##
+    def vertical(self, entries, put):
+        self.lineTerm()
+        self.margin += INDENTATION
+        for entry in entries:
+            self.lineInit()
+            put(entry)
+            self.more(', ')
+            self.lineTerm()
+        self.lineInit()
+        self.margin = self.margin[:-len(INDENTATION)]
+
+    def horizontal(self, entries, put):
+        for (idx, entry) in enumerate(entries):
+            if (idx > 0):
+                self.more(', ', splitAfter=True)
+            put(entry)
+
+    def put(self, node, canSplit=False):
+        kind = node[0]
+        if (kind == 'str'):
+            self.more("'" + node[1] + "'", splitAfter=canSplit)
+        elif (kind in ('int', 'name')):
+            self.more(node[1])
+        elif (kind == 'call'):
+            self.more(node[1])
+            self.more('(', tabSet=True)
+            putArg = lambda arg: self.put(arg, canSplit=True)
+            if (len(node[2]) > MAX_SEPS_SERIES):
+                self.vertical(node[2], putArg)
+            else:
+                self.horizontal(node[2], putArg)
+            self.more(')', tabClear=True)
+        elif (kind == 'list'):
+            self.more('[', tabSet=True)
+            putItem = lambda item: self.put(item, canSplit=True)
+            if (len(node[1]) > MAX_SEPS_SERIES):
+                self.vertical(node[1], putItem)
+            else:
+                self.horizontal(node[1], putItem)
+            self.more(']', tabClear=True)
+        elif (kind == 'dict'):
+            def putItem((key, value)):
+                self.put(key)
+                self.more(': ')
+                self.put(value, canSplit=canSplit)
+            self.more('{', tabSet=True)
+            if (len(node[1]) > MAX_SEPS_DICT):
+                self.vertical(node[1], putItem)
+            else:
+                self.horizontal(node[1], putItem)
+            self.more('}', tabClear=True)
+
+    def write(self, tree):
+        self.lineInit()
+        self.put(tree)
+        self.lineTerm()
+        return INTERFACE_DUMP_HEADER + ''.join([l + '\n' for l in self.lines])
+
+
+##
+## formatInterfaceDump --
+##   The .ifc text of an interfaceType.tcl dump, as PythonTidy formats it.
+##
+def formatInterfaceDump(text):
+    return InterfaceDumpWriter().write(parseInterfaceDump(text))
+
+
+def interfaceDumpObject(node):
+    kind = node[0]
+    if (kind == 'call'):
+        return OrderedDict([('class', node[1]),
+                            ('args', [interfaceDumpObject(arg) for arg in node[2]])])
+    elif (kind == 'name'):
+        return OrderedDict([('name', node[1])])
+    elif (kind == 'dict'):
+        return OrderedDict([(str(interfaceDumpObject(key)), interfaceDumpObject(value))
+                            for (key, value) in node[1]])
+    elif (kind == 'list'):
+        return [interfaceDumpObject(item) for item in node[1]]
+    elif (kind == 'int'):
+        return int(node[1])
+    return node[1]
+
+##
+## interfaceDumpJSON --
+##   A JSON description of an interfaceType.tcl dump.
+##
+def interfaceDumpJSON(text):
+    return json.dumps(interfaceDumpObject(parseInterfaceDump(text)), indent=1) + '\n'
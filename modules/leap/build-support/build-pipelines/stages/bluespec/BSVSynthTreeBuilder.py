@@ -33,10 +33,20 @@
 ## The merge could be accomplished in a single module, but this results in
 ## slow compilation.  Instead, a tree of modules is generated.
 ##
+## By default the whole tree is written to build_tree_Wrapper.bsv and
+## compiled by a single bsc invocation.  With BUILD_TREE_SPLIT_FILES set,
+## each tree node is written to its own package and compiled by its own
+## SCons command, so independent subtrees compile in parallel and a change
+## rebuilds only the path from the affected nodes to the root.
+##
 
 import os
+import re
 import functools
 import pickle
+import hashlib
+import StringIO
+import time
 
 from SCons.Errors import BuildError
 
@@ -46,7 +56,7 @@ import li_module
 from li_module import LIGraph, LIModule
 import bsv_tool
 import wrapper_gen_tool
-from bsv_tool.treeModule import TreeModule
+from bsv_tool.treeModule import TreeModule, treeShape
 
 try:
     import area_group_tool
@@ -58,11 +68,55 @@ def getInstanceName(myModuleName):
     return 'inst_' + myModuleName
 
 
+##
+## getTreeNodePackage --
+##   Package holding a build tree node when tree nodes are emitted to
+##   separate files.
+##
+def getTreeNodePackage(myModuleName):
+    return 'build_tree_' + myModuleName
+
+
+##
+## leafModule --
+##   The LI module standing for a synthesis boundary at a leaf of the
+##   build tree: a fresh module over copies of the boundary's
+##   connections, matched only among themselves.  Emitting the tree
+##   matches and rewrites leaf connections, so leaves must not share
+##   them with the LI graph.
+##
+def leafModule(module):
+    connections = [connection.copy() for connection in module.channels + module.chains + module.services]
+    return LIGraph(connections).modules.values()[0]
+
+
+def hasConnections(module):
+    return (len(module.channels) + len(module.chains) + len(module.services)) > 0
+
+
+# Wrapper instantiated for empty tree nodes.
+emptyWrapper = 'module mk_empty_Wrapper#(Reset baseReset) (SOFT_SERVICES_SYNTHESIS_BOUNDARY#(0,0,0,0,0,0,0, Empty)); return ?; endmodule\n'
+
+
 class BSVSynthTreeBuilder():
     def __init__(self, parent):
         self.parent = parent
         self.getFirstPassLIGraph = wrapper_gen_tool.getFirstPassLIGraph()
 
+        moduleList = parent.moduleList
+        self.cutAlgorithm = moduleList.getAWBParam('bsv_tool', 'BUILD_TREE_CUT_ALGORITHM')
+        self.cutBalance = moduleList.getAWBParam('bsv_tool', 'BUILD_TREE_CUT_BALANCE')
+        self.cutTrials = moduleList.getAWBParam('bsv_tool', 'BUILD_TREE_CUT_TRIALS')
+        self.treeFanout = max(2, moduleList.getAWBParam('bsv_tool', 'BUILD_TREE_FANOUT'))
+        self.partitionImbalance = moduleList.getAWBParam('bsv_tool', 'BUILD_TREE_PARTITION_IMBALANCE')
+        self.partitionReport = moduleList.getAWBParam('bsv_tool', 'BUILD_TREE_PARTITION_REPORT')
+
+        self.stableTree = moduleList.getAWBParam('bsv_tool', 'BUILD_TREE_STABLE')
+
+        # Log-only builds emit a trivial tree, so there is nothing to split.
+        self.splitTreeFiles = moduleList.getAWBParam('bsv_tool', 'BUILD_TREE_SPLIT_FILES') and \
+                              (parent.BUILD_LOGS_ONLY == 0)
+
     ##
     ## setupTreeBuild --
     ##   Merge exposed soft connections using a tree of synthesis boundaries
@@ -83,8 +137,8 @@ class BSVSynthTreeBuilder():
         ##
 
         ## If we aren't building the build tree, don't bother with its dependencies
-        env.ParseDepends(get_build_path(moduleList, moduleList.topModule) + '/.depends-build-tree',
-                         must_exist = not moduleList.env.GetOption('clean'))
+        self.parent.bsvDepends.parseDepends(env, get_build_path(moduleList, moduleList.topModule) + '/.depends-build-tree',
+                                            must_exist = not moduleList.env.GetOption('clean'))
         tree_base_path = env.Dir(get_build_path(moduleList, moduleList.topModule))
 
         tree_file_synth = tree_base_path.File('build_tree_synth.bsv')
@@ -157,8 +211,8 @@ class BSVSynthTreeBuilder():
                         oldStubs += module.moduleDependency['GEN_VERILOG_STUB']
 
             # let's pick up the platform dependencies, since they are also special.
-            env.ParseDepends(get_build_path(moduleList, moduleList.topModule) + '/.depends-platform',
-                             must_exist = not moduleList.env.GetOption('clean'))
+            self.parent.bsvDepends.parseDepends(env, get_build_path(moduleList, moduleList.topModule) + '/.depends-platform',
+                                                must_exist = not moduleList.env.GetOption('clean'))
 
             # Due to the way that string files are
             # generated, they are difficult to rename in
@@ -240,8 +294,8 @@ class BSVSynthTreeBuilder():
             liGraph.mergeModules([ module for module in bsv_tool.getUserModules(firstPassGraph) if module.getAttribute('RESYNTHESIZE') is None])
             for module in sorted(liGraph.graph.nodes(), key=lambda module: module.name):
                 # pull in the dependecies generate by the dependency pass.
-                env.ParseDepends(str(tree_base_path) + '/.depends-' + module.name,
-                                 must_exist = not moduleList.env.GetOption('clean'))
+                self.parent.bsvDepends.parseDepends(env, str(tree_base_path) + '/.depends-' + module.name,
+                                                    must_exist = not moduleList.env.GetOption('clean'))
                 wrapper_path = tree_base_path.File(module.name + '_Wrapper.bsv')
                 wrapper_bo_path = tree_base_path.File(self.parent.TMP_BSC_DIR + '/' + module.name + '_Wrapper.bo')
 
@@ -300,6 +354,15 @@ class BSVSynthTreeBuilder():
         tree_build_deps = boundary_logs + importBOs
         tree_build_results = [tree_file_wrapper, tree_file_synth]
 
+        # Per-node packages, when the tree is split across files.  Every
+        # potential tree node gets a file, since unused nodes are emitted
+        # as dummy modules.
+        tree_node_files = {}
+        if (self.splitTreeFiles):
+            for node in verilog_deps:
+                tree_node_files[node] = tree_base_path.File(getTreeNodePackage(node) + '.bsv')
+            tree_build_results += [tree_node_files[node] for node in verilog_deps]
+
         if (self.getFirstPassLIGraph and area_constraints):
             tree_build_deps += [area_constraints.areaConstraintsFilePlaced()]
             tree_build_results += [area_constraints.areaConstraintsFile()]
@@ -315,6 +378,12 @@ class BSVSynthTreeBuilder():
         cut_tree_state['moduleList'] = moduleList
         cut_tree_state['tree_file_synth'] = tree_file_synth
         cut_tree_state['tree_file_wrapper'] = tree_file_wrapper
+        cut_tree_state['tree_node_files'] = tree_node_files
+
+        # The stable tree build keeps a record of the previous tree next
+        # to the LI graph.  It is not a target: SCons would remove it
+        # before running cutTreeBuild.
+        cut_tree_state['tree_record'] = moduleList.env['DEFS']['APM_NAME'] + '_build_tree.li'
 
         cut_tree_build = functools.partial(self.cutTreeBuild, cut_tree_state)
         cut_tree_build.__name__ = 'cutTreeBuild'
@@ -322,6 +391,7 @@ class BSVSynthTreeBuilder():
         tree_components = env.Command(tree_build_results,
                                       tree_build_deps,
                                       cut_tree_build)
+        env.Clean(tree_components, cut_tree_state['tree_record'])
 
         ## Compiling the build tree wrapper produces several .ba
         ## files, some that are useful, the TREE_MODULES, and some
@@ -356,10 +426,52 @@ class BSVSynthTreeBuilder():
         producedVs = map(lambda path: bsv_tool.modify_path_ba(moduleList, path), moduleList.getModuleDependenciesWithPaths(tree_module, 'GEN_VERILOGS')) + \
                      buildTreeDeps['VERILOG']
 
+        # the tree_file_wrapper build needs all the wrapper bo from the user program,
+        # but not the top level build.
+        top_bo = moduleList.topModule.moduleDependency['BSV_BO']
+        all_bo = moduleList.getAllDependencies('BO')
+
         tree_command = self.parent.compile_bo_bsc_base([tree_file_wrapper_bo_path], get_build_path(moduleList, moduleList.topModule)) + ' ' + tree_file_wrapper.path
-        tree_file_wrapper_bo = env.Command([tree_file_wrapper_bo_path] + producedBAs + producedVs,
-                                           tree_components,
-                                           tree_command)
+
+        if (not self.splitTreeFiles):
+            tree_file_wrapper_bo = env.Command([tree_file_wrapper_bo_path] + producedBAs + producedVs,
+                                               tree_components,
+                                               tree_command)
+        else:
+            ##
+            ## Each tree node is compiled separately.  The shape of the tree
+            ## is known only once cutTreeBuild has run, so the dependence of
+            ## a node on the nodes it instantiates is found by scanning the
+            ## generated node package for imports of other node packages.
+            ##
+            def scanTreeNodeImports(node, env, path):
+                if (not node.exists()):
+                    return []
+                packages = re.findall(r'^import (build_tree___TREE_MODULE__\d+)::\*;',
+                                      node.get_contents(), re.MULTILINE)
+                return [tree_base_path.File(self.parent.TMP_BSC_DIR + '/' + package + '.bo') for package in packages]
+
+            tree_node_scanner = env.Scanner(function = scanTreeNodeImports,
+                                            name = 'TreeNodeImports')
+
+            tree_node_bos = []
+            for idx in range(len(verilog_deps)):
+                node = verilog_deps[idx]
+                node_bo_path = tree_base_path.File(self.parent.TMP_BSC_DIR + '/' + getTreeNodePackage(node) + '.bo')
+                node_command = self.parent.compile_bo_bsc_base([node_bo_path], get_build_path(moduleList, moduleList.topModule)) + ' $SOURCE'
+                node_bo = env.Command([node_bo_path, producedBAs[idx], producedVs[idx]],
+                                      tree_node_files[node],
+                                      node_command,
+                                      source_scanner = tree_node_scanner)
+                env.Depends(node_bo, all_bo)
+                tree_node_bos += node_bo
+
+            # The root imports its children's packages and, through them,
+            # the rest of the tree.
+            tree_file_wrapper_bo = env.Command([tree_file_wrapper_bo_path] + buildTreeDeps['VERILOG'],
+                                               tree_components,
+                                               tree_command)
+            env.Depends(tree_file_wrapper_bo, tree_node_bos)
 
         # If we got a first pass LI graph, we need to link its object codes.
         if (not self.getFirstPassLIGraph is None):
@@ -371,11 +483,6 @@ class BSVSynthTreeBuilder():
             env.Depends(link_lim_user_objs, tree_file_wrapper_bo)
 
 
-        # the tree_file_wrapper build needs all the wrapper bo from the user program,
-        # but not the top level build.
-        top_bo = moduleList.topModule.moduleDependency['BSV_BO']
-        all_bo = moduleList.getAllDependencies('BO')
-
         env.Depends(tree_file_wrapper_bo, all_bo)
 
         tree_synth_command = self.parent.compile_bo_bsc_base([tree_file_synth_bo_path], get_build_path(moduleList, moduleList.topModule)) + ' ' + tree_file_synth.path
@@ -506,7 +613,10 @@ class BSVSynthTreeBuilder():
         for module in sorted(liGraph.graph.nodes(), key=lambda module: module.name):
             wrapper_handle.write('import ' + module.name + '_Wrapper::*;\n')
 
-        wrapper_handle.write('module mk_empty_Wrapper#(Reset baseReset) (SOFT_SERVICES_SYNTHESIS_BOUNDARY#(0,0,0,0,0,0,0, Empty)); return ?; endmodule\n')
+        # When the tree is split, the root's imports of tree node packages
+        # are known only after the cut and must precede any definition.
+        if (not self.splitTreeFiles):
+            wrapper_handle.write(emptyWrapper)
 
         if (pipeline_debug != 0):
             print "LIGraph: " + str(liGraph)
@@ -542,15 +652,36 @@ class BSVSynthTreeBuilder():
                 liGraph.mergeModules([LIModule("empty", "empty")])
 
             state['empty_count'] = 0
+            state['node_digests'] = {}
+
+            # A stable tree build starts from the previous build's tree,
+            # repairing it for added and removed modules, so that an edit
+            # changes only the tree nodes on the paths to the edited
+            # modules.  Area group builds derive the tree from placement
+            # instead.
+            previous_tree = None
+            if (self.stableTree and (not area_constraints)):
+                previous_tree = self.loadTreeRecord(state)
+                if (not previous_tree is None):
+                    top_module = self.repairTree(state, liGraph, previous_tree['shape'], module_names)
 
             # Cut the build into a tree of merged wrappers.  We could merge
             # all of them in a single level, but the Bluespec compiler winds
             # up being too slow.  A hierarchy compiles more efficiently.
-            top_module = self.cutRecurse(state, liGraph, 1, module_names)
+            if (top_module is None):
+                top_module = self.cutRecurse(state, liGraph, 1, module_names)
+
+            if (self.splitTreeFiles):
+                if (isinstance(top_module, TreeModule)):
+                    self.writeTreeNodeImports(wrapper_handle, top_module.children)
+                wrapper_handle.write(emptyWrapper)
 
             # Generate the code for the cut tree.
             self.emitWrappersRecurse(state, top_module, 1)
 
+            if (self.stableTree and (not area_constraints)):
+                self.storeTreeRecord(state, top_module, previous_tree)
+
             # walk the top module to annotate area group paths
             def annotateAreaGroups(treeModule, verilogPath):
                 if (isinstance(treeModule, TreeModule)):
@@ -599,11 +730,18 @@ class BSVSynthTreeBuilder():
         # reorganize the multifpga compiler.
 
         for module in module_names:
-            wrapper_handle.write("\n\n(*synthesize*)\n")
-            wrapper_handle.write("module mk_" + module + '_Wrapper' + " (Reg#(Bit#(1)));\n")
-            wrapper_handle.write("    let m <- mkRegU();\n")
-            wrapper_handle.write("    return m;\n")
-            wrapper_handle.write("endmodule\n")
+            dummy_handle = wrapper_handle
+            if (self.splitTreeFiles and (module != "build_tree")):
+                dummy_handle = StringIO.StringIO()
+
+            dummy_handle.write("\n\n(*synthesize*)\n")
+            dummy_handle.write("module mk_" + module + '_Wrapper' + " (Reg#(Bit#(1)));\n")
+            dummy_handle.write("    let m <- mkRegU();\n")
+            dummy_handle.write("    return m;\n")
+            dummy_handle.write("endmodule\n")
+
+            if (dummy_handle != wrapper_handle):
+                self.writeTreeNodeFile(state, module, [], dummy_handle.getvalue())
 
         # we need to create a top level wrapper module to
         # re-monadize the soft connections so that the platform
@@ -659,7 +797,7 @@ class BSVSynthTreeBuilder():
                     state['empty_count'] = state['empty_count'] + 1
                     return TreeModule("empty", name)
                 else:
-                    return subgraph.graph.nodes()[0]
+                    return leafModule(subgraph.graph.nodes()[0])
             elif (len(subgraph.graph.nodes()) != 0):
                 # Top module is never passed in as a singleton.  This code
                 # Should never be reached.
@@ -675,31 +813,49 @@ class BSVSynthTreeBuilder():
         ## synthesis boundaries.  In theory, the area group partitioning
         ## should already have accounted for inter-module connections.
         ##
+        ## Without area groups the tree may have a fanout above two.  Wide
+        ## nodes are split by the multilevel k-way partitioner, which
+        ## balances the compile cost of the subtrees while minimizing the
+        ## channel weight between them.
+        ##
         if state['area_constraints']:
-            map = li_module.placement_cut(subgraph.graph, state['area_constraints'])
+            map = li_module.placement_cut(subgraph.graph, state['area_constraints'], self.treeFanout)
+        elif ((self.treeFanout > 2) or (self.cutAlgorithm == 'MULTILEVEL')):
+            partitionStart = time.time()
+            map = li_module.multilevelPartition(subgraph.graph,
+                                                weights = subgraph.weights,
+                                                parts = self.treeFanout,
+                                                imbalance = self.partitionImbalance)
+            if (self.partitionReport or (pipeline_debug != 0)):
+                print "Partition of " + str(len(subgraph.modules)) + " modules (%.3fs): " % (time.time() - partitionStart) + \
+                      li_module.partitionReport(subgraph.graph, map, weights = subgraph.weights)
         else:
-            map = li_module.min_cut(subgraph.graph)
+            map = li_module.min_cut(subgraph.graph,
+                                    weights = subgraph.weights,
+                                    algorithm = self.cutAlgorithm,
+                                    balance = self.cutBalance,
+                                    trials = self.cutTrials)
 
         if (pipeline_debug != 0):
             print "Cut map: " + str(map)
 
-        ## Now that we've got a cut, Build new li graphs from the sub
-        ## components of original graph. We must be careful because some
-        ## modules may not have internal channels, only external channels.
-        ## Thus for each module we add an optional, dummy edge to ensure
-        ## that the partitioned graphs are constructed correctly.
-
-        graph0Connections = []
-        graph1Connections = []
+        ## Now that we've got a cut, take views of the parts of the
+        ## original graph.  Views share the graph's modules and
+        ## connections, so nothing is copied until a part is down to a
+        ## single module, which becomes a leaf (see leafModule()).
+        ## Modules without connections contribute nothing to the tree and
+        ## are dropped.
 
-        for connection in subgraph.getChannels() + subgraph.getChains() + subgraph.getServices():
-            connectionSet = graph0Connections
-            if (map[connection.module] == 1):
-                connectionSet = graph1Connections
-            connectionSet += [connection.copy()]
+        # Number the parts densely.  Small graphs may leave some of the
+        # requested parts unused.  A node always has at least two
+        # children, though, even if some are empty: an empty graph must
+        # still produce a (vestigial) tree node.
+        partIds = sorted(set(map.values()))
+        partModules = [[] for part in range(max(2, len(partIds)))]
 
-        graph0 = LIGraph(graph0Connections)
-        graph1 = LIGraph(graph1Connections)
+        for module in subgraph.modules.values():
+            if (hasConnections(module)):
+                partModules[partIds.index(map[module])].append(module)
 
         # Pick a name for the local module.
         localModule = moduleNames.pop()
@@ -709,21 +865,16 @@ class BSVSynthTreeBuilder():
         # below the current node.  And so we recurse.  If only one
         # module remains in the cut graph, there is no need to recurse
         # and we just use that module.
-        submodule0 = None
-        if(len(graph0.modules) == 1):
-            submodule0 = graph0.modules.values()[0]
-        else:
-            submodule0 = self.cutRecurse(state, graph0, 0, moduleNames)
-
-        submodule1 = None
-        if(len(graph1.modules) == 1):
-            submodule1 = graph1.modules.values()[0]
-        else:
-            submodule1 = self.cutRecurse(state, graph1, 0, moduleNames)
+        submodules = []
+        for modules in partModules:
+            if(len(modules) == 1):
+                submodules.append(leafModule(modules[0]))
+            else:
+                submodules.append(self.cutRecurse(state, li_module.LIGraphView(subgraph, modules), 0, moduleNames))
 
         # Build a representation of the new liModule we are about to construct.
         treeModule = TreeModule("node", localModule)
-        treeModule.children = [submodule0, submodule1]
+        treeModule.children = submodules
         
         return treeModule
     # END OF cutRecurse
@@ -736,7 +887,6 @@ class BSVSynthTreeBuilder():
     ##
     def emitWrappersRecurse(self, state, treeModule, isTopModule):
         pipeline_debug = self.parent.pipeline_debug
-        wrapper_handle = state['wrapper_handle']
         area_constraints = state['area_constraints']
         moduleList = state['moduleList']
 
@@ -757,9 +907,13 @@ class BSVSynthTreeBuilder():
         if ((treeModule.children is None) or (len(treeModule.children) == 0)):
             return
 
-        # The tree is binary.  If this line triggers a ValueError then there
-        # is a bug in the binary tree construction.
-        submodule0, submodule1 = treeModule.children
+        # The tree may have any fanout (BUILD_TREE_FANOUT).
+        submodules = treeModule.children
+
+        # The node is generated into a buffer, and written out once
+        # complete.  Split trees write all but the root node to their own
+        # package.
+        wrapper_handle = StringIO.StringIO()
 
         # In order to generate the module, we need a type,
         # but we can only get it after analyzing the module pair
@@ -768,7 +922,7 @@ class BSVSynthTreeBuilder():
 
         # Instantiate the submodules.
         r_idx = 0
-        for m in [submodule0, submodule1]:
+        for m in submodules:
             name = m.name
             module_name = name
 
@@ -789,72 +943,94 @@ class BSVSynthTreeBuilder():
                             getInstanceName(name) + ".services);\n"
             module_body += "\n";
 
-        # At this node in the tree, we can match channels from our two children.
+        # At this node in the tree, we can match channels among our children.
         # This matching is what reduces the bluespec compiler complexity, since matched
         # channels do not need to be propagated upward.
 
         matched = {} # Use a hash to detect matching
 
-        # handle matching channels
-        for channel in submodule0.channels:
-            for partnerChannel in submodule1.channels:
-                if (channel.matches(partnerChannel)):
-                    if (pipeline_debug != 0):
-                        print "Found match with " + str(partnerChannel)
-                    matched[channel.name] = channel
-
-                    if (channel.isSource()):
-                        c_out = channel
-                        c_in = partnerChannel
-                    else:
-                        c_out = partnerChannel
-                        c_in = channel
-
-                    # Buffering between out and in depends on distance
-                    n_buf = 0
-                    if (area_constraints):
-                        if (pipeline_debug != 0):
-                            print "Channel (" + c_out.name + ") " + c_out.root_module_name + " -> " + c_in.root_module_name + ": " + c_out.module_name + " -> " + c_in.module_name
-                        area_groups = area_constraints.constraints
-                        n_buf = area_constraints.numLIChannelBufs(area_groups[c_out.root_module_name],
-                                                                  area_groups[c_in.root_module_name])
-
-                    module_body += "    connectOutToIn(" + c_out.module_name + ".outgoing[" + str(c_out.module_idx) + "], " +\
-                                   c_in.module_name + ".incoming[" + str(c_in.module_idx) + "], " +\
-                                   str(n_buf) +\
-                                   ");// " + c_out.name + "\n"
-
-        #handle matching chains
-        for chain in submodule0.chains:
-            for partnerChain in submodule1.chains:
-                if (chain.matches(partnerChain)):
-                    if (pipeline_debug != 0):
-                        print "Found match with " + str(partnerChain)
-                    matched[chain.name] = chain
-                    chain.sinkPartnerChain = partnerChain
-                    chain.sourcePartnerChain = chain
-
-                    # Buffering between out and in depends on distance
-                    n_buf = 0
-                    if (area_constraints):
-                        if (pipeline_debug != 0):
-                            print "Chain (" + chain.name + ") " + chain.chain_root_out + " -> " + partnerChain.chain_root_in + ": " + chain.module_name + " -> " + partnerChain.module_name
-
-                        area_groups = area_constraints.constraints
-                        n_buf = area_constraints.numLIChannelBufs(area_groups[chain.chain_root_out],
-                                                                  area_groups[partnerChain.chain_root_in])
-
-                    module_body += "    connectOutToIn(" + chain.module_name + ".chains[" + str(chain.module_idx) + "].outgoing, " +\
-                                   partnerChain.module_name + ".chains[" + str(partnerChain.module_idx) + "].incoming, " +\
-                                   str(n_buf) +\
-                                   ");// " + chain.name + "\n"
+        # handle matching channels.  Candidate partners are found by
+        # name instead of comparing every pair of channels.
+        channelPairs = []
+        for idx in range(len(submodules)):
+            for partnerIdx in range(idx + 1, len(submodules)):
+                channelPairs += li_module.matchingPairs(submodules[idx].channels, submodules[partnerIdx].channels)
+
+        for (channel, partnerChannel) in channelPairs:
+            if (pipeline_debug != 0):
+                print "Found match with " + str(partnerChannel)
+            matched[channel.name] = channel
+
+            if (channel.isSource()):
+                c_out = channel
+                c_in = partnerChannel
+            else:
+                c_out = partnerChannel
+                c_in = channel
+
+            # Buffering between out and in depends on distance
+            n_buf = 0
+            if (area_constraints):
+                if (pipeline_debug != 0):
+                    print "Channel (" + c_out.name + ") " + c_out.root_module_name + " -> " + c_in.root_module_name + ": " + c_out.module_name + " -> " + c_in.module_name
+                area_groups = area_constraints.constraints
+                n_buf = area_constraints.numLIChannelBufs(area_groups[c_out.root_module_name],
+                                                          area_groups[c_in.root_module_name])
+
+            module_body += "    connectOutToIn(" + c_out.module_name + ".outgoing[" + str(c_out.module_idx) + "], " +\
+                           c_in.module_name + ".incoming[" + str(c_in.module_idx) + "], " +\
+                           str(n_buf) +\
+                           ");// " + c_out.name + "\n"
+
+        # handle matching chains.  A chain passing through several
+        # children is connected from each child to the next child, in
+        # child order, that carries the same chain.  The first segment
+        # supplies the chain's exposed incoming half and the last segment
+        # its outgoing half.
+        chainPairs = []
+        chainHeads = {}
+        chainTails = {}
+        for idx in range(len(submodules)):
+            for chain in submodules[idx].chains:
+                for partnerIdx in range(idx + 1, len(submodules)):
+                    partnerChains = [partnerChain for (ignore, partnerChain) in li_module.matchingPairs([chain], submodules[partnerIdx].chains)]
+                    if (len(partnerChains) == 0):
+                        continue
+                    for partnerChain in partnerChains:
+                        chainPairs.append((chain, partnerChain))
+                        if (not chain.name in chainHeads):
+                            chainHeads[chain.name] = chain
+                        chainTails[chain.name] = submodules[partnerIdx]
+                    break
+
+        for (chain, partnerChain) in chainPairs:
+            if (pipeline_debug != 0):
+                print "Found match with " + str(partnerChain)
+            matched[chain.name] = chain
+            chain.sinkPartnerChain = partnerChain
+            chain.sourcePartnerChain = chain
+
+            # Buffering between out and in depends on distance
+            n_buf = 0
+            if (area_constraints):
+                if (pipeline_debug != 0):
+                    print "Chain (" + chain.name + ") " + chain.chain_root_out + " -> " + partnerChain.chain_root_in + ": " + chain.module_name + " -> " + partnerChain.module_name
+
+                area_groups = area_constraints.constraints
+                n_buf = area_constraints.numLIChannelBufs(area_groups[chain.chain_root_out],
+                                                          area_groups[partnerChain.chain_root_in])
+
+            module_body += "    connectOutToIn(" + chain.module_name + ".chains[" + str(chain.module_idx) + "].outgoing, " +\
+                           partnerChain.module_name + ".chains[" + str(partnerChain.module_idx) + "].incoming, " +\
+                           str(n_buf) +\
+                           ");// " + chain.name + "\n"
 
 
         # Stick the remaining connections of child modules
         # into the interface of this new module.  Include
         # any chains.  we need to check chains for a match
         # so that we get the routing right.  if matched,
-        # ingress will be module0 and egress will be module1
+        # ingress will be the first segment and egress the last.
         
         incoming = 0
         outgoing = 0
@@ -866,15 +1042,15 @@ class BSVSynthTreeBuilder():
         # To do this we populate the LI module representing this node with the unmatched
         # channels of the child node.
         if (pipeline_debug != 0):
-            for channel in submodule0.channels:
-                print "Channel in " + submodule0.name + " " + str(channel)
-            for channel in submodule1.channels:
-                print "Channel in " + submodule1.name + " " + str(channel)
-
-        for channel in submodule0.channels + submodule1.channels:
-            channelCopy = channel.copy()
+            for submodule in submodules:
+                for channel in submodule.channels:
+                    print "Channel in " + submodule.name + " " + str(channel)
 
+        for channel in sum([submodule.channels for submodule in submodules], []):
             if (not channel.name in matched):
+                # addChannel() adds a copy of the channel.
+                channelCopy = treeModule.addChannel(channel)
+
                 if (channel.isSource()):
                     sizeName = "sz_" + channel.module_name + "_" + channel.name + "_" + str(channel.module_idx)
                     module_body += "    NumTypeParam#(" + str(channel.bitwidth) + ") " + sizeName + " = ?;\n"
@@ -892,15 +1068,14 @@ class BSVSynthTreeBuilder():
                 # module so that our parent will refer to us
                 # correctly
                 channelCopy.module_name = treeModule.name
-                treeModule.addChannel(channelCopy)
 
         # Chains are always propagated up, but they can also
         # be matched. In this case, we must use a portion of
         # each child module's chain.
 
-        for chain in submodule0.chains + submodule1.chains:
+        for chain in sum([submodule.chains for submodule in submodules], []):
             chainCopy = chain.copy()
-            if (not (chain.name in matched)):
+            if (not (chain.name in chainHeads)):
                 # need to add both incoming and outgoing
                 sizeName = "sz_" + chain.module_name + "_" + chain.name + "_" + str(chain.module_idx)
                 module_body += "    NumTypeParam#(" + str(chain.bitwidth) + ") " + sizeName + " = ?;\n"
@@ -914,11 +1089,12 @@ class BSVSynthTreeBuilder():
                 chains = chains + 1
 
             else:
-                # We see matched chains twice, but we should only emit code once.
-                if ((chain.module_name == submodule1.name)):
+                # We see matched chains once per segment, but we should only
+                # emit code once.
+                if ((chain.module_name == chainTails[chain.name].name)):
                     # Need to get form a chain based on the combination of the
-                    # two modules.
-                    chain0 = matched[chain.name]
+                    # first and last segments.
+                    chain0 = chainHeads[chain.name]
 
                     # The chain is partially connected.  The exposed in/out
                     # halves now come from different modules.
@@ -936,7 +1112,7 @@ class BSVSynthTreeBuilder():
                     chains = chains + 1
        
         # Propagate all service connections
-        for service in submodule0.services + submodule1.services:
+        for service in sum([submodule.services for submodule in submodules], []):
             serviceCopy = service.copy()
             if (service.isClient()):
                 sizeName = "sz_" + service.module_name + "_" + service.name + "_client_" + str(service.module_idx)
@@ -1061,9 +1237,248 @@ class BSVSynthTreeBuilder():
         wrapper_handle.write("    interface device = ?;//e2;\n")
         wrapper_handle.write("endmodule\n")
 
+        node_code = wrapper_handle.getvalue()
+        if ('node_digests' in state):
+            state['node_digests'][treeModule.name] = hashlib.md5(node_code).hexdigest()
+
+        if (self.splitTreeFiles and (treeModule.name != "build_tree")):
+            self.writeTreeNodeFile(state, treeModule.name, submodules, node_code)
+        else:
+            state['wrapper_handle'].write(node_code)
+
         if (pipeline_debug != 0):
             for channel in treeModule.channels:
                 print "Channel in " + treeModule.name + " " + str(channel)
 
         return
     # END OF emitWrappersRecurse
+
+
+    ##
+    ## repairTree --
+    ##   Rebuild the previous build's tree (see treeShape()) for the
+    ##   current LI graph.  Modules that have disappeared are pruned,
+    ##   collapsing nodes left with a single child.  New modules are then
+    ##   inserted one at a time: starting at the root, descend into the
+    ##   child subtree with the heaviest connections to the new module
+    ##   (the smallest on ties) until reaching a leaf, and either add the
+    ##   module beside the leaf, if the node has room, or pair the two
+    ##   under a new node.
+    ##
+    ##   Nodes keep their previous names when these are still available.
+    ##   Returns None, leaving moduleNames untouched, if too little of the
+    ##   previous tree survives.
+    ##
+    def repairTree(self, state, liGraph, shape, moduleNames):
+        # Leaves are built as cutRecurse builds them.
+        leaves = {}
+        for module in liGraph.modules.values():
+            if (hasConnections(module)):
+                leaves[module.name] = leafModule(module)
+
+        def prune(node):
+            if (isinstance(node, basestring)):
+                return node if (node in leaves) else None
+            (name, children) = node
+            children = [child for child in map(prune, children) if (not child is None)]
+            if (len(children) == 0):
+                return None
+            if (len(children) == 1):
+                return children[0]
+            return [name, children]
+
+        root = prune(shape)
+        if ((root is None) or isinstance(root, basestring)):
+            return None
+        root[0] = "build_tree"
+
+        # Undirected connection weights between modules, by name.
+        adjacency = {}
+        for ((source, sink), weight) in liGraph.weights.items():
+            for (u, v) in [(source.name, sink.name), (sink.name, source.name)]:
+                if (not u in adjacency):
+                    adjacency[u] = {}
+                adjacency[u][v] = adjacency[u].get(v, 0) + weight
+
+        # Each node's parent and number of leaves.  Leaves are keyed by
+        # name and inner nodes by identity.
+        def nodeKey(node):
+            if (isinstance(node, basestring)):
+                return node
+            return id(node)
+
+        parentOf = {}
+        leafCount = {}
+        def indexSubtree(node):
+            if (isinstance(node, basestring)):
+                leafCount[node] = 1
+                return
+            for child in node[1]:
+                parentOf[nodeKey(child)] = node
+                indexSubtree(child)
+            leafCount[id(node)] = sum([leafCount[nodeKey(child)] for child in node[1]])
+
+        indexSubtree(root)
+
+        for name in sorted(leaves.keys()):
+            if (name in leafCount):
+                continue
+
+            # Weight of the new module's connections into each subtree,
+            # summed up the paths from its neighbors already in the tree.
+            connection = {}
+            for (neighbor, weight) in adjacency.get(name, {}).iteritems():
+                if (not neighbor in leafCount):
+                    continue
+                key = neighbor
+                while (True):
+                    connection[key] = connection.get(key, 0) + weight
+                    if (not key in parentOf):
+                        break
+                    key = id(parentOf[key])
+
+            node = root
+            path = [root]
+            while (True):
+                def score(idx):
+                    key = nodeKey(node[1][idx])
+                    return (connection.get(key, 0), -leafCount[key], -idx)
+                best = max(range(len(node[1])), key=score)
+                if (not isinstance(node[1][best], basestring)):
+                    node = node[1][best]
+                    path.append(node)
+                    continue
+
+                if (len(node[1]) < self.treeFanout):
+                    node[1].append(name)
+                    parentOf[name] = node
+                else:
+                    pair = [None, [node[1][best], name]]
+                    node[1][best] = pair
+                    parentOf[id(pair)] = node
+                    parentOf[pair[1][0]] = pair
+                    parentOf[name] = pair
+                    leafCount[id(pair)] = 2
+                leafCount[name] = 1
+                for ancestor in path:
+                    leafCount[id(ancestor)] += 1
+                break
+
+        # Assign names.  Previous names are kept if they are still in
+        # use; new nodes, and nodes whose names are no longer available,
+        # take unused names.
+        def treeNodes(node):
+            if (isinstance(node, basestring)):
+                return []
+            return [node] + sum([treeNodes(child) for child in node[1]], [])
+
+        nodes = treeNodes(root)
+        for node in nodes:
+            if (node[0] in moduleNames):
+                moduleNames.remove(node[0])
+            else:
+                node[0] = None
+        for node in nodes:
+            if (node[0] is None):
+                node[0] = moduleNames.pop()
+
+        def build(node):
+            if (isinstance(node, basestring)):
+                return leaves[node]
+            treeModule = TreeModule("node", node[0])
+            treeModule.children = map(build, node[1])
+            return treeModule
+
+        return build(root)
+    # END OF repairTree
+
+
+    ##
+    ## loadTreeRecord --
+    ##   Load the tree record of the previous build, if it is usable.
+    ##
+    def loadTreeRecord(self, state):
+        if (not os.path.exists(state['tree_record'])):
+            return None
+
+        try:
+            recordHandle = open(state['tree_record'], 'rb')
+            record = pickle.load(recordHandle)
+            recordHandle.close()
+        except Exception:
+            print "Warning: ignoring unreadable build tree record " + state['tree_record']
+            return None
+
+        # A tree of a different fanout is not worth repairing.
+        if (record['fanout'] != self.treeFanout):
+            return None
+
+        return record
+
+
+    ##
+    ## storeTreeRecord --
+    ##   Record the tree for the next build, along with a digest of each
+    ##   tree node's wrapper code.  Comparing digests with the previous
+    ##   record measures how many tree nodes, and hence how many wrapper
+    ##   compilations, an edit disturbed.
+    ##
+    def storeTreeRecord(self, state, top_module, previous_tree):
+        if (not isinstance(top_module, TreeModule)):
+            return
+
+        digests = state['node_digests']
+        if (not previous_tree is None):
+            changed = [name for name in digests if (previous_tree['digests'].get(name) != digests[name])]
+            print "Build tree: " + str(len(changed)) + " of " + str(len(digests)) + " tree nodes changed"
+            if (self.parent.pipeline_debug != 0):
+                print "Build tree changed nodes: " + str(sorted(changed))
+
+        record = {'fanout': self.treeFanout,
+                  'shape': treeShape(top_module),
+                  'digests': digests}
+
+        recordHandle = open(state['tree_record'], 'wb')
+        pickle.dump(record, recordHandle, protocol=-1)
+        recordHandle.close()
+
+
+    ##
+    ## writeTreeNodeImports --
+    ##   Import the packages of tree node children.  Leaf wrappers are
+    ##   imported by every tree file.
+    ##
+    def writeTreeNodeImports(self, handle, children):
+        for child in children:
+            if (isinstance(child, TreeModule) and (child.type != "empty")):
+                handle.write('import ' + getTreeNodePackage(child.name) + '::*;\n')
+
+
+    ##
+    ## writeTreeNodeFile --
+    ##   Write a tree node to its own package.  Only the node's wrapper is
+    ##   exported, so that local helpers such as mk_empty_Wrapper do not
+    ##   collide in the packages importing this one.
+    ##
+    def writeTreeNodeFile(self, state, name, children, moduleCode):
+        node_handle = open(state['tree_node_files'][name].path, 'w')
+        node_handle.write("// Generated by BSVSynthTreeBuilder.py\n")
+        node_handle.write("`ifndef BUILD_" + name + "\n")
+        node_handle.write("`define BUILD_" + name + "\n")
+        node_handle.write('import Vector::*;\n')
+        wrapper_gen_tool.generateWellKnownIncludes(node_handle)
+        node_handle.write('// import non-synthesis public files\n')
+        node_handle.write('`include "build_tree_compile.bsv"\n')
+
+        for child in children:
+            if (not isinstance(child, TreeModule)):
+                node_handle.write('import ' + child.name + '_Wrapper::*;\n')
+        self.writeTreeNodeImports(node_handle, children)
+
+        node_handle.write('export mk_' + name + '_Wrapper;\n')
+        if (len([child for child in children if (child.type == "empty")]) > 0):
+            node_handle.write(emptyWrapper)
+
+        node_handle.write(moduleCode)
+        node_handle.write("`endif\n")
+        node_handle.close()
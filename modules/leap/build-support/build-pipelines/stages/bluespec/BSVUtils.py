@@ -69,13 +69,13 @@ def get_bluespec_xcf(env):
 ##
 def getBluespecVersion():
     if not hasattr(getBluespecVersion, 'version'):
-        bsc_ostream = os.popen('bsc -verbose')
+        getBluespecVersion.version = 0
+        bsc_output = model.toolProbe('bsc -verbose', envVars=['BLUESPECDIR'])
         ver_regexp = re.compile('^Bluespec Compiler, version.*\(build ([0-9]+),')
-        for ln in bsc_ostream.readlines():
+        for ln in bsc_output.splitlines(True):
             m = ver_regexp.match(ln)
             if (m):
                 getBluespecVersion.version = int(m.group(1))
-        bsc_ostream.close()
 
         if getBluespecVersion.version == 0:
             print "Failed to get Bluespec compiler version"
@@ -0,0 +1,134 @@
+#
+# Stand-in for bluetcl, for checking the introspection scripts without a
+# Bluespec installation (see introspectCheck.py):
+#
+#   tclsh bluetclStandIn.tcl <script> [-quiet] [--] <script arguments>
+#
+# The script runs in a plain tclsh providing the Bluetcl, utils and
+# portUtil commands the scripts use.  Module queries are answered from
+# the synthetic modules described below.  Every launch is appended to
+# the file named by $BLUETCL_STANDIN_LOG, if set.
+#
+
+set script [lindex $argv 0]
+set argv [lrange $argv 1 end]
+set quiet [lsearch -exact $argv -quiet]
+if {$quiet >= 0} {
+    set argv [lreplace $argv $quiet $quiet]
+}
+if {[lindex $argv 0] == "--"} {
+    set argv [lrange $argv 1 end]
+}
+set argc [llength $argv]
+set argv0 $script
+
+if {! [info exists ::env(BLUESPECDIR)]} {
+    set ::env(BLUESPECDIR) /opt/bluespec
+}
+
+if {[info exists ::env(BLUETCL_STANDIN_LOG)]} {
+    set logHandle [open $::env(BLUETCL_STANDIN_LOG) a]
+    puts $logHandle "[file tail $script] $argv"
+    close $logHandle
+}
+
+#
+# Synthetic modules mk_m<n>_Wrapper:  methods with and without arguments,
+# a subinterface and a Vector of Clocks.  mk_bad_Wrapper holds a
+# primary type the interface analysis does not handle.
+#
+set TYPES(Clock) {Primary Clock}
+set TYPES(Foo) {Primary Foo}
+set TYPES(Vector#(2,\ Clock)) {Vector {Vector#(2, Clock)} {width 2} {elem Clock}}
+set TYPES(Vector#(1,\ Foo)) {Vector {Vector#(1, Foo)} {width 1} {elem Foo}}
+
+foreach n {0 1 2 3} {
+    set mod mk_m${n}_Wrapper
+    set TYPES(Ifc$n) [list Interface Ifc$n [list members [list \
+        {method {{Bit#(8)} first {}}} \
+        {method {Action enq {{Bit#(8)} {Bool}}}} \
+        [list interface Sub$n sub] \
+        {interface {Vector#(2, Clock)} clks}]]]
+    set TYPES(Sub$n) [list Interface Sub$n {members {{method {Action go {}}}}}]
+
+    set MODULES($mod,ifc) Ifc$n
+    set MODULES($mod,ports) [list {clock CLK} [list interface [list \
+        [list method first {clock CLK} {reset RST_N} [list ready RDY_first] [list result first_$n]] \
+        {method enq {clock CLK} {reset RST_N} {ready RDY_enq} {enable EN_enq} {args {{{name a} {port enq_1}} {{name b} {port enq_2}}}}} \
+        {interface sub {{method sub_go {clock CLK} {enable EN_sub_go}}}} \
+        {interface clks {{clock clks_0 {osc CLK_clks_0} {gate CLK_GATE_clks_0}} {clock clks_1 {osc CLK_clks_1} {gate CLK_GATE_clks_1}}}}]]]
+    set MODULES($mod,methods) {{first} {enq} {sub {{sub_go}}} {clks {{clks_0} {clks_1}}}}
+    set MODULES($mod,sched) [list [list first [list {first CF} {enq <} [list enq <R] {x >} {y >R}]] \
+                                 [list enq [list {enq C} "first_$n SB"]]]
+    set MODULES($mod,path) [list [list {first RDY_first} EN_enq] [list [list a$n] b$n]]
+}
+
+set mod mk_bad_Wrapper
+set TYPES(IfcBad) {Interface IfcBad {members {{interface {Vector#(1, Foo)} foos}}}}
+set MODULES($mod,ifc) IfcBad
+set MODULES($mod,ports) {{interface {{interface foos {{clock foos_0 {osc X}}}}}}}
+set MODULES($mod,methods) {{foos {{foos_0}}}}
+set MODULES($mod,sched) {}
+set MODULES($mod,path) {}
+
+namespace eval ::Bluetcl {
+    namespace export module schedule type flags
+
+    proc flags {args} {
+    }
+
+    proc module {command mod} {
+        if {! [info exists ::MODULES($mod,ifc)]} {
+            error "Module $mod not found"
+        }
+        switch -exact $command {
+            "load"    { return }
+            "ports"   { return $::MODULES($mod,ports) }
+            "methods" { return $::MODULES($mod,methods) }
+            "ifc"     { return $::MODULES($mod,ifc) }
+        }
+        error "module $command is not supported"
+    }
+
+    proc schedule {command mod} {
+        switch -exact $command {
+            "methodinfo" { return $::MODULES($mod,sched) }
+            "pathinfo"   { return $::MODULES($mod,path) }
+        }
+        error "schedule $command is not supported"
+    }
+
+    proc type {command t} {
+        return $::TYPES($t)
+    }
+}
+
+namespace eval ::utils {
+    proc scanOptions {boolOptions valOptions flag arrayName argv} {
+        upvar #0 $arrayName OPT
+        foreach b $boolOptions {
+            set OPT($b) 0
+        }
+        for {set i 0} {$i < [llength $argv]} {incr i} {
+            set a [lindex $argv $i]
+            if {[lsearch -exact $valOptions $a] >= 0} {
+                incr i
+                set OPT($a) [lindex $argv $i]
+            } elseif {[lsearch -exact $boolOptions $a] >= 0} {
+                set OPT($a) 1
+            } else {
+                error "Unknown option $a"
+            }
+        }
+    }
+}
+
+namespace eval ::portUtil {
+    proc processSwitches {args} {
+    }
+}
+
+package provide utils 1.0
+package provide portUtil 1.0
+
+source $script
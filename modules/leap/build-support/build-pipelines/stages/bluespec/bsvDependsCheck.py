@@ -0,0 +1,305 @@
+##
+## Differential check of the Bluespec dependence scanner (BSVDepends.py)
+## against leap-bsc-mkdepend, the per-module script it replaced.  bsc,
+## iverilog and ivlpp are played by bsvToolStandIn.py.
+##
+## Random source trees are written to a scratch directory:  modules of
+## Bluespec packages importing each other in the forms found in LEAP
+## sources (comments, attributes, BDPI and library imports, imports in
+## `ifdef branches) and shared include files guarded by `ifndef.  For
+## every module leap-bsc-mkdepend writes the .depends-bsv file the build
+## used to write, and its rules are compared with the section
+## BSVDepends.writeDependenceDB() writes for the module.
+##
+## The sources stay within the preprocessor subset BSVDepends handles.
+## Where ivlpp differs, so may the dependence found:  macros are not
+## expanded (e.g. an import or `include naming a macro) and directives
+## are only recognized at the start of a line.
+##
+## With -time, the scanner alone is timed on a larger tree:  a full
+## scan, a scan of the unchanged tree and a scan after one file changed,
+## along with the number of per-module preprocessor runs leap-bsc-mkdepend
+## would have made.  Run it from any directory, with perl on the path:
+##
+##   python bsvDependsCheck.py [trees] [modules]
+##   python bsvDependsCheck.py -time [modules]
+##
+
+import os
+import imp
+import sys
+import time
+import random
+import shutil
+import tempfile
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STAND_IN = os.path.join(SCRIPT_DIR, 'bsvToolStandIn.py')
+MKDEPEND = os.path.join(SCRIPT_DIR, '..', '..', '..', '..', '..', '..', 'tools', 'scripts', 'leap-bsc-mkdepend')
+
+sys.path.insert(0, SCRIPT_DIR)
+
+# The project sources form the build's model package (site_scons/model),
+# whose __init__ imports each of them.
+if (not 'model' in sys.modules):
+    sys.modules['model'] = imp.new_module('model')
+    sys.modules['model'].__path__ = [os.path.join(SCRIPT_DIR, '..', '..', '..', 'project')]
+
+import model.ToolProbes
+for name in dir(model.ToolProbes):
+    if (not name.startswith('_')):
+        setattr(sys.modules['model'], name, getattr(model.ToolProbes, name))
+
+import BSVDepends
+
+PACKAGES = 12
+INCLUDES = 30
+
+
+##
+## standInTools --
+##   Shell wrappers running the stand-in tools, in a directory put at
+##   the front of PATH.
+##
+def standInTools(directory):
+    os.makedirs(directory)
+    for tool in ['bsc', 'iverilog', 'ivlpp']:
+        path = os.path.join(directory, tool)
+        handle = open(path, 'w')
+        handle.write('#!/bin/sh\nexec "%s" "%s" %s "$@"\n' % (sys.executable, STAND_IN, tool))
+        handle.close()
+        os.chmod(path, 0755)
+
+    os.environ['PATH'] = directory + os.pathsep + os.environ['PATH']
+    os.environ['BSV_STANDIN_BIN'] = directory
+
+
+def writeFile(path, text):
+    directory = os.path.dirname(path)
+    if (directory and not os.path.isdir(directory)):
+        os.makedirs(directory)
+    handle = open(path, 'w')
+    handle.write(text)
+    handle.close()
+
+
+def packageName(k, j):
+    return 'Pkg%d_%d' % (k, j)
+
+
+##
+## writeTree --
+##   A source tree of the given number of modules, under directory/tree,
+##   and a Bluespec installation holding the libraries it imports.
+##   Returns the sections of the build, as writeDependenceDB() takes
+##   them, and the -p argument.
+##
+def writeTree(directory, modules, seed):
+    rng = random.Random(seed)
+    bluespecDir = os.path.join(directory, 'bluespec')
+    writeFile(bluespecDir + '/Prelude/Vector.bo', '')
+    writeFile(bluespecDir + '/Libraries/FIFO.bo', '')
+    writeFile(bluespecDir + '/Libraries/StdLib.bsv', 'package StdLib;\nendpackage\n')
+
+    tree = os.path.join(directory, 'tree')
+    for b in range(INCLUDES):
+        body = '`ifndef INC%d\n`define INC%d\n' % (b, b)
+        if ((b > 0) and (rng.random() < 0.5)):
+            body += '`include "awb/provides/inc%d.bsh"\n' % rng.randrange(b)
+        if (rng.random() < 0.3):
+            body += 'import %s::*;\n' % packageName(rng.randrange(modules), rng.randrange(PACKAGES))
+        body += 'typedef Bit#(%d) T%d;\n`endif\n' % (b + 1, b)
+        writeFile(tree + '/hw/include/awb/provides/inc%d.bsh' % b, body)
+
+    for k in range(modules):
+        for j in range(PACKAGES):
+            lines = ['// Package %d %d' % (k, j), 'package %s;' % packageName(k, j), '']
+            for i in range(rng.randrange(6)):
+                name = packageName(rng.randrange(modules), rng.randrange(PACKAGES))
+                lines += rng.choice([['import %s :: * ;' % name],
+                                     ['   import\t%s::*;   // comment import Foo::*;' % name],
+                                     ['/* block', 'import Nope%d::*;' % i, '*/ import %s::*;' % name],
+                                     ['(* synthesize *)', 'import %s::*;' % name],
+                                     ['`ifdef NOT_DEFINED', 'import Missing%d::*;' % i, '`else',
+                                      'import %s::*;' % name, '`endif'],
+                                     ['`include "awb/provides/inc%d.bsh"' % rng.randrange(INCLUDES)],
+                                     ['import "BDPI" function Bit#(32) f%d();' % i, 'import Vector::*;',
+                                      'import FIFO::*;'],
+                                     ['(* doc = "x" ', ' import Hidden%d::*; *) import %s::*;' % (i, name)],
+                                     ['`define LOCAL%d' % i, '`ifdef LOCAL%d' % i, 'import %s::*;' % name,
+                                      '`endif'],
+                                     ['  `ifndef LOCAL%d' % i, 'import %s::*;' % name, '  `endif'],
+                                     ['import StdLib::*;']])
+            if ((k == 1) and (j == 1)):
+                # ivlpp stops at a missing include.
+                lines += ['`include "missing.bsh"', 'import ShouldNotSee::*;']
+            lines += ['module mk%d_%d();' % (k, j), '   Foo x = module y;', 'endmodule', 'endpackage']
+            writeFile(tree + '/hw/mod%d/%s.bsv' % (k, packageName(k, j)), '\n'.join(lines) + '\n')
+
+        # The synthesis boundary source is derived.  Wrappers import
+        # other modules' boundaries.
+        writeFile(tree + '/hw/mod%d/mod%d.bsv' % (k, k), 'import %s::*;\n' % packageName(k, 0))
+        wrapper = ['import %s::*;' % packageName(k, j) for j in range(3)]
+        wrapper += ['import mod%d::*;' % rng.randrange(modules) for i in range(2)]
+        wrapper += ['`include "awb/provides/inc%d.bsh"' % rng.randrange(INCLUDES)]
+        writeFile(tree + '/hw/mod%d/mod%d_Wrapper.bsv' % (k, k), '\n'.join(wrapper) + '\n')
+        writeFile(tree + '/hw/mod%d/mod%d_Log.bsv' % (k, k),
+                  'import %s::*;\n' % packageName(k, rng.randrange(PACKAGES)))
+        if (k % 3 == 0):
+            writeFile(tree + '/hw/mod%d/.ignore' % k, 'hw/mod%d/%s.bsv\n' % (k, packageName(k, 1)))
+        os.makedirs(tree + '/hw/mod%d/.bsc' % k)
+
+    sections = []
+    for k in range(modules):
+        derived = ''.join(['hw/mod%d/mod%d.bsv ' % (c, c) for c in range(modules) if c != k])
+        targets = ['hw/mod%d/mod%d_Wrapper.bsv' % (k, k), 'hw/mod%d/mod%d_Log.bsv' % (k, k)]
+        sections.append(('hw/mod%d/.depends-bsv' % k, targets, derived, 'hw/mod%d/.ignore' % k))
+
+    searchPath = (['hw/mod%d' % k for k in range(modules)] + ['hw/include', 'hw/include/awb/provides'] +
+                  ['hw/mod%d/.bsc' % k for k in range(modules)])
+    return (tree, bluespecDir, sections, '+:' + ':'.join(searchPath))
+
+
+##
+## mkdependRules --
+##   The rules leap-bsc-mkdepend writes for a section, sorted.  Perl
+##   writes them in hash order.
+##
+def mkdependRules(section, pathArg):
+    (name, targets, derived, ignoreFile) = section
+    command = subprocess.Popen(['perl', MKDEPEND, '-ignore', ignoreFile, '-bdir', '.bsc', '-derived', derived,
+                                '-p', pathArg] + targets, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    (output, errors) = command.communicate()
+    if (command.returncode != 0):
+        raise Exception('leap-bsc-mkdepend failed for ' + name + ':\n' + errors)
+    return sorted([ln for ln in output.split('\n') if ln.strip()])
+
+
+##
+## editTree --
+##   Edit a tree between scans:  new imports in packages, new includes in
+##   include files and an include shadowed by one earlier in the search
+##   path.  Scans of the edited files and of the files entering them are
+##   stale.
+##
+def editTree(tree, modules, rng):
+    for i in range(3):
+        k = rng.randrange(modules)
+        handle = open(tree + '/hw/mod%d/%s.bsv' % (k, packageName(k, rng.randrange(PACKAGES))), 'a')
+        handle.write('import %s::*;\n' % packageName(rng.randrange(modules), rng.randrange(PACKAGES)))
+        handle.close()
+    for i in range(2):
+        b = rng.randrange(1, INCLUDES)
+        handle = open(tree + '/hw/include/awb/provides/inc%d.bsh' % b, 'a')
+        handle.write('`include "awb/provides/inc%d.bsh"\n' % rng.randrange(b))
+        handle.close()
+
+    b = rng.randrange(INCLUDES)
+    writeFile(tree + '/hw/mod%d/awb/provides/inc%d.bsh' % (rng.randrange(modules), b),
+              'import %s::*;\n' % packageName(rng.randrange(modules), rng.randrange(PACKAGES)))
+
+
+##
+## checkTree --
+##   Compare the sections of a new tree, then those of the tree after
+##   edits, scanned with the scans of the first.
+##
+def checkTree(directory, modules, seed):
+    (tree, bluespecDir, sections, pathArg) = writeTree(directory, modules, seed)
+    os.environ['BLUESPECDIR'] = bluespecDir
+    rng = random.Random(seed)
+    cwd = os.getcwd()
+    os.chdir(tree)
+    try:
+        differences = []
+        for scan in ['new', 'edited']:
+            if (scan == 'edited'):
+                editTree('.', modules, rng)
+            BSVDepends.writeDependenceDB(BSVDepends.BSV_DEPENDS_DB, sections, pathArg, '.bsc', bluespecDir)
+            db = BSVDepends.loadDependenceDB(BSVDepends.BSV_DEPENDS_DB)
+
+            for section in sections:
+                expected = mkdependRules(section, pathArg)
+                rules = sorted(['%s: %s' % rule for rule in db['sections'][section[0]]])
+                if (rules != expected):
+                    differences.append(section[0] + ' (' + scan + ' tree)')
+    finally:
+        os.chdir(cwd)
+    return differences
+
+
+def checkTrees(workDir, trees, modules):
+    log = os.path.join(workDir, 'ivlpp.log')
+    os.environ['BSV_STANDIN_LOG'] = log
+
+    failures = 0
+    start = time.time()
+    for seed in range(trees):
+        directory = os.path.join(workDir, str(seed))
+        differences = checkTree(directory, modules, seed)
+        shutil.rmtree(directory)
+        if (differences):
+            failures += 1
+            print 'seed ' + str(seed) + ': ' + ', '.join(differences) + ' differ'
+
+    launches = 0
+    if os.path.exists(log):
+        launches = len(open(log).readlines())
+    print '%d trees of %d modules, %d failures (%d leap-bsc-mkdepend preprocessor runs, %.1f seconds)' % \
+          (trees, modules, failures, launches, time.time() - start)
+    return failures
+
+
+##
+## timeScanner --
+##   Times writeDependenceDB() runs, counting the files each section
+##   parses.  leap-bsc-mkdepend ran the preprocessor once for each.
+##
+def timeScanner(workDir, modules):
+    (tree, bluespecDir, sections, pathArg) = writeTree(workDir, modules, 0)
+    os.environ['BLUESPECDIR'] = bluespecDir
+    os.chdir(tree)
+
+    parses = [0]
+    fileDependence = BSVDepends.BSVDependenceScanner.fileDependence
+
+    def countedFileDependence(scanner, fName):
+        parses[0] += 1
+        return fileDependence(scanner, fName)
+
+    BSVDepends.BSVDependenceScanner.fileDependence = countedFileDependence
+
+    def timed(label):
+        parses[0] = 0
+        start = time.time()
+        BSVDepends.writeDependenceDB(BSVDepends.BSV_DEPENDS_DB, sections, pathArg, '.bsc', bluespecDir)
+        print '%s: %.3f seconds, %d preprocessor runs replaced' % (label, time.time() - start, parses[0])
+
+    timed('full scan')
+    timed('unchanged')
+    handle = open('hw/mod3/' + packageName(3, 4) + '.bsv', 'a')
+    handle.write('// edit\n')
+    handle.close()
+    timed('one file changed')
+
+
+def main(argv):
+    workDir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        standInTools(os.path.join(workDir, 'bin'))
+        if ((len(argv) > 1) and (argv[1] == '-time')):
+            timeScanner(workDir, int(argv[2]) if (len(argv) > 2) else 100)
+            return 0
+
+        trees = int(argv[1]) if (len(argv) > 1) else 5
+        modules = int(argv[2]) if (len(argv) > 2) else 6
+        return (checkTrees(workDir, trees, modules) != 0)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workDir)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
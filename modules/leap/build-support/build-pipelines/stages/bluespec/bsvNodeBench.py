@@ -0,0 +1,236 @@
+##
+## Benchmark of the SCons graph of the Bluespec build:  the rules
+## BSV.build_synth_boundary() declares for a synthetic design of many
+## synthesis boundaries, and the null build walking them.
+##
+## Each boundary has a wrapper, a log pass source and one Bluespec
+## source.  The Bluespec compiler and leap-gen-black-box are played by
+## this script, which writes the files the build expects.  Run it with
+## SCons from an empty directory, with the site_scons directory of a
+## configured build (model, li_module, bsv_tool, wrapper_gen_tool, ...)
+## as the site directory:
+##
+##   scons -Q -f <this script> --site-dir=<build>/site_scons [BOUNDARIES=n] [SPECULATE=1] [BSV_DIR=dir]
+##
+## The first run builds the design, later runs are null builds.  Every
+## run prints the size of the graph and the time spent declaring the
+## rules and, from then on, walking the graph.  BSV_DIR names another
+## directory holding BSV.py, e.g. that of an older tree, to compare.
+##
+
+import os
+import sys
+import time
+import types
+import atexit
+import cPickle as pickle
+
+BSC_VERSION = 'Bluespec Compiler, version 2014.07.A (build 34078, 2014-07-30)'
+
+
+##
+## standInCompiler --
+##   bsc:  write the binary of the source and, for a wrapper, the
+##   Verilog, the .ba and the global strings file.  The log pass
+##   (-KILLexpanded) writes nothing and reports no dangling connections.
+##
+def standInCompiler(args):
+    if ('-verbose' in args):
+        print BSC_VERSION
+        return 0
+    if ('-KILLexpanded' in args):
+        return 0
+
+    source = args[-1]
+    bdir = args[args.index('-bdir') + 1]
+    base = os.path.basename(source).replace('.bsv', '')
+    outputs = [base + '.bo']
+    if (base.endswith('_Wrapper')):
+        outputs += ['mk_' + base + '.v', 'mk_' + base + '.ba', base + '.str']
+    for output in outputs:
+        handle = open(os.path.join(bdir, output), 'w')
+        handle.write('// ' + output + ' compiled from ' + source + '\n')
+        handle.close()
+    return 0
+
+
+def standInBlackBox(args):
+    print '// Black box of ' + args[-1]
+    return 0
+
+
+if (__name__ == '__main__'):
+    tools = {'bsc': standInCompiler, 'leap-gen-black-box': standInBlackBox}
+    sys.exit(tools[sys.argv[1]](sys.argv[2:]))
+
+
+from SCons.Script import ARGUMENTS, Default, Environment, GetOption
+
+import model
+import model.ModuleList as ModuleList
+import model.Module as Module
+
+START_TIME = time.time()
+
+SCRIPT = os.path.abspath(GetOption('file')[0])
+BOUNDARIES = int(ARGUMENTS.get('BOUNDARIES', 1000))
+SPECULATE = int(ARGUMENTS.get('SPECULATE', 0))
+sys.path.insert(0, ARGUMENTS.get('BSV_DIR', os.path.dirname(SCRIPT)))
+
+import BSV
+import BSVDepends
+
+
+def writeFile(path, text):
+    if (not os.path.exists(path)):
+        handle = open(path, 'w')
+        handle.write(text)
+        handle.close()
+
+
+def standInTools():
+    if (not os.path.isdir('bin')):
+        os.mkdir('bin')
+    for tool in ['bsc', 'leap-gen-black-box']:
+        writeFile('bin/' + tool, '#!/bin/sh\nexec ' + sys.executable + ' ' + SCRIPT + ' ' + tool + ' "$@"\n')
+        os.chmod('bin/' + tool, 0755)
+    os.environ['PATH'] = os.path.abspath('bin') + ':' + os.environ['PATH']
+
+
+def syntheticModuleList(env, n):
+    for d in ['hw/include/awb/provides', 'sw/include/awb/provides']:
+        if (not os.path.isdir(d)):
+            os.makedirs(d)
+
+    moduleList = types.InstanceType(ModuleList.ModuleList)
+    moduleList.env = env
+    moduleList.getAWBParam = lambda moduleName, param: {'BUILD_VERILOG': 1}.get(param, 0)
+    moduleList.localPlatformName = 'bench'
+    moduleList.topDependency = []
+    moduleList.dependencyIndex = {}
+    moduleList.descendentIndex = {}
+    moduleList.dependencyGeneration = 0
+
+    def sources(name, bsvs):
+        deps = {}
+        for key in ['GEN_BSVS', 'GEN_VS', 'BSV_LOG', 'VERILOG', 'BA', 'VERILOG_STUB']:
+            deps[key] = []
+        deps['GIVEN_BSVS'] = bsvs
+        return deps
+
+    moduleList.topModule = Module.Module('top', ['top'], 'top', '', [], '', [], sources('top', []))
+    moduleList.moduleList = []
+    moduleList.modules = {'top': moduleList.topModule}
+    for m in range(n):
+        name = 'm' + str(m)
+        module = Module.Module(name, [name], name, 'top', [], 'top', [], sources(name, [name + '.bsv']))
+        moduleList.moduleList.append(module)
+        moduleList.modules[name] = module
+
+    for module in [moduleList.topModule] + moduleList.moduleList:
+        moduleList.trackDependencies(module)
+        path = 'hw/' + module.buildPath
+        if (not os.path.isdir(path + '/.bsc')):
+            os.makedirs(path + '/.bsc')
+        for bsv in [model.get_wrapper(module), model.get_log(module)] + module.moduleDependency['GIVEN_BSVS']:
+            writeFile(path + '/' + bsv, '// ' + bsv + '\n')
+
+    moduleList.graphize()
+    moduleList.graphizeSynth()
+    return moduleList
+
+
+##
+## The dependence database of the depends-init build, with no
+## dependence between the Bluespec sources.
+##
+def writeDependenceDB(moduleList):
+    sections = {}
+    for module in [moduleList.topModule] + moduleList.moduleList:
+        sections[model.get_build_path(moduleList, module) + '/' + module.dependsFile] = []
+    handle = open(BSVDepends.BSV_DEPENDS_DB, 'wb')
+    pickle.dump({'version': BSVDepends.BSV_DEPENDS_DB_VERSION, 'sections': sections, 'scans': {}}, handle, -1)
+    handle.close()
+
+
+##
+## countNodes --
+##   As BSV.count_nodes(), which older trees lack.
+##
+def countNodes(env):
+    nodes = 0
+    built = 0
+    executors = set()
+
+    pending = [env.fs.Top.root]
+    seen = set(pending)
+    while pending:
+        node = pending.pop()
+        nodes += 1
+        if (node.has_builder()):
+            built += 1
+            executor = getattr(node, 'executor', None)
+            if (executor is not None):
+                executors.add(id(executor))
+        for (name, entry) in getattr(node, 'entries', {}).iteritems():
+            if (name not in ('.', '..') and not entry in seen):
+                seen.add(entry)
+                pending.append(entry)
+
+    return (nodes, built, len(executors))
+
+
+##
+## nodeReport --
+##   As BSV.print_node_report().
+##
+def nodeReport(counts, rulesTime):
+    (nodes, built, executors) = counts
+    endTime = time.time()
+    print 'SCons graph: ' + str(nodes) + ' nodes, ' + str(built) + ' built by ' + \
+          str(executors) + ' builder calls'
+    print 'Bluespec rules declared in %.2fs, %.2fs from then to the end of the build' % \
+          (rulesTime - START_TIME, endTime - rulesTime)
+
+
+standInTools()
+
+env = Environment(ENV = os.environ, SHELL = 'bash')
+env['DEFS'] = {'ROOT_DIR_HW': 'hw', 'ROOT_DIR_MODEL': 'model', 'TMP_BSC_DIR': '.bsc',
+               'APM_FILE': 'bench.apm', 'APM_NAME': 'bench', 'BSC': 'bsc'}
+
+moduleList = syntheticModuleList(env, BOUNDARIES)
+writeDependenceDB(moduleList)
+
+tool = types.InstanceType(BSV.BSV)
+tool.start_time = START_TIME
+tool.moduleList = moduleList
+tool.hw_dir = env.Dir('hw')
+tool.TMP_BSC_DIR = '.bsc'
+tool.BUILD_LOGS_ONLY = 0
+tool.USE_BVI = 0
+tool.BSV_IFC_JSON = 0
+tool.SPECULATE_CON_SIZES = SPECULATE
+tool.speculation = {'hit': 0, 'miss': 0, 'cold': 0}
+tool.pipeline_debug = 0
+tool.BSC_FLAGS = ''
+tool.all_lib_dirs = [env.Dir('hw/include')]
+tool.ALL_BUILD_DIR_PATHS = '.bsc'
+tool.bsvDepends = BSVDepends.BSVDependenceDB('.bsc', '')
+env.VariantDir('.bsc', '.', duplicate=0)
+
+# Older trees bind the builders for each boundary in build_synth_boundary().
+if (BSV.BSV.setup_module_build.im_func.func_code.co_argcount == 2):
+    tool.setup_module_build(moduleList)
+
+for module in moduleList.synthBoundaries() + [moduleList.topModule]:
+    tool.build_synth_boundary(moduleList, module)
+
+targets = list(moduleList.topDependency)
+for module in [moduleList.topModule] + moduleList.moduleList:
+    for key in ['BO', 'BSV_BO', 'STR', 'BA', 'GEN_VERILOG_STUB']:
+        targets += module.moduleDependency.get(key, [])
+Default(targets)
+
+rulesTime = time.time()
+atexit.register(nodeReport, countNodes(env), rulesTime)
@@ -0,0 +1,132 @@
+##
+## Stand-in for the Bluespec tools leap-bsc-mkdepend runs, for checking
+## BSVDepends.py against it without a Bluespec or Icarus installation
+## (see bsvDependsCheck.py):
+##
+##   python bsvToolStandIn.py bsc -help
+##   python bsvToolStandIn.py iverilog -E -v -o - /dev/null
+##   python bsvToolStandIn.py ivlpp [-h] [-L] [-F<file>] [-I<dir> ...] <file>
+##
+## bsc reports $BLUESPECDIR/Libraries as its import path.  iverilog
+## names the ivlpp stand-in, a shell wrapper in the directory named by
+## $BSV_STANDIN_BIN.  ivlpp preprocesses a file as ivlpp does within the
+## subset of the language BSVDepends handles:  `define, `undef, `ifdef,
+## `ifndef, `elsif, `else, `endif and `include directives at the start
+## of a line, with `line markers around included text.  Macros are not
+## expanded.  Every ivlpp launch is appended to the file named by
+## $BSV_STANDIN_LOG, if set.
+##
+
+import os
+import re
+import sys
+
+directivePattern = re.compile(r'\s*`(\w+)\s*(.*)')
+
+
+def bsc(args):
+    print 'Usage: bsc [flags] file'
+    print 'import path: .:' + os.environ.get('BLUESPECDIR', '') + '/Libraries'
+    return 0
+
+
+def iverilog(args):
+    ivlpp = os.path.join(os.environ.get('BSV_STANDIN_BIN', ''), 'ivlpp')
+    print 'preprocess: ' + ivlpp + ' -L -F/tmp/ivrlg -f/tmp/ivrlh -p/tmp/ivrli'
+    return 0
+
+
+##
+## Preprocessor --
+##   ivlpp's output for one file.  Conditional state is a stack holding,
+##   for each open `ifdef, whether the enclosing code is active and
+##   whether a branch was taken.
+##
+class Preprocessor():
+
+    def __init__(self, searchPath, out):
+        self.searchPath = searchPath
+        self.out = out
+        self.macros = set()
+
+    def run(self, path, depth):
+        handle = open(path, 'r')
+        lines = handle.read().split('\n')
+        handle.close()
+        if (lines and lines[-1] == ''):
+            lines.pop()
+
+        self.out.write('`line 1 "%s" %d\n' % (path, [0, 1][depth > 0]))
+        conditions = []
+        active = True
+        for (n, line) in enumerate(lines):
+            m = directivePattern.match(line)
+            directive = m.group(1) if m else None
+            words = m.group(2).split() if m else []
+            name = words[0] if words else ''
+
+            if (directive in ('ifdef', 'ifndef')):
+                taken = (name in self.macros) == (directive == 'ifdef')
+                conditions.append((active, taken or not active))
+                active = active and taken
+            elif (directive == 'elsif'):
+                (outer, taken) = conditions[-1]
+                active = outer and not taken and (name in self.macros)
+                conditions[-1] = (outer, taken or active)
+            elif (directive == 'else'):
+                (outer, taken) = conditions[-1]
+                active = outer and not taken
+                conditions[-1] = (outer, True)
+            elif (directive == 'endif'):
+                active = conditions.pop()[0]
+            elif (not active):
+                pass
+            elif (directive == 'define'):
+                self.macros.add(re.match(r'\w*', m.group(2)).group(0))
+            elif (directive == 'undef'):
+                self.macros.discard(re.match(r'\w*', m.group(2)).group(0))
+            elif (directive == 'include'):
+                inc = re.match(r'["<]([^">]+)', m.group(2)).group(1)
+                found = [d + '/' + inc for d in self.searchPath if os.path.isfile(d + '/' + inc)]
+                if (not found):
+                    sys.stderr.write('Include file ' + inc + ' not found\n')
+                    self.out.flush()
+                    sys.exit(1)
+                self.run(found[0], depth + 1)
+                self.out.write('`line %d "%s" 2\n' % (n + 2, path))
+                continue
+            else:
+                self.out.write(line + '\n')
+                continue
+
+            # Directives leave an empty line.
+            self.out.write('\n')
+
+
+def ivlpp(args):
+    if ('-h' in args):
+        print 'Usage: ivlpp [options] <file>'
+        print '  -F<file>  Read include directories (I:<dir> lines) from a file'
+        print '  -L        Emit `line directives'
+        return 0
+
+    if os.environ.get('BSV_STANDIN_LOG'):
+        log = open(os.environ['BSV_STANDIN_LOG'], 'a')
+        log.write(' '.join(['ivlpp'] + args) + '\n')
+        log.close()
+
+    searchPath = [a[2:] for a in args if a.startswith('-I')]
+    for a in args:
+        if a.startswith('-F'):
+            handle = open(a[2:], 'r')
+            searchPath += [ln.rstrip('\n')[2:] for ln in handle if ln.startswith('I:')]
+            handle.close()
+
+    for path in [a for a in args if not a.startswith('-')]:
+        Preprocessor(searchPath, sys.stdout).run(path, 0)
+    return 0
+
+
+if __name__ == '__main__':
+    tool = sys.argv[1]
+    sys.exit({'bsc': bsc, 'iverilog': iverilog, 'ivlpp': ivlpp}[tool](sys.argv[2:]))
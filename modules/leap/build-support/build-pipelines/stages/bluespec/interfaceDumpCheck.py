@@ -0,0 +1,238 @@
+##
+## Byte-identity check of the interface dump formatter
+## (BSVInterfaceDump.formatInterfaceDump) against PythonTidy, which
+## formatted the .ba.ifc files before.
+##
+## Random dumps are generated in the shape interfaceType.tcl prints:
+## nested wrapper_gen calls, dictionaries (some with call keys), lists,
+## strings and integers, with varied spacing and lengths around the
+## line split limits.  Every such dump must be formatted, byte for byte
+## as PythonTidy formats it, and its JSON description must parse.
+##
+## Half of the dumps also hold tokens the formatter may not know:
+## double-quoted and escaped strings, other constants, expressions and
+## trailing commas.  A dump the formatter accepts must still match
+## PythonTidy.  The others must be refused, so that the build falls back
+## to PythonTidy, and dumps PythonTidy fails on must always be refused.
+##
+## With -time, the formatter, PythonTidy in-process and the old
+## PythonTidy pipe are timed on synthetic interfaces of increasing size.
+## Run it from any directory:
+##
+##   python interfaceDumpCheck.py [dumps] [first seed]
+##   python interfaceDumpCheck.py -time
+##
+
+import os
+import sys
+import json
+import time
+import random
+import subprocess
+import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'project'))
+
+import BSVInterfaceDump
+import PythonTidy
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_TIDY = os.path.join(SCRIPT_DIR, '..', '..', '..', 'project', 'PythonTidy.py')
+
+CLASSES = ['Method', 'Interface', 'Prim_Clock', 'Vector', 'Struct', 'Prim_Inout']
+
+ODD_VALUES = ['"top"', "'a\\'b'", "'tab\\t'", "u'top'", 'None', 'True', '-1', '1.5', '0x10', '1 + 2',
+              "'a' 'b'", '(1, 2)', 'x.y', 'f(x=1)', "'''top'''", 'lambda: 0', '[1, 2,]', '{1: 2,}']
+
+# Output interfaceType.tcl may print instead of a dump.
+ODD_DUMPS = ["Error: no such module\nInterface('top', {})\n",
+             "  Interface('top', {})\n",
+             "'top'\n",
+             "Interface('top', {})  # comment\n",
+             "Interface('top', {})\nInterface('top', {})\n",
+             ""]
+
+
+def tidy(text):
+    tidied = StringIO.StringIO()
+    PythonTidy.tidy_up(StringIO.StringIO(text), tidied)
+    return tidied.getvalue()
+
+
+##
+## RandomDump --
+##   Random dumps, nested up to a depth of 6.
+##
+class RandomDump():
+
+    def __init__(self, seed, odd):
+        self.rng = random.Random(seed)
+        self.odd = odd
+
+    def name(self):
+        rng = self.rng
+        return rng.choice(['a', 'clk', 'RDY_x', 'services_fst_outgoing_%d' % rng.randint(0, 999),
+                           'Bit#(%d)' % rng.randint(1, 512), 'Vector#(%d, Bit#(8))' % rng.randint(1, 9),
+                           'x' * rng.randint(0, 60), 'a b c', 'CLK_GATE_clocks_%d' % rng.randint(0, 99)])
+
+    def space(self):
+        return self.rng.choice(['', '', ' ', '  '])
+
+    def separator(self):
+        return ',' + self.space()
+
+    def series(self, items):
+        text = self.separator().join(items)
+        if (self.odd and items and (self.rng.random() < 0.1)):
+            text += ','
+        return text
+
+    def value(self, depth):
+        rng = self.rng
+        k = rng.random()
+        if (self.odd and (rng.random() < 0.05)):
+            return rng.choice(ODD_VALUES)
+        if ((depth > 5) or (k < 0.35)):
+            return "'" + self.name() + "'"
+        if (k < 0.45):
+            return str(rng.randint(0, 30))
+        if (k < 0.7):
+            n = rng.choice([0, 1, 2, 3, 4, 5, 6, 8])
+            return rng.choice(CLASSES) + '(' + self.series([self.value(depth + 1) for i in range(n)]) + ')'
+        if (k < 0.85):
+            n = rng.choice([0, 1, 2, 3, 4, 5, 7])
+            return '{' + self.series([self.key(depth) + ':' + self.space() + self.value(depth + 1)
+                                      for i in range(n)]) + '}'
+        n = rng.choice([0, 1, 2, 5, 6, 9])
+        return '[' + self.series([self.value(depth + 1) for i in range(n)]) + ']'
+
+    def key(self, depth):
+        rng = self.rng
+        if (rng.random() < 0.2):
+            return self.value(depth + 1)
+        return rng.choice(["'" + self.name() + "'", str(rng.randint(0, 9))])
+
+    def dump(self):
+        rng = self.rng
+        return rng.choice(['Interface', 'Vector', 'Method']) + \
+               '(' + ', '.join([self.value(1) for i in range(rng.randint(1, 5))]) + ')\n'
+
+
+##
+## checkDump --
+##   Compare the formatter with PythonTidy on one dump.  Returns
+##   whether the formatter refused the dump and the difference found,
+##   or None.
+##
+def checkDump(text, plain):
+    try:
+        formatted = BSVInterfaceDump.formatInterfaceDump(text)
+        json.loads(BSVInterfaceDump.interfaceDumpJSON(text))
+    except BSVInterfaceDump.InterfaceDumpError:
+        formatted = None
+
+    try:
+        tidied = tidy(text)
+    except Exception:
+        tidied = None
+
+    difference = None
+    if (formatted is None):
+        if plain:
+            difference = 'refused'
+    elif (tidied is None):
+        difference = 'not refused (PythonTidy fails)'
+    elif (formatted != tidied):
+        difference = 'formatted dump differs'
+    return (formatted is None, difference)
+
+
+def checkDumps(dumps, firstSeed):
+    failures = 0
+    refused = 0
+    for seed in range(firstSeed, firstSeed + dumps):
+        odd = (seed % 2 == 1)
+        text = RandomDump(seed, odd).dump()
+        (wasRefused, difference) = checkDump(text, not odd)
+        refused += wasRefused
+        if (difference):
+            failures += 1
+            print 'seed ' + str(seed) + ': ' + difference
+
+    for text in ODD_DUMPS:
+        difference = checkDump(text, False)[1]
+        if (difference):
+            failures += 1
+            print repr(text) + ': ' + difference
+
+    print str(dumps) + ' dumps (' + str(refused) + ' refused), ' + str(failures) + ' failures'
+    return failures
+
+
+##
+## syntheticDump --
+##   An interface of sub-interfaces of 16 methods each and a vector of
+##   clocks, as large boundaries have.
+##
+def syntheticDump(methods, clocks):
+    def method(n, args):
+        return ("'m%d': Method('m%d', 'ActionValue#(Bit#(64))', {'reset': 'RST_N', 'clock': 'CLK', "
+                "'ready': 'RDY_m%d', 'enable': 'EN_m%d', 'result': 'm%d',  'args': [%s]})" %
+                (n, n, n, n, n, ','.join(["['Bit#(%d)', 'm%d_arg_%d']" % (8 * (a + 1), n, a) for a in range(args)])))
+
+    subinterfaces = ["'sub%d': Interface('SUB_IFC_%d', 'sub%d', {%s})" %
+                     (s, s, s, ','.join([method(s * 16 + i, i % 8) for i in range(16)])) for s in range(methods / 16)]
+    subinterfaces.append("'clks': Vector('Vector#(%d, Clock)', 'clks', {%s})" %
+                         (clocks, ','.join(["%d: Prim_Clock('clks_%d','CLK_clks_%d', 'CLK_GATE_clks_%d')" %
+                                            (i, i, i, i) for i in range(clocks)])))
+    return "Interface('TOP_IFC', 'top', {%s})\n" % ','.join(subinterfaces)
+
+
+def bestTime(function, text, runs):
+    times = []
+    for i in range(runs):
+        start = time.time()
+        result = function(text)
+        times.append(time.time() - start)
+    return (min(times), result)
+
+
+def timeFormatters():
+    print '%8s %8s %7s %10s %10s %10s %8s' % ('methods', 'bytes', 'lines', 'pipe', 'tidy', 'formatter', 'json')
+    for (methods, clocks) in [(16, 4), (64, 16), (256, 64), (1024, 256), (4096, 512)]:
+        text = syntheticDump(methods, clocks)
+        runs = [5, 3][methods >= 1024]
+        (tidyTime, tidied) = bestTime(tidy, text, runs)
+        (formatTime, formatted) = bestTime(BSVInterfaceDump.formatInterfaceDump, text, runs)
+        (jsonTime, description) = bestTime(BSVInterfaceDump.interfaceDumpJSON, text, runs)
+        if (formatted != tidied):
+            raise Exception('formatted dump of ' + str(methods) + ' methods differs')
+
+        start = time.time()
+        pipe = subprocess.Popen([sys.executable, PYTHON_TIDY], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        piped = pipe.communicate(text)[0]
+        pipeTime = time.time() - start
+        if (piped != tidied):
+            raise Exception('PythonTidy pipe output of ' + str(methods) + ' methods differs')
+
+        print '%8d %8d %7d %9.3fs %9.3fs %9.4fs %7.4fs' % (methods, len(text), tidied.count('\n'),
+                                                           pipeTime, tidyTime, formatTime, jsonTime)
+
+
+def main(argv):
+    if ((len(argv) > 1) and (argv[1] == '-time')):
+        timeFormatters()
+        return 0
+
+    dumps = 5000
+    firstSeed = 0
+    if (len(argv) > 1):
+        dumps = int(argv[1])
+    if (len(argv) > 2):
+        firstSeed = int(argv[2])
+    return (checkDumps(dumps, firstSeed) != 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,75 @@
+#!/bin/sh
+# \
+exec $BLUESPECDIR/bin/bluetcl "$0" -quiet -- "$@"
+
+#
+# Batched introspection of compiled Bluespec modules.  One bluetcl
+# session answers the requests of many modules, instead of one session
+# per module and script (sched.tcl, path.tcl and interfaceType.tcl).
+#
+# Each line of the request file names a module, an analysis (sched, path
+# or ifc) and the file to write.  Files hold what the corresponding
+# script would print.  Failed requests are reported and make the driver
+# exit with an error.
+#
+
+global env
+namespace import ::Bluetcl::* 
+
+package require utils
+package require portUtil
+
+proc usage {} {
+    puts "Usage: introspect.tcl"
+    puts ""
+    puts "   switches from compile (see bsc help for more detail):"
+    puts "      -p <path>       - path, if suppled to bsc command (i.e. -p obj:+)"
+    puts "      --batch file    - requests:  <module> <sched | path | ifc> <output file>"
+    exit
+}
+
+set valOptions [list --batch -p]
+set boolOptions [list -verilog]
+
+if { [catch [list ::utils::scanOptions $boolOptions $valOptions true OPT "$argv"] opts] } {
+    puts stderr $opts
+    usage
+    exit 1
+}
+
+source [file join [file dirname [info script]] bsvIntrospect.tcl]
+
+introspectSetup $OPT(-p)
+
+set failed 0
+set requests [open $OPT(--batch) r]
+while {[gets $requests request] >= 0} {
+    if {[llength $request] != 3} {
+        continue
+    }
+    foreach {moduleTarget analysis output} $request break
+
+    if { [catch {
+        if {! [info exists loaded($moduleTarget)]} {
+            module load $moduleTarget
+            set loaded($moduleTarget) 1
+        }
+
+        switch -exact $analysis {
+            "sched" { set result [introspectSchedule $moduleTarget] }
+            "path"  { set result [introspectPaths $moduleTarget] }
+            "ifc"   { set result [introspectInterface $moduleTarget] }
+            default { error "unknown analysis $analysis" }
+        }
+
+        set outHandle [open $output w]
+        puts $outHandle $result
+        close $outHandle
+    } err] } {
+        puts stderr "Failed to introspect $moduleTarget ($analysis): $err"
+        set failed 1
+    }
+}
+close $requests
+
+exit $failed
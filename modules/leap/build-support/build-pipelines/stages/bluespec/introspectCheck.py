@@ -0,0 +1,136 @@
+##
+## Byte-identity check of the batched introspection of compiled wrappers
+## (introspect.tcl, see BSV.introspect_batch) against the per-module
+## commands it replaced.  Bluetcl is played by a tclsh stand-in
+## (bluetclStandIn.tcl) answering from synthetic modules.
+##
+## For every module the .ba.sched, .ba.path and .ba.ifc files are
+## written as the build used to write them:  sched.tcl, path.tcl and
+## interfaceType.tcl piped through PythonTidy, one bluetcl session each.
+## They are compared with the files of a single introspect.tcl session,
+## the interface descriptions formatted as introspect_batch() formats
+## them.  Given a directory holding other copies of the three scripts
+## (e.g. those of an older tree), their output is compared, too.  Run it
+## from any directory, with tclsh on the path:
+##
+##   python introspectCheck.py [script directory]
+##
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'project'))
+
+import BSVInterfaceDump
+import PythonTidy
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STAND_IN = os.path.join(SCRIPT_DIR, 'bluetclStandIn.tcl')
+PYTHON_TIDY = os.path.join(SCRIPT_DIR, '..', '..', '..', 'project', 'PythonTidy.py')
+
+MODULES = ['mk_m0_Wrapper', 'mk_m1_Wrapper', 'mk_bad_Wrapper', 'mk_m2_Wrapper', 'mk_m3_Wrapper']
+ANALYSES = [('sched', 'sched.tcl'), ('path', 'path.tcl'), ('ifc', 'interfaceType.tcl')]
+SEARCH_PATH = 'hw/.bsc:.bsc'
+
+
+def bluetcl(script, arguments):
+    command = subprocess.Popen(['tclsh', STAND_IN, script] + arguments, stdout=subprocess.PIPE)
+    output = command.communicate()[0]
+    return (command.returncode, output)
+
+
+##
+## moduleOutputs --
+##   The files of one module as the per-module commands wrote them.
+##   Files are described by the bluetcl output and the file written,
+##   None for an interface description PythonTidy failed to format.
+##
+def moduleOutputs(scriptDir, module):
+    outputs = {}
+    for (analysis, script) in ANALYSES:
+        text = bluetcl(os.path.join(scriptDir, script), ['-p', SEARCH_PATH, '--m', module])[1]
+        formatted = text
+        if (analysis == 'ifc'):
+            tidy = subprocess.Popen([sys.executable, PYTHON_TIDY], stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            formatted = tidy.communicate(text)[0]
+            if (tidy.returncode != 0):
+                formatted = None
+        outputs[module + '.ba.' + analysis] = (text, formatted)
+    return outputs
+
+
+##
+## batchOutputs --
+##   The files of all modules as one introspect.tcl session and
+##   introspect_batch() write them, described as by moduleOutputs().
+##
+def batchOutputs(outputDir):
+    requestFile = os.path.join(outputDir, 'introspect.requests')
+    requestHandle = open(requestFile, 'w')
+    for module in MODULES:
+        for (analysis, script) in ANALYSES:
+            requestHandle.write(' '.join([module, analysis, os.path.join(outputDir, module + '.ba.' + analysis)]) + '\n')
+    requestHandle.close()
+
+    status = bluetcl(os.path.join(SCRIPT_DIR, 'introspect.tcl'), ['-p', SEARCH_PATH, '--batch', requestFile])[0]
+
+    outputs = {}
+    for module in MODULES:
+        for (analysis, script) in ANALYSES:
+            text = open(os.path.join(outputDir, module + '.ba.' + analysis)).read()
+            formatted = text
+            if (analysis == 'ifc'):
+                try:
+                    formatted = BSVInterfaceDump.formatInterfaceDump(text)
+                except BSVInterfaceDump.InterfaceDumpError:
+                    tidy = StringIO.StringIO()
+                    try:
+                        PythonTidy.tidy_up(StringIO.StringIO(text), tidy)
+                        formatted = tidy.getvalue()
+                    except Exception:
+                        # introspect_batch() fails the build.
+                        formatted = None
+            outputs[module + '.ba.' + analysis] = (text, formatted)
+    return (status, outputs)
+
+
+def compare(name, expected, found):
+    failures = 0
+    for output in sorted(expected):
+        if (expected[output] != found[output]):
+            failures += 1
+            print name + ': ' + output + ' differs'
+    print name + ': ' + str(len(expected)) + ' files compared, ' + str(failures) + ' differences'
+    return failures
+
+
+def main(argv):
+    workDir = tempfile.mkdtemp()
+    try:
+        directories = [('per-module scripts', SCRIPT_DIR)]
+        if (len(argv) > 1):
+            directories.append(('scripts in ' + argv[1], os.path.abspath(argv[1])))
+
+        (status, found) = batchOutputs(workDir)
+
+        failures = 0
+        for (name, scriptDir) in directories:
+            expected = {}
+            for module in MODULES:
+                expected.update(moduleOutputs(scriptDir, module))
+            failures += compare(name, expected, found)
+    finally:
+        shutil.rmtree(workDir)
+
+    print 'introspect.tcl exit status ' + str(status)
+    return (failures != 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
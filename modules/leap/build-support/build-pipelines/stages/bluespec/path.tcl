@@ -37,30 +37,12 @@ if { [catch [list ::utils::scanOptions $boolOptions $valOptions true OPT "$argv"
     exit 1
 }
 
-set bsdir $::env(BLUESPECDIR)
-set libs [list [file join $bsdir "Prelude"] [file join $bsdir "Libraries"]]
+source [file join [file dirname [info script]] bsvIntrospect.tcl]
 
-portUtil::processSwitches [list {p "+"}]
-Bluetcl::flags set -wait-for-license
-Bluetcl::flags set -verilog
-Bluetcl::flags set -p $OPT(-p):[join $libs ":"]
+introspectSetup $OPT(-p)
 
 # set path to whatever 
 set moduleTarget $OPT(--m)
 module load $moduleTarget
 
-set outStr ""    
-set paths [schedule pathinfo $moduleTarget]
-set lenPathStm [llength $paths]
-for {set pathStm 0} {$pathStm < $lenPathStm} {incr pathStm} { 
-    set sinkSet [lindex $paths $pathStm]
-    set srcSet [lindex $sinkSet 0]
-    set lenSrc [llength $srcSet]
-    set sinkWire [lindex $sinkSet 1]
-    for {set src 0} {$src < $lenSrc} {incr src} { 
-        set srcWire [lindex $srcSet $src]
-        set outStr "${outStr}path($srcWire,$sinkWire);\n"
-    }
-}
-puts "$outStr"
-
+puts [introspectPaths $moduleTarget]
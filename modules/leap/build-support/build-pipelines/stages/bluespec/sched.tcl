@@ -39,51 +39,12 @@ if { [catch [list ::utils::scanOptions $boolOptions $valOptions true OPT "$argv"
     exit 1
 }
 
-set bsdir $::env(BLUESPECDIR)
-set libs [list [file join $bsdir "Prelude"] [file join $bsdir "Libraries"]]
+source [file join [file dirname [info script]] bsvIntrospect.tcl]
 
-portUtil::processSwitches [list {p "+"}]
-Bluetcl::flags set -wait-for-license
-Bluetcl::flags set -verilog
-Bluetcl::flags set -p $OPT(-p):[join $libs ":"]
+introspectSetup $OPT(-p)
 
 # set path to whatever 
 set moduleTarget $OPT(--m)
 module load $moduleTarget
 
-set portlist [module ports $moduleTarget]
-
-set outStr ""    
-set methods [schedule methodinfo $moduleTarget]
-set lenMethodStm [llength $methods]
-for {set methodStm 0} {$methodStm < $lenMethodStm} {incr methodStm} { 
-    set srcSet [lindex $methods $methodStm]
-    set srcMethod [lindex $srcSet 0]
-    set scheds [lindex $srcSet 1]
-    set lenScheds [llength $scheds]
-    for {set schedStm 0} {$schedStm < $lenScheds} {incr schedStm} { 
-        set sinkSet [lindex $scheds $schedStm]
-        set schedule [lindex $sinkSet 1] 
-        set sinkMethod [lindex $sinkSet 0] 
-        if { $schedule == "<R" } {    
-            set schedule "SBR"
-        }
-
-        if { $schedule == "<" } {
-            set schedule "SB"
-        }
-
-        # discard schedule after annontations
-        if { $schedule == ">R" } {
-           continue
-        }
-
-        if { $schedule == ">" } {
-           continue
-        }
-
-        set outStr "${outStr} schedule ($srcMethod) $schedule ($sinkMethod);\n"
-    }
-}
-puts "$outStr"
-
+puts [introspectSchedule $moduleTarget]
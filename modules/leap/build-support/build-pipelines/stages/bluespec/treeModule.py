@@ -7,3 +7,18 @@ class TreeModule(LIModule):
         self.children = []
         self.seperator = None
 
+
+##
+## treeShape --
+##   A picklable description of a build tree.  Tree nodes are represented
+##   as (name, [children]) pairs and leaves by their module name.  Empty
+##   nodes carry no modules and are dropped.
+##
+def treeShape(module):
+    if (isinstance(module, TreeModule)):
+        if (module.type == "empty"):
+            return None
+        children = [treeShape(child) for child in module.children]
+        return (module.name, [child for child in children if (not child is None)])
+
+    return module.name
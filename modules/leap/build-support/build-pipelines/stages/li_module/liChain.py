@@ -1,12 +1,38 @@
 import sys
 
 from liModule import LIModule
+from liRecord import LIRecord
 
 # TODO: Some of the data in this structure would be better captured as
 # an attribute dictionary.  This would also be more modular since
 # external access could be hidden behind an accessor function.
 
-class LIChain():
+class LIChain(LIRecord):
+
+    __slots__ = ('sc_type', 'raw_type', 'name', 'module_idx', 'idx',
+                 'optional', 'bitwidth', 'matched', 'module_name',
+                 'chain_root_in', 'chain_root_out',
+                 'via_idx_ingress', 'via_link_ingress',
+                 'via_idx_egress', 'via_link_egress', 'type_structure',
+                 'activity', 'module',
+                 'sourcePartnerChain', 'sinkPartnerChain',
+                 'sourcePartnerModule', 'sinkPartnerModule')
+
+    internedFields = ('sc_type', 'raw_type', 'name', 'module_name',
+                      'chain_root_in', 'chain_root_out')
+
+    defaults = {'idx': "unassigned",
+                'matched': False,
+                'via_idx_ingress': "unassigned",
+                'via_link_ingress': "unassigned",
+                'via_idx_egress': "unassigned",
+                'via_link_egress': "unassigned",
+                'activity': -1,
+                'module': "unassigned",
+                'sourcePartnerChain': "unassigned",
+                'sinkPartnerChain': "unassigned",
+                'sourcePartnerModule': "unassigned",
+                'sinkPartnerModule': "unassigned"}
   
     def __init__(self,
                  sc_type,
@@ -48,7 +74,8 @@ class LIChain():
         self.sinkPartnerChain = "unassigned"
         self.sourcePartnerModule = "unassigned"
         self.sinkPartnerModule = "unassigned"
-        self.attributes = {}
+        self._attributes = None # created on first use
+        self.internFields()
 
     def __repr__(self):
         # Partner objects may not be initialized.
@@ -89,7 +116,7 @@ class LIChain():
                            self.chain_root_in,
                            self.chain_root_out,
                            self.type_structure)
-        newChain.attributes = dict(self.attributes)
+        newChain._attributes = self.copyAttributes()
         newChain.activity = self.activity
         return newChain
 
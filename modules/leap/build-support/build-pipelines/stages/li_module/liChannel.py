@@ -1,13 +1,35 @@
 import sys
 
 from liModule import LIModule
+from liRecord import LIRecord
 
 # TODO: Some of the data in this structure would be better captured as
 # an attribute dictionary.  This would also be more modular since
 # external access could be hidden behind an accessor function.
 
 
-class LIChannel():
+class LIChannel(LIRecord):
+
+    __slots__ = ('sc_type', 'raw_type', 'name', 'module_idx', 'idx',
+                 'optional', 'bitwidth', 'matched', 'module_name',
+                 'root_module_name', 'type_structure',
+                 'via_idx_ingress', 'via_link_ingress',
+                 'via_idx_egress', 'via_link_egress', 'activity',
+                 'module', 'partnerModule', 'partnerChannel', 'code')
+
+    internedFields = ('sc_type', 'raw_type', 'name', 'module_name', 'root_module_name')
+
+    defaults = {'idx': "unassigned",
+                'matched': False,
+                'via_idx_ingress': "unassigned",
+                'via_link_ingress': "unassigned",
+                'via_idx_egress': "unassigned",
+                'via_link_egress': "unassigned",
+                'activity': -1,
+                'module': "unassigned",
+                'partnerModule': "unassigned",
+                'partnerChannel': "unassigned",
+                'code': ""}
   
     def __init__(self,
                  sc_type,
@@ -42,7 +64,8 @@ class LIChannel():
         self.partnerModule = "unassigned"
         self.partnerChannel = "unassigned"
         self.code = "" #Code() # This is used to store various definitions related to type compression
-        self.attributes = {}
+        self._attributes = None # created on first use
+        self.internFields()
 
     def __repr__(self):
 
@@ -73,7 +96,7 @@ class LIChannel():
                                self.root_module_name,
                                self.type_structure)
         # Need to copy some other values as well...
-        newChannel.attributes = dict(self.attributes)
+        newChannel._attributes = self.copyAttributes()
         newChannel.activity = self.activity
         return newChannel
 
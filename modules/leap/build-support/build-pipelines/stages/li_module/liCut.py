@@ -0,0 +1,304 @@
+import heapq
+import random
+
+##
+## Global minimum cut engines for LI graphs.
+##
+## All engines take a pygraph digraph of LI modules and, optionally, the
+## LIGraph edge weights.  Channels are bidirectional as far as the build
+## tree is concerned, so the graph is treated as undirected: the weight
+## between two modules is the sum of the weights in both directions.
+##
+## Each engine returns a map from module to partition (0 or 1).  When no
+## candidate cut leaves at least minSide modules on each side, the best
+## candidate is repaired by moving modules across the cut (rebalanceCut)
+## and then improved locally (refineCut).
+##
+
+##
+## undirectedGraph --
+##   Convert a digraph to an undirected adjacency list over integer node
+##   ids.  Nodes are numbered, and edges added, in name order so that all
+##   engines are deterministic regardless of pygraph iteration order:  the
+##   iteration order of the adjacency dictionaries depends on the order
+##   their entries were added in.
+##
+def undirectedGraph(graph, weights=None):
+    nodes = sorted(graph.nodes(), key=lambda module: module.name)
+    nodeIds = {}
+    for node in nodes:
+        nodeIds[node] = len(nodeIds)
+
+    adjacency = [{} for node in nodes]
+    for (source, sink) in sorted(graph.edges(), key=lambda edge: (nodeIds[edge[0]], nodeIds[edge[1]])):
+        if (source == sink):
+            continue
+        weight = 1
+        if ((not weights is None) and ((source, sink) in weights)):
+            weight = weights[(source, sink)]
+        u = nodeIds[source]
+        v = nodeIds[sink]
+        adjacency[u][v] = adjacency[u].get(v, 0) + weight
+        adjacency[v][u] = adjacency[v].get(u, 0) + weight
+
+    return (nodes, adjacency)
+
+
+##
+## minSideSize --
+##   Translate a balance percentage into the smallest number of modules
+##   allowed on either side of a cut.
+##
+def minSideSize(numNodes, balance):
+    return min(numNodes / 2, max(1, (numNodes * balance) / 100))
+
+
+def cutWeight(adjacency, side):
+    weight = 0
+    for u in range(len(adjacency)):
+        if (side[u] == 0):
+            for (v, w) in adjacency[u].iteritems():
+                if (side[v] == 1):
+                    weight += w
+    return weight
+
+
+##
+## cutMapping --
+##   Turn a partition vector into the module map returned to callers.
+##   The side holding the first module (by name) is always side 0.
+##
+def cutMapping(nodes, side):
+    if (len(nodes) == 0):
+        return {}
+
+    flip = side[0]
+    mapping = {}
+    for u in range(len(nodes)):
+        mapping[nodes[u]] = side[u] ^ flip
+    return mapping
+
+
+##
+## rebalanceCut --
+##   Greedily move modules from the larger to the smaller side of a cut,
+##   each time picking the module whose move increases the cut weight
+##   the least, until both sides hold at least minSide modules.
+##
+def rebalanceCut(adjacency, side, minSide):
+    sizes = [side.count(0), side.count(1)]
+    while (min(sizes) < minSide):
+        large = 0 if (sizes[0] > sizes[1]) else 1
+
+        bestNode = None
+        bestCost = None
+        for u in range(len(adjacency)):
+            if (side[u] != large):
+                continue
+            cost = 0
+            for (v, w) in adjacency[u].iteritems():
+                if (side[v] == large):
+                    cost += w
+                else:
+                    cost -= w
+            if ((bestCost is None) or (cost < bestCost)):
+                bestNode = u
+                bestCost = cost
+
+        side[bestNode] = 1 - large
+        sizes[large] -= 1
+        sizes[1 - large] += 1
+
+    return side
+
+
+##
+## refineCut --
+##   Local improvement of a cut.  Sweep the modules in id order, moving
+##   any module whose move reduces the cut weight and leaves both sides
+##   with at least minSide modules, until a sweep makes no progress.
+##
+def refineCut(adjacency, side, minSide, maxPasses=8):
+    sizes = [side.count(0), side.count(1)]
+    for sweep in range(maxPasses):
+        moved = False
+        for u in range(len(adjacency)):
+            s = side[u]
+            if (sizes[s] <= minSide):
+                continue
+            gain = 0
+            for (v, w) in adjacency[u].iteritems():
+                if (side[v] == s):
+                    gain -= w
+                else:
+                    gain += w
+            if (gain > 0):
+                side[u] = 1 - s
+                sizes[s] -= 1
+                sizes[1 - s] += 1
+                moved = True
+        if (not moved):
+            break
+
+    return side
+
+
+##
+## stoerWagnerCut --
+##   Exact global minimum cut (Stoer and Wagner, 1997).  Every phase of
+##   the algorithm yields a candidate cut; the lightest candidate that
+##   satisfies the balance constraint is chosen.
+##
+def stoerWagnerCut(graph, weights=None, balance=0):
+    (nodes, adjacency) = undirectedGraph(graph, weights)
+    numNodes = len(nodes)
+    if (numNodes < 2):
+        return cutMapping(nodes, [0] * numNodes)
+
+    minSide = minSideSize(numNodes, balance)
+
+    # The algorithm contracts nodes, so work on a copy.
+    adjacency = [dict(edges) for edges in adjacency]
+    groups = [[u] for u in range(numNodes)]
+    active = set(range(numNodes))
+
+    best = None
+    bestWeight = None
+    balanced = None
+    balancedWeight = None
+
+    while (len(active) > 1):
+        # Maximum adjacency ordering.  Ties go to the lowest node id.
+        keys = dict([(u, 0) for u in active])
+        heap = [(0, u) for u in active]
+        heapq.heapify(heap)
+        added = set()
+        previous = None
+        last = None
+
+        while (len(heap) > 0):
+            (negKey, u) = heapq.heappop(heap)
+            if ((u in added) or (-negKey != keys[u])):
+                continue
+            added.add(u)
+            previous = last
+            last = u
+            for (v, w) in adjacency[u].iteritems():
+                if (not v in added):
+                    keys[v] += w
+                    heapq.heappush(heap, (-keys[v], v))
+
+        # The cut of the phase separates the last node added.
+        phaseWeight = keys[last]
+        phaseSize = len(groups[last])
+        if ((bestWeight is None) or (phaseWeight < bestWeight)):
+            best = list(groups[last])
+            bestWeight = phaseWeight
+        if ((min(phaseSize, numNodes - phaseSize) >= minSide) and
+            ((balancedWeight is None) or (phaseWeight < balancedWeight))):
+            balanced = list(groups[last])
+            balancedWeight = phaseWeight
+
+        # Merge the last node into the one added before it.
+        for (v, w) in adjacency[last].iteritems():
+            if (v != previous):
+                adjacency[previous][v] = adjacency[previous].get(v, 0) + w
+                adjacency[v][previous] = adjacency[v].get(previous, 0) + w
+            del adjacency[v][last]
+        adjacency[last] = {}
+        groups[previous] += groups[last]
+        groups[last] = []
+        active.remove(last)
+
+    side = [0] * numNodes
+    for u in (best if (balanced is None) else balanced):
+        side[u] = 1
+
+    # A balance constraint may have ruled out the exact minimum, in which
+    # case the chosen cut is worth improving locally.
+    if ((balanced is None) or (balancedWeight != bestWeight)):
+        (nodes, adjacency) = undirectedGraph(graph, weights)
+        side = refineCut(adjacency, rebalanceCut(adjacency, side, minSide), minSide)
+
+    return cutMapping(nodes, side)
+
+
+##
+## contractionCut --
+##   Randomized contraction (Karger's algorithm).  Each trial contracts
+##   edges in a random order biased toward heavy edges, refusing any
+##   contraction that would leave the other side with fewer than
+##   minSide modules.  The lightest cut over all trials is returned.
+##   The random sequence is seeded so that builds are reproducible.
+##
+def contractionCut(graph, weights=None, balance=0, trials=32, seed=0):
+    (nodes, adjacency) = undirectedGraph(graph, weights)
+    numNodes = len(nodes)
+    if (numNodes < 2):
+        return cutMapping(nodes, [0] * numNodes)
+
+    minSide = minSideSize(numNodes, balance)
+    maxGroup = numNodes - minSide
+
+    edges = []
+    for u in range(numNodes):
+        for (v, w) in adjacency[u].iteritems():
+            if ((u < v) and (w > 0)):
+                edges.append((u, v, w))
+
+    rng = random.Random(seed)
+
+    best = None
+    bestWeight = None
+
+    for trial in range(trials):
+        parent = range(numNodes)
+        size = [1] * numNodes
+
+        def find(u):
+            while (parent[u] != u):
+                parent[u] = parent[parent[u]]
+                u = parent[u]
+            return u
+
+        # Sorting by exponentially distributed keys is equivalent to
+        # repeatedly picking an edge with probability proportional to
+        # its weight.
+        order = sorted(edges, key=lambda edge: rng.expovariate(edge[2]))
+
+        components = numNodes
+        for (u, v, w) in order:
+            if (components == 2):
+                break
+            ru = find(u)
+            rv = find(v)
+            if ((ru == rv) or (size[ru] + size[rv] > maxGroup)):
+                continue
+            if (size[ru] < size[rv]):
+                (ru, rv) = (rv, ru)
+            parent[rv] = ru
+            size[ru] += size[rv]
+            components -= 1
+
+        # Disconnected graphs, or contractions refused by the balance
+        # constraint, leave more than two groups.  Pack them onto the
+        # two sides, largest first.
+        roots = sorted(set([find(u) for u in range(numNodes)]), key=lambda r: (-size[r], r))
+        rootSide = {}
+        sideSizes = [0, 0]
+        for r in roots:
+            s = 0 if (sideSizes[0] <= sideSizes[1]) else 1
+            rootSide[r] = s
+            sideSizes[s] += size[r]
+
+        side = [rootSide[find(u)] for u in range(numNodes)]
+        if (min(sideSizes) < minSide):
+            side = rebalanceCut(adjacency, side, minSide)
+        side = refineCut(adjacency, side, minSide)
+
+        weight = cutWeight(adjacency, side)
+        if ((bestWeight is None) or (weight < bestWeight)):
+            best = side
+            bestWeight = weight
+
+    return cutMapping(nodes, best)
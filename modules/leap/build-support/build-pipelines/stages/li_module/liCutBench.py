@@ -0,0 +1,83 @@
+##
+## Benchmark of the global min-cut engines (liCut.py) that cut the build
+## tree:  Stoer-Wagner and randomized contraction, on random module graphs
+## of n modules with about 2n weighted channels, cut with the default 25%
+## balance.  For each size the time and the cut weight of both engines
+## are printed, along with the engine the AUTO setting of min_cut()
+## picks.  Use it to re-check EXACT_CUT_LIMIT, the size up to which AUTO
+## cuts exactly.
+##
+##   python liCutBench.py [n ...]
+##
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pygraph.classes.digraph import digraph
+
+import liCut
+
+# liUtility.EXACT_CUT_LIMIT.  liUtility itself needs the build's model
+# package.
+EXACT_CUT_LIMIT = 150
+
+BALANCE = 25
+TRIALS = 32
+
+
+class BenchModule(object):
+    def __init__(self, name):
+        self.name = name
+
+
+def randomGraph(n, seed):
+    rng = random.Random(seed)
+    graph = digraph()
+    weights = {}
+    modules = [BenchModule('m%05d' % i) for i in range(n)]
+    graph.add_nodes(modules)
+    for i in range(n):
+        for edge in range(2):
+            j = rng.randrange(n)
+            if (i == j or graph.has_edge((modules[i], modules[j]))):
+                continue
+            graph.add_edge((modules[i], modules[j]))
+            weights[(modules[i], modules[j])] = rng.randint(1, 5)
+    return (graph, weights)
+
+
+def checkedCut(graph, weights, mapping):
+    minSide = liCut.minSideSize(len(graph.nodes()), BALANCE)
+    sides = mapping.values()
+    if (min(sides.count(0), sides.count(1)) < minSide):
+        raise Exception('cut leaves fewer than ' + str(minSide) + ' modules on a side')
+    return sum([weights[edge] for edge in graph.edges() if mapping[edge[0]] != mapping[edge[1]]])
+
+
+def timeCut(engine, graph, weights, *args):
+    start = time.time()
+    mapping = engine(graph, weights, BALANCE, *args)
+    return (time.time() - start, checkedCut(graph, weights, mapping))
+
+
+def main(argv):
+    sizes = [10, 100, 150, 200, 500, 1000, 2000, 5000]
+    if (len(argv) > 1):
+        sizes = [int(n) for n in argv[1:]]
+
+    print '%6s %20s %20s %14s' % ('n', 'stoer-wagner', 'contraction', 'auto')
+    for n in sizes:
+        (graph, weights) = randomGraph(n, 7)
+        exact = timeCut(liCut.stoerWagnerCut, graph, weights)
+        contraction = timeCut(liCut.contractionCut, graph, weights, TRIALS)
+        auto = ['CONTRACTION', 'STOER_WAGNER'][n <= EXACT_CUT_LIMIT]
+        print '%6d %11.3fs %7s %11.3fs %7s %14s' % (n, exact[0], '(' + str(exact[1]) + ')',
+                                                     contraction[0], '(' + str(contraction[1]) + ')', auto)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
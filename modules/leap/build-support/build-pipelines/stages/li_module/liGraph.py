@@ -6,6 +6,7 @@ import pygraph
 from liModule import LIModule
 from liChannel import LIChannel
 from liService import LIService
+from liMatch import matchModuleChannels, matchChannelGroups, groupUnmatchedChannels
 
 try:
     from pygraph.classes.digraph import digraph
@@ -68,11 +69,34 @@ class LIGraph():
                     continue
                 #Only add an edge if the channel is a source.
                 if (channel.isSource()):
-                    if (not self.graph.has_edge((module, channel.partnerModule))):
-                        self.graph.add_edge((module, channel.partnerModule))
-                        self.weights[(module, channel.partnerModule)] = channel.activity
-                    else:
-                        self.weights[(module, channel.partnerModule)] += channel.activity
+                    self.addChannelEdge(module, channel)
+
+    # Add (or reweight) the edge carrying a matched source channel.
+    def addChannelEdge(self, module, channel):
+        edge = (module, channel.partnerModule)
+        if (not self.graph.has_edge(edge)):
+            self.graph.add_edge(edge)
+            self.weights[edge] = channel.activity
+        else:
+            self.weights[edge] += channel.activity
+
+    # The index of dangling channels, by name, lets mergeModules()
+    # match new modules without revisiting the rest of the graph.  It is
+    # stamped with the graph's modules and their channel versions and
+    # rebuilt on use when either has changed (modules added or removed
+    # outside mergeModules(), channels added, trimmed or unmatched).
+    def indexUnmatchedChannels(self):
+        self.unmatchedIndex = groupUnmatchedChannels(self.modules.values())
+        self.unmatchedIndexStamp = self.channelStamp()
+
+    def channelStamp(self):
+        return [(module, module.channelVersion) for module in self.modules.values()]
+
+    def getUnmatchedIndex(self):
+        # Graphs unpickled from an older build carry no stamp.
+        if (getattr(self, 'unmatchedIndexStamp', None) != self.channelStamp()):
+            self.indexUnmatchedChannels()
+        return self.unmatchedIndex
 
     def id(self):
         for module in self.modules:
@@ -130,14 +154,11 @@ class LIGraph():
             services += module.services
         return services
 
-    # Should this move to liUtilities?
+    # Match channels across the whole graph.  Channels are indexed by
+    # name (see liMatch.py), giving the same result as calling
+    # matchChannels() on every ordered pair of modules.
     def matchGraphChannels(self):
-        #all these for loops are overkill. We should have better algorithms
-        for module in self.modules.values():
-            for partnerModule in self.modules.values():
-                # if we are the same module, skip
-                if (module.name != partnerModule.name):
-                    self.matchChannels(module, partnerModule)
+        matchModuleChannels(self.modules.values())
 
     # Match channels for a pair of modules
     def matchChannels(self, module, partnerModule):
@@ -166,10 +187,20 @@ class LIGraph():
 
         self.mergeModules(otherModules)
 
+    ##
+    ## mergeModules --
+    ##   Add modules to the graph.  Merging is incremental: only the
+    ##   dangling channels of the new modules are matched, against the
+    ##   index of channels left dangling in the existing graph.  The
+    ##   result is the same as re-matching the whole graph, since
+    ##   channels that were already dangling cannot match one another.
+    ##
     def mergeModules(self, otherModules):
 
         # Should we make copies of modules here?  
-        
+
+        unmatchedIndex = self.getUnmatchedIndex()
+
         for module in otherModules:
             module.unmatch()
             # have we seen this module before? If so, this might be an error. 
@@ -181,32 +212,44 @@ class LIGraph():
 
             self.modules[module.name] = module
 
+        # Ambiguous matches are resolved in the graph's module
+        # iteration order, as a full match would resolve them.
+        moduleOrder = {}
+        for module in self.modules.values():
+            moduleOrder[module.name] = len(moduleOrder)
+
+        newChannels = groupUnmatchedChannels(otherModules)
+        groups = {}
+        for name in newChannels:
+            groups[name] = unmatchedIndex.get(name, []) + newChannels[name]
+
         # let's match up all those connections
-        self.matchGraphChannels()       
+        matches = matchChannelGroups(groups.values(), moduleOrder)
 
-        self.graph.add_nodes(otherModules)
-                    
-        # add edges - for now all edges have unit weight
-        for module in otherModules:
-            for channel in module.channels:
-                # depending on what we are doing with the graph,
-                # unmatched channels may not be an error.  We will
-                # instead mark the object in case the caller cares
-                if (not (channel.matched or channel.optional)):
-                    self.unmatchedChannels = True                    
-                    continue
+        for name in groups:
+            dangling = [entry for entry in groups[name] if (not entry[1].matched)]
+            if (len(dangling) > 0):
+                unmatchedIndex[name] = dangling
+            elif (name in unmatchedIndex):
+                del unmatchedIndex[name]
+        self.unmatchedIndexStamp = self.channelStamp()
 
-                # It is possible that optional channels do not have a match
-                if (not channel.matched):
-                    continue
+        self.graph.add_nodes(otherModules)
 
-                #Only add an edge if the channel is a source.
-                if (channel.isSource()):
-                    if (not self.graph.has_edge((channel.module, channel.partnerModule))):
-                        self.graph.add_edge((module, channel.partnerModule))
-                        self.weights[(module, channel.partnerModule)] = channel.activity
-                    else:
-                        self.weights[(module, channel.partnerModule)] += channel.activity
+        # add edges for the new matches, which may originate in either
+        # the new or the existing modules.
+        for (module, channel, partnerModule, partnerChannel) in matches:
+            if (channel.isSource()):
+                self.addChannelEdge(module, channel)
+            elif (partnerChannel.isSource()):
+                self.addChannelEdge(partnerModule, partnerChannel)
+
+        # depending on what we are doing with the graph,
+        # unmatched channels may not be an error.  We will
+        # instead mark the object in case the caller cares
+        for module in otherModules:
+            if (module.checkUnmatchedChannels()):
+                self.unmatchedChannels = True
          
 
     def trimOptionalChannels(self):
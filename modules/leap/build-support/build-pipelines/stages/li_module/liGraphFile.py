@@ -0,0 +1,605 @@
+import os
+import sys
+import gc
+import types
+import struct
+import zlib
+import cStringIO
+import cPickle as pickle
+
+from liModule import LIModule
+from liChannel import LIChannel
+from liChain import LIChain
+from liService import LIService
+from liRecord import LIRecord
+from liGraph import LIGraph
+
+##
+## On-disk LI graphs.
+##
+## LI graphs (<APM>.li, lim.li) are pickled LIGraph objects, and tools
+## outside this build read them with pickle.load().  Reading one module's
+## attributes from a pickle means unpickling every module and channel in
+## the graph, so writeLIGraph() also writes an LI graph file next to the
+## pickle (see liGraphFilePath), which stores each module as its own
+## record:
+##
+##   header:   LI_GRAPH_MAGIC, then the format version (4 bytes)
+##   modules:  a record for each module: the classes of the module and
+##             of its channels, chains and services, then their fields
+##   graph:    the graph record: edges and edge weights, and any other
+##             graph state
+##   index:    the order of the modules, the location of every record
+##             and the size and modification time of the pickle the file
+##             was written with
+##   trailer:  the offset of the index (8 bytes), then LI_GRAPH_TRAILER
+##
+## Records are compressed pickles of the fields of the stored objects,
+## not of the objects themselves.  Before a record is pickled, every
+## module of the graph and every connection of the record's module are
+## entered in the pickler's memo, numbered in module order, so references
+## to them are written as memo references.  References to connections of
+## other modules are written as persistent ids: the module name, the
+## connection's slot in its module and its name.  Loading a record enters
+## the same objects in the unpickler's memo.  Loading the whole graph
+## creates every module and connection first, then restores their
+## fields.  Loading a single module puts LIModuleReference and
+## LIConnectionReference objects, which carry the name of the object they
+## stand for, in the place of other modules and their connections.
+##
+## Other objects shared between modules are stored once per module that
+## refers to them.
+##
+
+LI_GRAPH_MAGIC = 'LEAP LI GRAPH\n'
+LI_GRAPH_TRAILER = 'LIGRAPHX'
+LI_GRAPH_VERSION = 2
+
+liConnectionClasses = (LIChannel, LIChain, LIService)
+
+
+class LIModuleReference():
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "{ MODULE REFERENCE:" + self.name + " }"
+
+
+class LIConnectionReference():
+
+    def __init__(self, module_name, slot, name):
+        self.module_name = module_name
+        self.slot = slot
+        self.name = name
+
+    def __repr__(self):
+        return "{ CONNECTION REFERENCE:" + self.module_name + ":" + self.name + " }"
+
+
+##
+## liGraphFilePath --
+##   The LI graph file written alongside the pickled LI graph filename.
+##
+def liGraphFilePath(filename):
+    return os.path.splitext(str(filename))[0] + '.lig'
+
+
+##
+## fileStamp --
+##   The size and modification time of a file, which an LI graph file
+##   records for the pickle it was written with.
+##
+def fileStamp(filename):
+    status = os.stat(str(filename))
+    return (status.st_size, status.st_mtime)
+
+
+##
+## withoutCollection --
+##   Call function with the cyclic garbage collector paused.  Loading and
+##   writing graphs creates a great many objects and little garbage, and
+##   the collector would otherwise run over the growing graph again and
+##   again.
+##
+def withoutCollection(function, *args):
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return function(*args)
+    finally:
+        if (collecting):
+            gc.enable()
+
+
+def emptyInstance(cls):
+    # Objects are restored without running their constructors.
+    if (isinstance(cls, types.ClassType)):
+        return types.InstanceType(cls)
+    return cls.__new__(cls)
+
+
+##
+## objectState, setObjectState --
+##   The fields of a stored object.  The LI connection records define
+##   their own stored form (see liRecord.py); other objects are stored by
+##   their instance dictionaries.
+##
+def objectState(value):
+    if (isinstance(value, LIRecord)):
+        return value.fieldState()
+    return value.__dict__
+
+
+def setObjectState(value, state):
+    if (isinstance(value, LIRecord)):
+        value.__setstate__(state)
+    else:
+        value.__dict__.update(state)
+
+
+##
+## moduleConnections --
+##   The connections stored with a module, in a fixed order: its
+##   channels, chains and services, followed by any connection the
+##   module owns that is only reachable through its name tables.
+##
+def moduleConnections(module):
+    connections = module.channels + module.chains + module.services
+    known = set([id(connection) for connection in connections])
+    for table in [module.channelNames, module.serviceNames]:
+        for connection in table.values():
+            if (isinstance(connection, liConnectionClasses) and
+                (connection.module is module) and (not id(connection) in known)):
+                connections.append(connection)
+                known.add(id(connection))
+    return connections
+
+
+class LIGraphWriter():
+
+    ##
+    ## A streaming LI graph writer.  The writer is given the modules of
+    ## the graph up front, so that references between them can be
+    ## numbered.  Each module is written as it is passed to
+    ## writeModule(); close() writes the graph record and the index.
+    ##
+    def __init__(self, filename, modules):
+        self.filename = str(filename)
+        self.handle = open(self.filename, 'wb')
+        self.handle.write(LI_GRAPH_MAGIC + struct.pack('<I', LI_GRAPH_VERSION))
+        self.order = [module.name for module in modules]
+        self.records = {}
+        # Pickler memo entries of the modules, keyed by object id.
+        self.moduleMemo = dict([(id(module), (index, module)) for (index, module) in enumerate(modules)])
+        # Connection slots of every module seen so far, by module id.
+        self.slots = {}
+
+    def connectionSlots(self, module):
+        if (not id(module) in self.slots):
+            slots = {}
+            for connection in moduleConnections(module):
+                slots[id(connection)] = len(slots)
+            self.slots[id(module)] = slots
+        return self.slots[id(module)]
+
+    ##
+    ## persistentId --
+    ##   pickle's hook for objects missing from the memo: connections of
+    ##   other modules are stored by name and slot.  Connections not
+    ##   owned by a module of the graph are stored as they are.
+    ##
+    def persistentId(self, value):
+        if (isinstance(value, liConnectionClasses)):
+            owner = getattr(value, 'module', None)
+            if (id(owner) in self.moduleMemo):
+                slots = self.connectionSlots(owner)
+                if (id(value) in slots):
+                    return (owner.name, slots[id(value)], value.name)
+        return None
+
+    ##
+    ## writeRecord --
+    ##   Write header, which must not refer to modules or connections,
+    ##   followed by value, with references to the modules of the graph
+    ##   and to connections written as described above.
+    ##
+    def writeRecord(self, header, value, connections=[]):
+        buffer = cStringIO.StringIO()
+        pickle.dump(header, buffer, protocol=-1)
+
+        memo = dict(self.moduleMemo)
+        for connection in connections:
+            memo[id(connection)] = (len(memo), connection)
+        pickler = pickle.Pickler(buffer, -1)
+        pickler.memo = memo
+        pickler.inst_persistent_id = self.persistentId
+        pickler.dump(value)
+
+        data = zlib.compress(buffer.getvalue(), 1)
+        offset = self.handle.tell()
+        self.handle.write(data)
+        return (offset, len(data))
+
+    def writeModule(self, module):
+        if (not id(module) in self.moduleMemo):
+            raise ValueError('LI graph module ' + module.name + ' was not given to the writer')
+        if (module.name in self.records):
+            raise ValueError('LI graph module ' + module.name + ' written twice')
+
+        connections = moduleConnections(module)
+        self.connectionSlots(module)
+
+        header = (module.__class__, [connection.__class__ for connection in connections])
+        state = (objectState(module), [objectState(connection) for connection in connections])
+        self.records[module.name] = self.writeRecord(header, state, connections)
+
+    ##
+    ## close --
+    ##   Finish the file.  If liGraph is given, its pygraph graph, edge
+    ##   weights and other state are recorded.  Otherwise the edges are
+    ##   rebuilt from the matched channels when the graph is loaded.  If
+    ##   pickleFilename is given, the file is marked as written with that
+    ##   pickle (see openLIGraph).
+    ##
+    def close(self, liGraph=None, pickleFilename=None):
+        graphRecord = None
+        if (not liGraph is None):
+            # The pygraph graph is stored field by field.  Restoring its
+            # fields is much cheaper than adding its edges one by one.
+            state = dict(liGraph.__dict__)
+            for field in ['modules', 'graph', 'unmatchedIndex', 'unmatchedIndexStamp']:
+                state.pop(field, None)
+            graphRecord = self.writeRecord(liGraph.graph.__class__, (liGraph.graph.__dict__, state))
+
+        pickleStamp = None
+        if (not pickleFilename is None):
+            pickleStamp = fileStamp(pickleFilename)
+
+        indexOffset = self.handle.tell()
+        self.handle.write(pickle.dumps({'version': LI_GRAPH_VERSION,
+                                        'order': self.order,
+                                        'modules': self.records,
+                                        'graph': graphRecord,
+                                        'pickle': pickleStamp},
+                                       protocol=-1))
+        self.handle.write(struct.pack('<Q', indexOffset) + LI_GRAPH_TRAILER)
+        self.handle.close()
+        self.slots = {}
+
+
+class LIGraphFile():
+
+    ##
+    ## A reader for LI graph files.  Opening a file reads only its index.
+    ## Modules are loaded on demand through the modules map, which
+    ## behaves like LIGraph.modules for lookups, or through the
+    ## accessors below.
+    ##
+    def __init__(self, filename):
+        self.filename = str(filename)
+        handle = open(self.filename, 'rb')
+        header = handle.read(len(LI_GRAPH_MAGIC) + 4)
+        if (header[:len(LI_GRAPH_MAGIC)] != LI_GRAPH_MAGIC):
+            handle.close()
+            raise ValueError(self.filename + ' is not an LI graph file')
+
+        version = struct.unpack('<I', header[len(LI_GRAPH_MAGIC):])[0]
+        if (version != LI_GRAPH_VERSION):
+            handle.close()
+            raise ValueError(self.filename + ': unsupported LI graph version ' + str(version))
+
+        handle.seek(-(8 + len(LI_GRAPH_TRAILER)), os.SEEK_END)
+        trailer = handle.read()
+        if (trailer[8:] != LI_GRAPH_TRAILER):
+            handle.close()
+            raise ValueError(self.filename + ' is truncated')
+
+        handle.seek(struct.unpack('<Q', trailer[:8])[0])
+        index = pickle.loads(handle.read()[:-len(trailer)])
+        handle.close()
+
+        self.order = index['order']
+        self.records = index['modules']
+        self.graphRecord = index['graph']
+        self.pickleStamp = index['pickle']
+        self.modules = LIModuleMap(self)
+        self.loadedModules = {}
+        self.moduleReferences = None
+
+    ##
+    ## readRecord --
+    ##   Open a record.  The header is returned with a function that reads
+    ##   the rest of the record, given the modules of the graph in order,
+    ##   the connections of the record's module and a function resolving
+    ##   references to other connections.
+    ##
+    def readRecord(self, location):
+        (offset, length) = location
+        handle = open(self.filename, 'rb')
+        handle.seek(offset)
+        data = handle.read(length)
+        handle.close()
+
+        record = cStringIO.StringIO(zlib.decompress(data))
+        header = pickle.load(record)
+
+        def readValue(modules, connections, resolve):
+            memo = dict(enumerate(modules))
+            for connection in connections:
+                memo[len(memo)] = connection
+            unpickler = pickle.Unpickler(record)
+            unpickler.memo = memo
+            unpickler.persistent_load = resolve
+            return unpickler.load()
+
+        return (header, readValue)
+
+    def moduleNames(self):
+        return [name for name in self.order if name in self.records]
+
+    def hasModule(self, name):
+        return name in self.records
+
+    def getModuleAttributes(self, name):
+        return self.loadModule(name).attributes
+
+    def getModuleObjectCode(self, name):
+        return self.loadModule(name).objectCache
+
+    ##
+    ## loadModule --
+    ##   Load one module and its connections.  References to other
+    ##   modules and their connections remain symbolic.  Modules are
+    ##   cached, so repeated loads return the same object.
+    ##
+    def loadModule(self, name):
+        if (not name in self.loadedModules):
+            if (self.moduleReferences is None):
+                self.moduleReferences = [LIModuleReference(moduleName) for moduleName in self.order]
+
+            (module, connections, readValue) = self.createModule(name)
+            modules = list(self.moduleReferences)
+            modules[self.order.index(name)] = module
+            def resolve(reference):
+                return LIConnectionReference(*reference)
+            restoreModule(module, connections, readValue(modules, connections, resolve))
+            self.loadedModules[name] = module
+        return self.loadedModules[name]
+
+    def createModule(self, name):
+        ((moduleClass, connectionClasses), readValue) = self.readRecord(self.records[name])
+        module = emptyInstance(moduleClass)
+        connections = [emptyInstance(connectionClass) for connectionClass in connectionClasses]
+        return (module, connections, readValue)
+
+    ##
+    ## loadGraph --
+    ##   Load the whole graph as an LIGraph.
+    ##
+    def loadGraph(self):
+        return withoutCollection(self.loadGraphObjects)
+
+    def loadGraphObjects(self):
+        modules = []
+        created = {}
+        for name in self.order:
+            if (name in self.records):
+                created[name] = self.createModule(name)
+                modules.append(created[name][0])
+            else:
+                modules.append(LIModuleReference(name))
+
+        def resolve(reference):
+            (moduleName, slot, name) = reference
+            return created[moduleName][1][slot]
+
+        for name in self.moduleNames():
+            (module, connections, readValue) = created[name]
+            restoreModule(module, connections, readValue(modules, connections, resolve))
+
+        liGraph = LIGraph([])
+        for name in self.moduleNames():
+            liGraph.modules[name] = created[name][0]
+
+        if (self.graphRecord is None):
+            liGraph.graph.add_nodes(liGraph.modules.values())
+            for module in liGraph.modules.values():
+                for channel in module.channels:
+                    if (channel.matched and channel.isSource()):
+                        liGraph.addChannelEdge(module, channel)
+            liGraph.unmatchedChannels = liGraph.checkUnmatchedChannels()
+        else:
+            (graphClass, readValue) = self.readRecord(self.graphRecord)
+            (graphState, state) = readValue(modules, [], resolve)
+            liGraph.graph = emptyInstance(graphClass)
+            liGraph.graph.__dict__.update(graphState)
+            liGraph.__dict__.update(state)
+
+        return liGraph
+
+
+class LIModuleMap():
+
+    ##
+    ## A read-only, lazily loaded stand-in for LIGraph.modules.
+    ##
+    def __init__(self, graphFile):
+        self.graphFile = graphFile
+
+    def __contains__(self, name):
+        return self.graphFile.hasModule(name)
+
+    def __getitem__(self, name):
+        if (not self.graphFile.hasModule(name)):
+            raise KeyError(name)
+        return self.graphFile.loadModule(name)
+
+    def __iter__(self):
+        return iter(self.graphFile.moduleNames())
+
+    def __len__(self):
+        return len(self.graphFile.records)
+
+    def get(self, name, default=None):
+        if (name in self):
+            return self[name]
+        return default
+
+    def keys(self):
+        return self.graphFile.moduleNames()
+
+    def values(self):
+        return [self[name] for name in self.graphFile.moduleNames()]
+
+    def items(self):
+        return [(name, self[name]) for name in self.graphFile.moduleNames()]
+
+
+def restoreModule(module, connections, states):
+    (moduleState, connectionStates) = states
+    setObjectState(module, moduleState)
+    for (connection, state) in zip(connections, connectionStates):
+        setObjectState(connection, state)
+
+
+##
+## writeLIGraphFile --
+##   Write liGraph to graphFilename as an LI graph file.
+##
+def writeLIGraphFile(liGraph, graphFilename, pickleFilename=None):
+    def write():
+        writer = LIGraphWriter(graphFilename, liGraph.modules.values())
+        for module in liGraph.modules.values():
+            writer.writeModule(module)
+        writer.close(liGraph, pickleFilename)
+
+    withoutCollection(write)
+
+
+##
+## writeLIGraph --
+##   Pickle liGraph to filename and write its LI graph file alongside.
+##
+def writeLIGraph(liGraph, filename):
+    def write():
+        pickleHandle = open(str(filename), 'wb')
+        pickle.dump(liGraph, pickleHandle, protocol=-1)
+        pickleHandle.close()
+
+    withoutCollection(write)
+    writeLIGraphFile(liGraph, liGraphFilePath(filename), filename)
+
+
+def isLIGraphFile(filename):
+    handle = open(str(filename), 'rb')
+    header = handle.read(len(LI_GRAPH_MAGIC))
+    handle.close()
+    return header == LI_GRAPH_MAGIC
+
+
+##
+## currentLIGraphFile --
+##   The LI graph file written with the pickled LI graph filename, or
+##   None if there is none or the pickle has been written since.
+##
+def currentLIGraphFile(filename):
+    graphFilename = liGraphFilePath(filename)
+    if (not os.path.isfile(graphFilename)):
+        return None
+
+    try:
+        graphFile = LIGraphFile(graphFilename)
+    except ValueError:
+        return None
+
+    if (graphFile.pickleStamp != fileStamp(filename)):
+        return None
+    return graphFile
+
+
+##
+## loadLIGraph --
+##   Load a whole LI graph, given a pickled LIGraph or an LI graph file.
+##   A pickle's LI graph file is loaded instead when it is current, since
+##   it loads faster.
+##
+def loadLIGraph(filename):
+    if (isLIGraphFile(filename)):
+        return LIGraphFile(filename).loadGraph()
+
+    graphFile = currentLIGraphFile(filename)
+    if (not graphFile is None):
+        return graphFile.loadGraph()
+
+    pickleHandle = open(str(filename), 'rb')
+    liGraph = withoutCollection(loadPickle, pickleHandle)
+    pickleHandle.close()
+    return liGraph
+
+
+##
+## Pickles written before the connection records were slotted hold
+## old-style instances of LIChannel, LIChain and LIService, which
+## unpickle by calling their class with no arguments.  Those classes are
+## unpickled as the subclasses below, which construct an empty record of
+## their base class when called.  Records pickled since are unaffected.
+##
+def restorableRecordClass(cls):
+    def create(subclass, *args):
+        return cls.__new__(cls)
+    return type(cls.__name__, (cls,), {'__slots__': (),
+                                        '__new__': staticmethod(create)})
+
+# Keyed by the last component of the module name, which depends on how
+# the pickling build imported li_module, and the class name.
+restorableRecordClasses = dict([((cls.__module__.split('.')[-1], cls.__name__), restorableRecordClass(cls))
+                                for cls in liConnectionClasses])
+
+
+def findPickledClass(moduleName, name):
+    key = (moduleName.split('.')[-1], name)
+    if (key in restorableRecordClasses):
+        return restorableRecordClasses[key]
+    __import__(moduleName)
+    return getattr(sys.modules[moduleName], name)
+
+
+def loadPickle(handle):
+    unpickler = pickle.Unpickler(handle)
+    unpickler.find_global = findPickledClass
+    return unpickler.load()
+
+
+##
+## openLIGraph --
+##   Open an LI graph for lazy access.  A pickled graph without a current
+##   LI graph file has to be loaded whole; the LIGraph is returned in
+##   that case, which supports the same modules lookups.
+##
+def openLIGraph(filename):
+    if (isLIGraphFile(filename)):
+        return LIGraphFile(filename)
+
+    graphFile = currentLIGraphFile(filename)
+    if (not graphFile is None):
+        return graphFile
+    return loadLIGraph(filename)
+
+
+##
+## Converters between pickled LI graphs and LI graph files.
+##
+def convertLIGraphPickle(pickleFilename, graphFilename=None):
+    liGraph = loadLIGraph(pickleFilename)
+    if (graphFilename is None):
+        writeLIGraphFile(liGraph, liGraphFilePath(pickleFilename), pickleFilename)
+    else:
+        writeLIGraphFile(liGraph, graphFilename)
+
+def convertLIGraphFile(graphFilename, pickleFilename):
+    liGraph = loadLIGraph(graphFilename)
+    pickleHandle = open(str(pickleFilename), 'wb')
+    pickle.dump(liGraph, pickleHandle, protocol=-1)
+    pickleHandle.close()
@@ -0,0 +1,74 @@
+import pygraph
+
+try:
+    from pygraph.classes.digraph import digraph
+except ImportError:
+    print "\n"
+
+##
+## LIGraphView --
+##   A subset of the modules of an LI graph, presented through the query
+##   interface of LIGraph (modules, getChannels(), getChains(),
+##   getServices(), graph and weights) without copying any module or
+##   connection.  Views are read-only: the modules and connections are
+##   those of the underlying graph.
+##
+##   A view's edges are the channels matched between modules of the
+##   view, each of unit weight, as in an LIGraph built from copies of
+##   the same modules' connections.  Matches are those of the underlying
+##   graph.
+##
+##   Views may be taken of views.
+##
+class LIGraphView():
+
+    def __init__(self, liGraph, modules):
+        self.base = liGraph
+        if (isinstance(liGraph, LIGraphView)):
+            self.base = liGraph.base
+
+        self.modules = {}
+        for module in modules:
+            self.modules[module.name] = module
+
+        try:
+            self.graph = pygraph.digraph()
+        except (NameError, AttributeError):
+            self.graph = digraph()
+
+        self.graph.add_nodes(self.modules.values())
+        self.weights = {}
+
+        for module in self.modules.values():
+            for channel in module.channels:
+                if ((not channel.matched) or (not channel.isSource())):
+                    continue
+                partner = channel.partnerModule
+                if (self.modules.get(partner.name) is partner):
+                    edge = (module, partner)
+                    if (edge in self.weights):
+                        self.weights[edge] += 1
+                    else:
+                        self.graph.add_edge(edge)
+                        self.weights[edge] = 1
+
+    def getChannels(self):
+        channels = []
+        for (name,module) in self.modules.items():
+            channels += module.channels
+        return channels
+
+    def getChains(self):
+        chains = []
+        for (name,module) in self.modules.items():
+            chains += module.chains
+        return chains
+
+    def getServices(self):
+        services = []
+        for (name,module) in self.modules.items():
+            services += module.services
+        return services
+
+    def __repr__(self):
+        return '{VIEW ' + ', '.join(sorted(self.modules.keys())) + '}'
@@ -0,0 +1,215 @@
+import os
+import re
+import time
+import hashlib
+import cPickle as pickle
+
+from liChannel import LIChannel
+from liChain import LIChain
+from liService import LIService
+
+##
+## Indexed bsc compilation logs.
+##
+## Several build stages scan the same bsc logs: the LI graph is rebuilt
+## from the dangling connection messages for connection sizing, the LIM
+## graph dump, the build tree and the software stubs, and MCD looks for
+## clock domain crossings.  Logs may be hundreds of megabytes long.
+##
+## indexLogfile() reads a log once, extracting every dangling connection
+## record and noting whether the log mentions a domain crossing, and
+## saves the result in a sidecar file (<log>.idx).  The sidecar records
+## the log's size and md5 digest, which decide whether the log changed,
+## and a stat key (size, mtime, ctime, inode) saving the digest pass when
+## the key is unchanged.  A log modified within LOG_INDEX_RACY_WINDOW
+## seconds before it was indexed may be rewritten within the timestamp
+## granularity (common on NFS) without changing its key, so the key of
+## such a log is not trusted and the log is hashed again.
+##
+## logRecordConnection() turns records back into LI connections.
+##
+
+LOG_INDEX_VERSION = 2
+
+LOG_INDEX_CHUNK = 1 << 20
+
+LOG_INDEX_RACY_WINDOW = 2.0
+
+# A dangling connection message, matched a line at a time.
+danglingLineRE = re.compile(r'Compilation message: .*: Dangling (\w+) {.*')
+
+danglingChannelRE = re.compile(r'.*Dangling (\w+) {(.*)} \[(\d+)\]:(\w+):(\w+):(\d+):(\w+):(\w+)')
+danglingServiceRE = re.compile(r'.*Dangling (\w+) {(.*)} {(.*)} \[(\d+)\]:(\w+):(\d+):(\d+):(\d+):(\w+):(\d+)')
+
+
+def logIndexPath(logfile):
+    return str(logfile) + '.idx'
+
+
+##
+## scanLogText --
+##   Extract the records from a block of complete log lines.  Records are
+##   ('CHANNEL', groups) for Chain/Send/Recv messages, ('SERVICE', groups)
+##   for service messages and ('MALFORMED', line) for messages that fit
+##   neither format.  groups are the fields of the message, as parsed by
+##   danglingChannelRE or danglingServiceRE.
+##
+def scanLogText(text, records):
+    # Messages are rare, so look for the keyword rather than running the
+    # message pattern over every line.
+    position = text.find('Dangling')
+    while (position != -1):
+        start = text.rfind('\n', 0, position) + 1
+        end = text.find('\n', position)
+        if (end == -1):
+            end = len(text)
+        line = text[start:end]
+        position = text.find('Dangling', end)
+
+        message = danglingLineRE.match(line)
+        if (not message):
+            continue
+
+        if (message.group(1) in ['Chain', 'Send', 'Recv']):
+            (kind, match) = ('CHANNEL', danglingChannelRE.search(line))
+        else:
+            (kind, match) = ('SERVICE', danglingServiceRE.search(line))
+
+        if (match):
+            records.append((kind, match.groups()))
+        else:
+            records.append(('MALFORMED', line + '\n'))
+
+
+def logStatKey(logStat):
+    return (logStat.st_size, logStat.st_mtime, logStat.st_ctime, logStat.st_ino)
+
+
+def writeLogIndex(indexPath, index):
+    # The index is only a cache.  Failing to save it is harmless.
+    try:
+        indexHandle = open(indexPath, 'wb')
+        pickle.dump(index, indexHandle, protocol=-1)
+        indexHandle.close()
+    except (IOError, OSError):
+        pass
+
+
+def logDigest(logfile):
+    digest = hashlib.md5()
+    log = open(logfile, 'rb')
+    while (True):
+        chunk = log.read(LOG_INDEX_CHUNK)
+        if (not chunk):
+            break
+        digest.update(chunk)
+    log.close()
+    return digest.hexdigest()
+
+
+##
+## indexLogfile --
+##   Return the index of a log: a dictionary holding the 'connections'
+##   records (see scanLogText) and a 'crossDomain' flag.
+##
+def indexLogfile(logfile):
+    logfile = str(logfile)
+    indexPath = logIndexPath(logfile)
+    logStat = os.stat(logfile)
+    logSize = logStat.st_size
+
+    index = None
+    if (os.path.exists(indexPath)):
+        try:
+            indexHandle = open(indexPath, 'rb')
+            index = pickle.load(indexHandle)
+            indexHandle.close()
+        except Exception:
+            index = None
+
+    # A log of a different size has changed.  Otherwise an unchanged stat
+    # key, unless the log was modified too close to its indexing, or
+    # the digest of its contents tells.
+    if ((not index is None) and (index.get('version') == LOG_INDEX_VERSION) and
+        (index['size'] == logSize)):
+        if ((index['stat'] == logStatKey(logStat)) and
+            (logStat.st_mtime < index['indexed'] - LOG_INDEX_RACY_WINDOW)):
+            return index
+
+        indexed = time.time()
+        if (index['digest'] == logDigest(logfile)):
+            index['stat'] = logStatKey(logStat)
+            index['indexed'] = indexed
+            writeLogIndex(indexPath, index)
+            return index
+
+    # Hash and scan the log in one pass.  Blocks are cut at line
+    # boundaries so that no message straddles two blocks.  The log may
+    # change while it is read, so the stat key is the one taken before
+    # and the indexing time that of the start of the pass.
+    indexed = time.time()
+    digest = hashlib.md5()
+    records = []
+    crossDomain = False
+    pending = ''
+
+    log = open(logfile, 'rb')
+    while (True):
+        chunk = log.read(LOG_INDEX_CHUNK)
+        if (not chunk):
+            break
+        digest.update(chunk)
+
+        text = pending + chunk
+        cut = text.rfind('\n') + 1
+        pending = text[cut:]
+        text = text[:cut]
+
+        scanLogText(text, records)
+        crossDomain = crossDomain or ('CrossDomain' in text)
+    log.close()
+
+    scanLogText(pending, records)
+    crossDomain = crossDomain or ('CrossDomain' in pending)
+
+    index = {'version': LOG_INDEX_VERSION,
+             'size': logSize,
+             'digest': digest.hexdigest(),
+             'stat': logStatKey(logStat),
+             'indexed': indexed,
+             'connections': records,
+             'crossDomain': crossDomain}
+    writeLogIndex(indexPath, index)
+
+    return index
+
+
+##
+## logRecordConnection --
+##   The LI connection a CHANNEL or SERVICE record describes:  an LIChain
+##   or LIChannel for CHANNEL records, an LIService for SERVICE records.
+##   As before, the type structure of connections read from logs is
+##   the placeholder 'type'.
+##
+def logRecordConnection(kind, fields):
+    if (kind == 'CHANNEL'):
+        (sc_type, raw_type, module_idx, name, optional, bitwidth, module_name, chain_root) = fields
+        if (sc_type == 'Chain'):
+            return LIChain(sc_type, raw_type, module_idx, name, eval(optional), bitwidth,
+                           module_name, chain_root, chain_root, type)
+        return LIChannel(sc_type, raw_type, module_idx, name, eval(optional), bitwidth,
+                         module_name, module_name, type)
+
+    (sc_type, req_raw_type, resp_raw_type, module_idx, name, req_bitwidth, resp_bitwidth,
+     idx_bitwidth, module_name, client_idx) = fields
+    return LIService(sc_type, req_raw_type, resp_raw_type, module_idx, name, False,
+                     req_bitwidth, resp_bitwidth, idx_bitwidth, module_name, module_name,
+                     client_idx, type)
+
+
+##
+## logHasCrossDomain --
+##   Does a log mention a clock domain crossing?
+##
+def logHasCrossDomain(logfile):
+    return indexLogfile(logfile)['crossDomain']
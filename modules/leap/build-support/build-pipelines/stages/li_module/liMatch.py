@@ -0,0 +1,204 @@
+import sys
+
+##
+## Hash-indexed matching of LI endpoints.
+##
+## The original matching code compared every module against every
+## other module and then every channel against every other channel.
+## Only endpoints sharing a name can ever match, so here endpoints are
+## bucketed by name and comparisons are confined to a bucket.  For a
+## well-formed design each bucket holds a single send/receive pair and
+## matching becomes linear in the number of endpoints.
+##
+## The results are identical to the exhaustive pairwise algorithm:
+## ambiguous buckets (more than one candidate partner) are resolved in
+## the same module/channel order and type mismatches are reported for
+## the same pair of endpoints.
+##
+
+class LIEndpointIndex():
+
+    # connections may be any mixture of channels, chains and services.
+    def __init__(self, connections=[]):
+        self.endpoints = {}
+        for connection in connections:
+            self.add(connection)
+
+    def add(self, connection):
+        if (connection.name in self.endpoints):
+            self.endpoints[connection.name].append(connection)
+        else:
+            self.endpoints[connection.name] = [connection]
+
+    def names(self):
+        return self.endpoints.keys()
+
+    # Return endpoints named name, in insertion order, optionally
+    # filtered by connection type and platform.
+    def lookup(self, name, sc_type=None, platform=None):
+        if (not name in self.endpoints):
+            return []
+
+        return [connection for connection in self.endpoints[name]
+                if (((sc_type is None) or (connection.sc_type == sc_type)) and
+                    ((platform is None) or (connection.platform() == platform)))]
+
+
+##
+## matchingPairs --
+##   Return all (connection, partner) pairs for which
+##   connection.matches(partner) holds, in the same order as a nested
+##   loop over connections and partners would produce them.
+##
+def matchingPairs(connections, partners):
+    index = LIEndpointIndex(partners)
+    pairs = []
+    for connection in connections:
+        for partner in index.lookup(connection.name):
+            if (connection.matches(partner)):
+                pairs.append((connection, partner))
+    return pairs
+
+
+##
+## groupUnmatchedChannels --
+##   Bucket the unmatched channels of a list of modules by name.  Each
+##   bucket holds (module, channel) entries in module and then channel
+##   order.
+##
+def groupUnmatchedChannels(modules):
+    groups = {}
+    for module in modules:
+        for channel in module.channels:
+            if (channel.matched):
+                continue
+            if (channel.name in groups):
+                groups[channel.name].append((module, channel))
+            else:
+                groups[channel.name] = [(module, channel)]
+    return groups
+
+
+def bindChannels(module, channel, partnerModule, partnerChannel):
+    channel.partnerChannel = partnerChannel
+    channel.partnerModule = partnerModule
+    partnerChannel.partnerChannel = channel
+    partnerChannel.partnerModule = module
+    channel.matched = True
+    partnerChannel.matched = True
+
+
+##
+## matchChannelGroups --
+##   Match channels bucketed by name.  moduleOrder maps module names to
+##   the position of the module in the graph's module iteration order;
+##   it determines which partner wins when a bucket is ambiguous.
+##
+##   Returns the list of newly matched (module, channel, partnerModule,
+##   partnerChannel) tuples.  Exits the build on a type mismatch,
+##   exactly as LIChannel.matches() does.
+##
+def matchChannelGroups(groups, moduleOrder):
+    matches = []
+    mismatches = []
+
+    for entries in groups:
+        entries = [entry for entry in entries if (not entry[1].matched)]
+        if (len(entries) < 2):
+            continue
+
+        # Stable sort preserves channel order within a module.
+        entries.sort(key=lambda entry: moduleOrder[entry[0].name])
+
+        if (len(set([channel.raw_type for (module, channel) in entries])) == 1):
+            matchGroupGreedy(entries, matches)
+        else:
+            mismatch = matchGroupExhaustive(entries, matches)
+            if (not mismatch is None):
+                mismatches.append(mismatch)
+
+    if (len(mismatches) > 0):
+        # Report the mismatch the pairwise algorithm would have hit first.
+        def mismatchOrder(mismatch):
+            (module, channel, partnerModule, partnerChannel) = mismatch
+            return (moduleOrder[module.name], moduleOrder[partnerModule.name],
+                    module.channels.index(channel), partnerModule.channels.index(partnerChannel))
+
+        (module, channel, partnerModule, partnerChannel) = min(mismatches, key=mismatchOrder)
+        channel.matches(partnerChannel)
+        sys.exit(-1)
+
+    return matches
+
+
+##
+## matchGroupGreedy --
+##   All channels in the bucket share a type, so no comparison can fail.
+##   Each unmatched channel binds to the first free partner of the
+##   opposite direction in another module, which is the partner the
+##   pairwise algorithm would have chosen.
+##
+def matchGroupGreedy(entries, matches):
+    candidates = {'Send': [], 'Recv': []}
+    for entry in entries:
+        if (entry[1].sc_type in candidates):
+            candidates[entry[1].sc_type].append(entry)
+
+    partnerType = {'Send': 'Recv', 'Recv': 'Send'}
+
+    for (module, channel) in entries:
+        if (channel.matched or not (channel.sc_type in partnerType)):
+            continue
+        for (partnerModule, partnerChannel) in candidates[partnerType[channel.sc_type]]:
+            if (partnerChannel.matched or (partnerModule.name == module.name)):
+                continue
+            bindChannels(module, channel, partnerModule, partnerChannel)
+            matches.append((module, channel, partnerModule, partnerChannel))
+            break
+
+
+##
+## matchGroupExhaustive --
+##   Replay the pairwise algorithm within a single bucket.  Used only
+##   when the bucket holds differing types, since the comparison order
+##   then decides whether and where a mismatch is detected.  Returns the
+##   first mismatched pair or None.
+##
+def matchGroupExhaustive(entries, matches):
+    byModule = []
+    for (module, channel) in entries:
+        if ((len(byModule) > 0) and (byModule[-1][0] is module)):
+            byModule[-1][1].append(channel)
+        else:
+            byModule.append((module, [channel]))
+
+    for (module, channels) in byModule:
+        for (partnerModule, partnerChannels) in byModule:
+            if (module.name == partnerModule.name):
+                continue
+            for channel in channels:
+                if (channel.matched):
+                    continue
+                for partnerChannel in partnerChannels:
+                    if (partnerChannel.matched):
+                        continue
+                    if (partnerChannel.raw_type != channel.raw_type):
+                        return (module, channel, partnerModule, partnerChannel)
+                    if (channel.matches(partnerChannel)):
+                        bindChannels(module, channel, partnerModule, partnerChannel)
+                        matches.append((module, channel, partnerModule, partnerChannel))
+
+    return None
+
+
+##
+## matchModuleChannels --
+##   Match all unmatched channels among a list of modules.  The list
+##   order plays the role of the module iteration order.
+##
+def matchModuleChannels(modules):
+    moduleOrder = {}
+    for module in modules:
+        moduleOrder[module.name] = len(moduleOrder)
+
+    return matchChannelGroups(groupUnmatchedChannels(modules).values(), moduleOrder)
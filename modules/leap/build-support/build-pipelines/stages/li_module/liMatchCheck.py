@@ -0,0 +1,121 @@
+##
+## Differential check of the indexed LI channel matcher (liMatch) against
+## the exhaustive pairwise matcher it replaced.
+##
+## Random module sets are matched by both algorithms and the bindings,
+## the type mismatch reports and the exit status are compared.  Run it
+## from any directory:
+##
+##   python liMatchCheck.py [trials] [first seed]
+##
+
+import os
+import sys
+import random
+import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from liModule import LIModule
+from liChannel import LIChannel
+import liMatch
+
+
+##
+## pairwiseMatch --
+##   The matcher as it was in LIGraph.matchGraphChannels():  every module
+##   against every other module, then every channel against every other
+##   channel.
+##
+def pairwiseMatch(modules):
+    for module in modules:
+        for partnerModule in modules:
+            if (module.name == partnerModule.name):
+                continue
+            for channel in module.channels:
+                if (channel.matched):
+                    continue
+                for partnerChannel in partnerModule.channels:
+                    if (partnerChannel.matched):
+                        continue
+                    if (channel.matches(partnerChannel)):
+                        liMatch.bindChannels(module, channel, partnerModule, partnerChannel)
+
+
+def randomModules(seed):
+    rng = random.Random(seed)
+    names = ['c' + str(i) for i in range(rng.randint(1, 6))]
+    if (rng.random() < 0.7):
+        types = ['T1']
+    else:
+        types = ['T1', 'T2']
+
+    order = range(rng.randint(1, 8))
+    rng.shuffle(order)
+
+    modules = []
+    for m in order:
+        module = LIModule('m' + str(m), 'm' + str(m))
+        for idx in range(rng.randint(0, 5)):
+            module.addChannel(LIChannel(rng.choice(['Send', 'Recv']), rng.choice(types), idx,
+                                        rng.choice(names), False, 8, module.name, module.name, None))
+        modules.append(module)
+    return modules
+
+
+##
+## matchOutcome --
+##   Run a matcher and describe what it did:  the exit status, anything
+##   printed and, unless the matcher exited, each channel's partner.
+##
+def matchOutcome(modules, matcher):
+    output = StringIO.StringIO()
+    stdout = sys.stdout
+    sys.stdout = output
+    status = None
+    try:
+        matcher(modules)
+    except SystemExit as exit:
+        status = exit.code
+    finally:
+        sys.stdout = stdout
+
+    if (status is not None):
+        return (status, output.getvalue(), None)
+
+    bindings = []
+    for module in modules:
+        for (idx, channel) in enumerate(module.channels):
+            if (channel.matched):
+                bindings.append((module.name, idx, channel.partnerModule.name,
+                                 channel.partnerModule.channels.index(channel.partnerChannel)))
+            else:
+                bindings.append((module.name, idx, None))
+    return (status, output.getvalue(), bindings)
+
+
+def main(argv):
+    trials = 3000
+    first = 0
+    if (len(argv) > 1):
+        trials = int(argv[1])
+    if (len(argv) > 2):
+        first = int(argv[2])
+
+    failures = 0
+    exits = 0
+    for seed in range(first, first + trials):
+        expected = matchOutcome(randomModules(seed), pairwiseMatch)
+        found = matchOutcome(randomModules(seed), liMatch.matchModuleChannels)
+        if (expected[0] is not None):
+            exits += 1
+        if (expected != found):
+            failures += 1
+            print 'seed ' + str(seed) + ': pairwise ' + str(expected) + ', indexed ' + str(found)
+
+    print str(trials) + ' trials (' + str(exits) + ' type mismatches), ' + str(failures) + ' differences'
+    return (failures != 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
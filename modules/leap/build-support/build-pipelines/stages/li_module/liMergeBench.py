@@ -0,0 +1,83 @@
+##
+## Benchmark of LIGraph.mergeModules():  the cost of adding k modules,
+## one merge each, to a graph of n modules.
+##
+## The incremental merge is compared with re-matching the whole graph
+## after each addition, which is what mergeModules() used to do.  The
+## re-match uses the exhaustive pairwise matcher for small graphs, as the
+## old code did, and the indexed matcher otherwise.
+##
+##   python liMergeBench.py [n ...]
+##
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from liModule import LIModule
+from liChannel import LIChannel
+from liGraph import LIGraph
+from liMatch import matchModuleChannels
+from liMatchCheck import pairwiseMatch
+
+PAIRWISE_LIMIT = 400
+
+
+def syntheticModules(seed, prefix, count, names):
+    rng = random.Random(seed)
+    modules = []
+    for m in range(count):
+        module = LIModule(prefix + str(m), prefix + str(m))
+        for idx in range(rng.randint(0, 4)):
+            module.addChannel(LIChannel(rng.choice(['Send', 'Recv']), 'T', idx,
+                                        'c' + str(rng.randint(0, names)),
+                                        rng.random() < 0.2, 8, module.name, module.name, None))
+        modules.append(module)
+    return modules
+
+
+def incrementalMerge(n, k):
+    liGraph = LIGraph([])
+    liGraph.mergeModules(syntheticModules(1, 'n', n, n))
+    extra = syntheticModules(2, 'k', k, n)
+
+    start = time.time()
+    for module in extra:
+        liGraph.mergeModules([module])
+    return time.time() - start
+
+
+def fullRematch(n, k, matcher):
+    modules = syntheticModules(1, 'n', n, n)
+    matcher(modules)
+    extra = syntheticModules(2, 'k', k, n)
+
+    start = time.time()
+    for module in extra:
+        modules.append(module)
+        for m in modules:
+            m.unmatch()
+        matcher(modules)
+    return time.time() - start
+
+
+def main(argv):
+    sizes = [100, 400, 1600, 6400]
+    if (len(argv) > 1):
+        sizes = [int(n) for n in argv[1:]]
+
+    print '%6s %5s %12s %12s %12s' % ('n', 'k', 'incremental', 're-match', 'pairwise')
+    for n in sizes:
+        for k in (10, 100):
+            pairwise = '-'
+            if (n <= PAIRWISE_LIMIT):
+                pairwise = '%.4fs' % fullRematch(n, k, pairwiseMatch)
+            print '%6d %5d %11.4fs %11.4fs %12s' % (n, k, incrementalMerge(n, k),
+                                                     fullRematch(n, k, matchModuleChannels), pairwise)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
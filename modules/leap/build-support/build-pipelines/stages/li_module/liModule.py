@@ -3,6 +3,11 @@ import copy
 
 
 class LIModule():
+
+    # Bumped whenever the module's channels are added, removed or
+    # unmatched.  LIGraph uses it to tell whether its index of dangling
+    # channels is still current.
+    channelVersion = 0
   
     def __init__(self, type, name):
         self.type = type
@@ -48,6 +53,7 @@ class LIModule():
         return rep
 
     def unmatch(self):
+        self.channelVersion += 1
         for channel in self.channels:
             channel.unmatch()
 
@@ -74,6 +80,7 @@ class LIModule():
         channelCopy = channel.copy()
         channelCopy.module = self # You belong to me. 
         self.channels.append(channelCopy)
+        self.channelVersion += 1
         self.channelNames[channelCopy.name] = channelCopy
         return channelCopy
 
@@ -134,6 +141,7 @@ class LIModule():
 
 
     def trimOptionalChannels(self):
+        self.channelVersion += 1
         self.channels = [channel for channel in self.channels if (channel.matched or not channel.optional)]
 
     def checkUnmatchedChannels(self):
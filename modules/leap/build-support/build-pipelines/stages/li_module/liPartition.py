@@ -0,0 +1,330 @@
+import heapq
+import random
+
+from liCut import undirectedGraph
+
+##
+## Multilevel k-way partitioning of LI graphs.
+##
+## The build tree may have any fanout.  A node of the tree merges the
+## wrappers of its children, so the aim is to split a graph into k
+## parts of similar compile cost while cutting as little channel weight
+## as possible.  The partitioner follows the usual multilevel scheme:
+##
+##   1. Coarsen the graph by contracting a heavy-edge matching until it
+##      is small.
+##   2. Partition the coarsest graph by greedy graph growing, keeping the
+##      best of several trials.
+##   3. Project the partition back through each level, restoring balance
+##      and refining it with greedy boundary moves.
+##
+## The partitioner is deterministic for a given graph and seed.
+##
+
+##
+## compileCost --
+##   A module's cost as seen by the compiler of its parent: every
+##   exposed endpoint becomes a rule in the enclosing wrapper.
+##
+def compileCost(module):
+    return 1 + len(module.channels) + len(module.chains) + len(module.services)
+
+
+def partitionCutWeight(adjacency, part):
+    weight = 0
+    for u in range(len(adjacency)):
+        for (v, w) in adjacency[u].iteritems():
+            if ((u < v) and (part[u] != part[v])):
+                weight += w
+    return weight
+
+
+def partitionWeights(vertexWeights, part, parts):
+    partWeights = [0] * parts
+    for u in range(len(part)):
+        partWeights[part[u]] += vertexWeights[u]
+    return partWeights
+
+
+##
+## coarsenGraph --
+##   Contract a heavy-edge matching.  Returns the coarse graph and the
+##   map from fine to coarse vertices.
+##
+def coarsenGraph(adjacency, vertexWeights, maxVertexWeight, rng):
+    numVertices = len(adjacency)
+    match = [-1] * numVertices
+
+    order = range(numVertices)
+    rng.shuffle(order)
+    for u in order:
+        if (match[u] != -1):
+            continue
+        partner = u
+        partnerWeight = 0
+        for (v, w) in sorted(adjacency[u].iteritems()):
+            if ((match[v] == -1) and (w > partnerWeight) and
+                (vertexWeights[u] + vertexWeights[v] <= maxVertexWeight)):
+                partner = v
+                partnerWeight = w
+        match[u] = partner
+        match[partner] = u
+
+    coarseOf = [-1] * numVertices
+    numCoarse = 0
+    for u in range(numVertices):
+        if (coarseOf[u] == -1):
+            coarseOf[u] = numCoarse
+            coarseOf[match[u]] = numCoarse
+            numCoarse += 1
+
+    coarseAdjacency = [{} for c in range(numCoarse)]
+    coarseWeights = [0] * numCoarse
+    for u in range(numVertices):
+        cu = coarseOf[u]
+        coarseWeights[cu] += vertexWeights[u]
+        for (v, w) in adjacency[u].iteritems():
+            cv = coarseOf[v]
+            if (cu != cv):
+                coarseAdjacency[cu][cv] = coarseAdjacency[cu].get(cv, 0) + w
+
+    return (coarseAdjacency, coarseWeights, coarseOf)
+
+
+##
+## growPartition --
+##   Grow parts one at a time from a random seed vertex, each time adding
+##   the frontier vertex most strongly connected to the part, until the
+##   part reaches its share of the remaining weight.  Whatever is left
+##   forms the last part.  Every part receives at least one vertex.
+##
+##   The frontier is a heap of (-connection, vertex) entries.  Entries are
+##   pushed again when a vertex's connection grows; outdated entries are
+##   skipped when they reach the top.  Unassigned vertices are kept in a
+##   list (with each vertex's position) from which seeds are drawn and
+##   assigned vertices are removed in constant time.
+##
+def growPartition(adjacency, vertexWeights, parts, rng):
+    numVertices = len(adjacency)
+    part = [-1] * numVertices
+    remaining = sum(vertexWeights)
+
+    unassigned = range(numVertices)
+    position = range(numVertices)
+
+    def assign(u, p):
+        part[u] = p
+        last = unassigned.pop()
+        if (last != u):
+            unassigned[position[u]] = last
+            position[last] = position[u]
+
+    for p in range(parts - 1):
+        target = remaining / float(parts - p)
+        weight = 0
+        connection = {}
+        frontier = []
+
+        # Leave at least one vertex for each of the remaining parts.
+        while ((len(unassigned) > parts - p - 1) and ((weight == 0) or (weight < target))):
+            # Drop entries for assigned vertices and outdated connections.
+            while ((len(frontier) > 0) and
+                   ((part[frontier[0][1]] != -1) or (-frontier[0][0] != connection[frontier[0][1]]))):
+                heapq.heappop(frontier)
+
+            if (len(frontier) == 0):
+                # Start (or, for disconnected graphs, restart) from a
+                # random unassigned vertex.
+                u = rng.choice(unassigned)
+            else:
+                u = heapq.heappop(frontier)[1]
+
+            assign(u, p)
+            weight += vertexWeights[u]
+
+            for (v, w) in adjacency[u].iteritems():
+                if (part[v] == -1):
+                    connection[v] = connection.get(v, 0) + w
+                    heapq.heappush(frontier, (-connection[v], v))
+
+        remaining -= weight
+
+    for u in unassigned:
+        part[u] = parts - 1
+
+    return part
+
+
+##
+## balancePartition --
+##   Move vertices out of parts heavier than maxPartWeight.  Each move
+##   takes the vertex of the heaviest part whose move to a part with
+##   room costs the least cut weight.
+##
+def balancePartition(adjacency, vertexWeights, part, parts, maxPartWeight):
+    partWeights = partitionWeights(vertexWeights, part, parts)
+    partSizes = [part.count(p) for p in range(parts)]
+
+    for attempt in range(len(part)):
+        heavy = max(range(parts), key=lambda p: (partWeights[p], -p))
+        if ((partWeights[heavy] <= maxPartWeight) or (partSizes[heavy] == 1)):
+            break
+
+        bestMove = None
+        bestCost = None
+        for u in range(len(part)):
+            if (part[u] != heavy):
+                continue
+            connection = {}
+            for (v, w) in adjacency[u].iteritems():
+                connection[part[v]] = connection.get(part[v], 0) + w
+            for q in range(parts):
+                if ((q == heavy) or (partWeights[q] + vertexWeights[u] > maxPartWeight)):
+                    continue
+                cost = connection.get(heavy, 0) - connection.get(q, 0)
+                if ((bestCost is None) or (cost < bestCost)):
+                    bestMove = (u, q)
+                    bestCost = cost
+
+        if (bestMove is None):
+            break
+
+        (u, q) = bestMove
+        part[u] = q
+        partWeights[heavy] -= vertexWeights[u]
+        partWeights[q] += vertexWeights[u]
+        partSizes[heavy] -= 1
+        partSizes[q] += 1
+
+    return part
+
+
+##
+## refinePartition --
+##   Greedy boundary refinement: move a vertex to the neighbouring part
+##   it is most strongly connected to whenever that lowers the cut
+##   weight and the destination part has room.  Parts are never emptied.
+##
+def refinePartition(adjacency, vertexWeights, part, parts, maxPartWeight, maxPasses=8):
+    partWeights = partitionWeights(vertexWeights, part, parts)
+    partSizes = [part.count(p) for p in range(parts)]
+
+    for sweep in range(maxPasses):
+        moved = False
+        for u in range(len(part)):
+            p = part[u]
+            if (partSizes[p] == 1):
+                continue
+            connection = {}
+            for (v, w) in adjacency[u].iteritems():
+                connection[part[v]] = connection.get(part[v], 0) + w
+            internal = connection.get(p, 0)
+
+            best = p
+            bestGain = 0
+            for q in sorted(connection.keys()):
+                gain = connection[q] - internal
+                if ((q != p) and (gain > bestGain) and
+                    (partWeights[q] + vertexWeights[u] <= maxPartWeight)):
+                    best = q
+                    bestGain = gain
+
+            if (best != p):
+                part[u] = best
+                partWeights[p] -= vertexWeights[u]
+                partWeights[best] += vertexWeights[u]
+                partSizes[p] -= 1
+                partSizes[best] += 1
+                moved = True
+
+        if (not moved):
+            break
+
+    return part
+
+
+def partitionScore(adjacency, vertexWeights, part, parts, maxPartWeight):
+    overweight = sum([max(0, w - maxPartWeight) for w in partitionWeights(vertexWeights, part, parts)])
+    return (overweight, partitionCutWeight(adjacency, part))
+
+
+##
+## multilevelPartition --
+##   Partition graph (a pygraph digraph of LI modules) into parts parts.
+##   weights are the LIGraph edge weights; nodeWeights maps modules to
+##   their compile cost (compileCost() by default).  No part may exceed
+##   the average part cost by more than imbalance percent, unless a
+##   single module is heavier than that.
+##
+##   Returns a map from module to part number.
+##
+def multilevelPartition(graph, weights=None, nodeWeights=None, parts=2, imbalance=10, trials=8, seed=0):
+    (nodes, adjacency) = undirectedGraph(graph, weights)
+    numNodes = len(nodes)
+
+    if (numNodes <= parts):
+        return dict([(nodes[u], u) for u in range(numNodes)])
+
+    if (nodeWeights is None):
+        vertexWeights = [compileCost(node) for node in nodes]
+    else:
+        vertexWeights = [nodeWeights[node] for node in nodes]
+
+    rng = random.Random(seed)
+    totalWeight = sum(vertexWeights)
+    maxPartWeight = max(max(vertexWeights), totalWeight * (100 + imbalance) / (100.0 * parts))
+    maxVertexWeight = max(max(vertexWeights), totalWeight / (4.0 * parts))
+
+    # Coarsening.  Stop once the graph is small or stops shrinking.
+    levels = [(adjacency, vertexWeights, None)]
+    while (len(levels[-1][0]) > 8 * parts):
+        (fineAdjacency, fineWeights, ignore) = levels[-1]
+        (coarseAdjacency, coarseWeights, coarseOf) = coarsenGraph(fineAdjacency, fineWeights, maxVertexWeight, rng)
+        if (len(coarseAdjacency) > 0.95 * len(fineAdjacency)):
+            break
+        levels.append((coarseAdjacency, coarseWeights, coarseOf))
+
+    # Initial partition of the coarsest graph.
+    (coarseAdjacency, coarseWeights, ignore) = levels[-1]
+    part = None
+    score = None
+    for trial in range(trials):
+        candidate = growPartition(coarseAdjacency, coarseWeights, parts, rng)
+        candidate = balancePartition(coarseAdjacency, coarseWeights, candidate, parts, maxPartWeight)
+        candidate = refinePartition(coarseAdjacency, coarseWeights, candidate, parts, maxPartWeight)
+        candidateScore = partitionScore(coarseAdjacency, coarseWeights, candidate, parts, maxPartWeight)
+        if ((score is None) or (candidateScore < score)):
+            part = candidate
+            score = candidateScore
+
+    # Uncoarsening and refinement.
+    for level in range(len(levels) - 1, 0, -1):
+        coarseOf = levels[level][2]
+        (fineAdjacency, fineWeights, ignore) = levels[level - 1]
+        part = [part[coarseOf[u]] for u in range(len(fineAdjacency))]
+        part = balancePartition(fineAdjacency, fineWeights, part, parts, maxPartWeight)
+        part = refinePartition(fineAdjacency, fineWeights, part, parts, maxPartWeight)
+
+    return dict([(nodes[u], part[u]) for u in range(numNodes)])
+
+
+##
+## partitionReport --
+##   Describe the quality of a partition: the cut weight and the compile
+##   cost of each part.
+##
+def partitionReport(graph, mapping, weights=None, nodeWeights=None):
+    (nodes, adjacency) = undirectedGraph(graph, weights)
+    if (len(nodes) == 0):
+        return "empty partition"
+
+    if (nodeWeights is None):
+        vertexWeights = [compileCost(node) for node in nodes]
+    else:
+        vertexWeights = [nodeWeights[node] for node in nodes]
+
+    part = [mapping[node] for node in nodes]
+    parts = max(part) + 1
+    partWeights = partitionWeights(vertexWeights, part, parts)
+    return "parts " + str(parts) + ", cut weight " + str(partitionCutWeight(adjacency, part)) + \
+           ", part costs " + str(partWeights)
@@ -0,0 +1,120 @@
+import copy_reg
+from itertools import repeat, izip
+from operator import attrgetter
+
+##
+## LIRecord --
+##   Base class of the LI connection records: LIChannel, LIChain and
+##   LIService.  LI graphs may hold tens of thousands of connections, so
+##   records keep their fields in slots instead of a per-instance
+##   dictionary.  Each record class lists its fields in __slots__, the
+##   string fields worth interning (names and types, which repeat across
+##   the graph) in internedFields and the initial values of the fields
+##   that are only assigned later, during matching and routing, in
+##   defaults.
+##
+##   A record's attributes dictionary is created on first use.
+##
+##   Records are saved, in pickles and in LI graph files, in a positional
+##   form (see fieldState): the class's field names, a tuple pickle
+##   stores once and then refers to, the matching tuple of values and
+##   the attributes dictionary.  The values are restored after the record
+##   is created, not passed to a constructor, since channels refer to
+##   each other in cycles.  pickle writes a string object once per
+##   pickle, so the names interned when the records were built load as
+##   shared objects without being interned again.
+##
+##   __setstate__ also accepts a dictionary from field name to value, the
+##   form older pickles hold.  Unknown fields are ignored when a record is
+##   restored, so that records saved by other versions of this class
+##   still load.
+##
+class LIRecord(object):
+
+    __slots__ = ('_attributes',)
+
+    internedFields = ()
+    defaults = {}
+
+    def getAttributes(self):
+        if (self._attributes is None):
+            self._attributes = {}
+        return self._attributes
+
+    def setAttributes(self, attributes):
+        self._attributes = attributes
+
+    attributes = property(getAttributes, setAttributes)
+
+    def internFields(self):
+        for field in self.internedFields:
+            value = getattr(self, field)
+            if (type(value) is str):
+                setattr(self, field, intern(value))
+
+    ##
+    ## copyAttributes --
+    ##   A copy of the attributes dictionary for a copied record, or None
+    ##   if the record has no attributes.
+    ##
+    def copyAttributes(self):
+        if (not self._attributes):
+            return None
+        return dict(self._attributes)
+
+    # Records are saved and restored in bulk, so the field loops below
+    # are left to map() and dict() where possible.
+
+    ##
+    ## fieldState --
+    ##   The positional form of the record: its field names, their values
+    ##   and its attributes dictionary.
+    ##
+    def fieldState(self):
+        (fields, getFields) = recordLayout(type(self))
+        return (fields, getFields(self), self._attributes)
+
+    def __reduce__(self):
+        return (copy_reg.__newobj__, (type(self),), self.fieldState())
+
+    def __setstate__(self, state):
+        if (type(state) is tuple):
+            (fields, values, attributes) = state
+            if (fields == recordLayout(type(self))[0]):
+                # Interned strings were written once and come back
+                # shared, so the values are not interned again here.
+                map(setattr, repeat(self, len(fields)), fields, values)
+                self._attributes = attributes
+                return
+            state = dict(izip(fields, values))
+            state['attributes'] = attributes
+
+        fields = dict(self.defaults)
+        fields.update(state)
+        self._attributes = fields.pop('attributes', None) or None
+        for field in self.internedFields:
+            value = fields.get(field)
+            if (type(value) is str):
+                fields[field] = intern(value)
+
+        try:
+            map(setattr, repeat(self, len(fields)), fields.keys(), fields.values())
+        except AttributeError:
+            # Fields this class no longer has.
+            for (field, value) in fields.iteritems():
+                if (field in self.__slots__):
+                    setattr(self, field, value)
+
+
+recordLayouts = {}
+
+##
+## recordLayout --
+##   The fields of a record class and a function returning their values
+##   as a tuple.
+##
+def recordLayout(cls):
+    if (not cls in recordLayouts):
+        fields = cls.__slots__
+        recordLayouts[cls] = (fields, attrgetter(*fields))
+    return recordLayouts[cls]
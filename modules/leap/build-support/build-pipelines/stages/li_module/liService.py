@@ -1,12 +1,36 @@
 import sys
 
 from liModule import LIModule
+from liRecord import LIRecord
 
 # TODO: Some of the data in this structure would be better captured as
 # an attribute dictionary.  This would also be more modular since
 # external access could be hidden behind an accessor function.
 
-class LIService():
+class LIService(LIRecord):
+
+    __slots__ = ('sc_type', 'req_raw_type', 'resp_raw_type', 'name',
+                 'module_idx', 'idx', 'optional', 'req_bitwidth',
+                 'resp_bitwidth', 'idx_bitwidth', 'matched', 'module_name',
+                 'root_module_name', 'client_idx', 'type_structure',
+                 'via_idx_ingress', 'via_link_ingress',
+                 'via_idx_egress', 'via_link_egress', 'activity',
+                 'module', 'partnerModule', 'partnerChannel', 'code')
+
+    internedFields = ('sc_type', 'req_raw_type', 'resp_raw_type', 'name',
+                      'module_name', 'root_module_name')
+
+    defaults = {'idx': "unassigned",
+                'matched': False,
+                'via_idx_ingress': "unassigned",
+                'via_link_ingress': "unassigned",
+                'via_idx_egress': "unassigned",
+                'via_link_egress': "unassigned",
+                'activity': -1,
+                'module': "unassigned",
+                'partnerModule': "unassigned",
+                'partnerChannel': "unassigned",
+                'code': ""}
   
     def __init__(self,
                  sc_type,
@@ -52,7 +76,8 @@ class LIService():
         self.partnerModule = "unassigned"
         self.partnerChannel = "unassigned"
         self.code = "" #Code() # This is used to store various definitions related to type compression
-        self.attributes = {}
+        self._attributes = None # created on first use
+        self.internFields()
 
     def __repr__(self):
         partnerModule = "unassigned"
@@ -86,7 +111,7 @@ class LIService():
                                self.client_idx,
                                self.type_structure)
         # Need to copy some other values as well...
-        newService.attributes = dict(self.attributes)
+        newService._attributes = self.copyAttributes()
         newService.activity = self.activity
         return newService
 
@@ -2,7 +2,6 @@ import os
 import sys
 import re
 import pygraph
-import cPickle as pickle
 
 import model
 from liChannel import LIChannel
@@ -10,6 +9,9 @@ from liChain import LIChain
 from liService import LIService
 from liGraph import LIGraph
 from liModule import LIModule
+from liCut import stoerWagnerCut, contractionCut
+from liLog import indexLogfile, logRecordConnection
+from liGraphFile import writeLIGraph, liGraphFilePath
 from model import Module, Source, get_build_path
 
 try:
@@ -23,58 +25,14 @@ import pygraph.algorithms.minmax
 def parseLogfiles(logfiles):
     connections = []
     for logfile in logfiles:
-        log = open(str(logfile), 'r')
-        
-        for line in log:
-            r1 = re.match("Compilation message: .*: Dangling (\w+) {.*",line)
-            if (r1): 
-                if (r1.group(1) == "Chain") or (r1.group(1) == "Send") or (r1.group(1) == "Recv"):
-                    match = re.search(r'.*Dangling (\w+) {(.*)} \[(\d+)\]:(\w+):(\w+):(\d+):(\w+):(\w+)', line)
-                    if (match):
-                        #python groups begin at index 1  
-                        if (match.group(1) == "Chain"):
-                            connections +=  [LIChain(match.group(1), 
-                                                     match.group(2),
-                                                     match.group(3),
-                                                     match.group(4),      
-                                                     eval(match.group(5)), # optional
-                                                     match.group(6),
-                                                     match.group(7),
-                                                     match.group(8),
-                                                     match.group(8),
-                                                     type)]
-                        else:
-                            connections +=  [LIChannel(match.group(1), 
-                                                       match.group(2),
-                                                       match.group(3),
-                                                       match.group(4),      
-                                                       eval(match.group(5)), # optional
-                                                       match.group(6),
-                                                       match.group(7),
-                                                       match.group(7),
-                                                       type)]
-                    else: 
-                        print "Malformed connection message: " + line
-                        sys.exit(-1)
-                else:
-                    match = re.search(r'.*Dangling (\w+) {(.*)} {(.*)} \[(\d+)\]:(\w+):(\d+):(\d+):(\d+):(\w+):(\d+)', line)
-                    if (match):
-                        connections +=  [LIService(match.group(1), 
-                                                   match.group(2),
-                                                   match.group(3),
-                                                   match.group(4),      
-                                                   match.group(5),
-                                                   False, 
-                                                   match.group(6),
-                                                   match.group(7),
-                                                   match.group(8),
-                                                   match.group(9), 
-                                                   match.group(9), 
-                                                   match.group(10),
-                                                   type)]
-                    else: 
-                        print "Malformed connection message: " + line
-                        sys.exit(-1)
+        # Dangling connection messages are extracted (and cached) by
+        # the log indexer.  See liLog.py.
+        for (kind, fields) in indexLogfile(logfile)['connections']:
+            if (kind == 'MALFORMED'):
+                print "Malformed connection message: " + fields
+                sys.exit(-1)
+
+            connections += [logRecordConnection(kind, fields)]
             
     return connections
 
@@ -84,19 +42,20 @@ def parseLogfiles(logfiles):
 ##   cause chains to be connected with minimized paths.  The area constraints
 ##   code pre-sorts all modules.
 ##
-def placement_cut(graph, areaConstraints):
+def placement_cut(graph, areaConstraints, parts=2):
     # Sort the nodes according to the pre-sorted order already set by the
-    # area group code.
+    # area group code.  Ties are broken by name so that the cut does not
+    # depend on graph iteration order.
     nodes = sorted(graph.nodes(),
-                   key=lambda module: areaConstraints.constraints[module.name].sortIdx)
+                   key=lambda module: (areaConstraints.constraints[module.name].sortIdx, module.name))
 
-    # Map the first half of the sorted list to tree "0" and the second half
-    # to tree "1".
+    # Split the sorted list into parts contiguous runs of (nearly) equal
+    # length.  For two parts, the first half maps to tree "0" and the
+    # second half to tree "1".
     map = {}
-    cut_point = (1 + len(graph.nodes())) / 2
     for i in range(len(nodes)):
         n = nodes[i]
-        map[n] = int(i >= cut_point)
+        map[n] = (i * parts) / len(nodes)
 
     return map
 
@@ -106,10 +65,46 @@ def placement_cut(graph, areaConstraints):
 ##   When area groups aren't computed, sort the tree such that inter-module
 ##   connections determine grouping.
 ##
-##   The code is a basic S-T min-cut algorithm.  Eventually we should swap
-##   this for Karger's algorithm.
+##   Several engines are available (see liCut.py):
+##
+##     STOER_WAGNER -- exact global minimum cut.
+##     CONTRACTION  -- randomized contraction (Karger), faster on large
+##                     graphs but approximate.
+##     MAX_FLOW     -- the original S-T max flow over all node pairs.
+##                     Ignores weights and balance.  Slow.
+##     AUTO         -- STOER_WAGNER for graphs of up to EXACT_CUT_LIMIT
+##                     modules, CONTRACTION for larger ones.  Stoer-Wagner
+##                     is cubic in the number of modules.
+##
+##   weights are the LIGraph edge weights.  balance is the minimum
+##   percentage of modules to be left on each side of the cut.
 ##
-def min_cut(graph):
+EXACT_CUT_LIMIT = 150
+
+def min_cut(graph, weights=None, algorithm='MAX_FLOW', balance=0, trials=32):
+    if (algorithm == 'AUTO'):
+        if (len(graph.nodes()) <= EXACT_CUT_LIMIT):
+            algorithm = 'STOER_WAGNER'
+        else:
+            algorithm = 'CONTRACTION'
+
+    if (algorithm == 'STOER_WAGNER'):
+        return stoerWagnerCut(graph, weights, balance)
+    elif (algorithm == 'CONTRACTION'):
+        return contractionCut(graph, weights, balance, trials)
+    elif (algorithm == 'MAX_FLOW'):
+        return max_flow_cut(graph)
+
+    print "Unknown min cut algorithm: " + str(algorithm)
+    sys.exit(-1)
+
+
+##
+## max_flow_cut --
+##   The code is a basic S-T min-cut algorithm, run for every pair of
+##   nodes.
+##
+def max_flow_cut(graph):
     minimum_cut = float("inf")
     minimum_mapping = None
     # for all pairs s-t 
@@ -243,6 +238,10 @@ def dump_lim_graph(moduleList):
         # For the LIM compiler, we must also annotate those
         # channels which are coming out of the platform code.
 
+        # Object code is resolved against the files present now, not
+        # those seen when the SConscripts were read.
+        Source.buildPathCache.reset()
+
         for module in moduleList.synthBoundaries():
             modulePath = module.buildPath
 
@@ -291,17 +290,17 @@ def dump_lim_graph(moduleList):
             module.putAttribute("EXECUTION_TYPE","RTL")
 
         # dump graph representation.
-        pickleHandle = open(str(target[0]), 'wb')
-        pickle.dump(fullLIGraph, pickleHandle, protocol=-1)
-        pickleHandle.close()
+        writeLIGraph(fullLIGraph, str(target[0]))
 
         if (pipeline_debug != 0):
             print "Initial Graph is: " + str(fullLIGraph) + ": " + sys.version +"\n"
+            print Source.buildPathCache.report()
 
     # Setup the graph dump Although the graph is built
     # from only LI modules, the top wrapper contains
-    # sizing information. Also needs stubs.
-    dumpGraph = moduleList.env.Command(li_graph,
+    # sizing information. Also needs stubs.  writeLIGraph()
+    # also writes the graph's LI graph file.
+    dumpGraph = moduleList.env.Command([li_graph, liGraphFilePath(li_graph)],
                                        lim_logs + lim_stubs,
                                        dump_lim_graph)
 
@@ -3,6 +3,7 @@ import sys
 import re
 import SCons.Script
 from model import  *
+import li_module
 
 
 #this might be better implemented as a 'Node' in scons, but 
@@ -24,10 +25,9 @@ class MCD():
     # handle the rest of the tree
     for logfile in self.logfiles:
         print('Trying to open '+logfile+'\n')
-        compileLog = open(logfile,'r')
-        # look for the domain crossing string 
-        searchResult = re.search(r'CrossDomain',compileLog.read())
-        if(searchResult):  
+        # look for the domain crossing string.  The log index is shared
+        # with the LI graph parsers, so each log is only scanned once.
+        if(li_module.logHasCrossDomain(logfile)):  
           print ('Found domain crossing')
           foundDomainCrossing = 1
     
@@ -69,7 +69,7 @@ class MCD():
     # need ifc as well
     self.bluespecBuilddirs += './iface/build/hw/.bsc/'
 
-    self.modelClockFreq = int(moduleList.getAWBParam('clocks_device', 'MODEL_CLOCK_FREQ'))
+    self.modelClockFreq = moduleList.getAWBParamInt('clocks_device', 'MODEL_CLOCK_FREQ')
 
         
     # although we examine the log files, we depend on the 
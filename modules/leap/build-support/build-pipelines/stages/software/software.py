@@ -2,14 +2,13 @@ import os
 import sys
 import re
 import SCons.Script
-import cPickle as pickle
 
 from model import  *
 from li_module import *
 
 def host_defs():
-    hostos = one_line_cmd('uname -s')
-    hostmachine = one_line_cmd('uname -m')
+    hostos = toolProbe('uname -s').split('\n', 1)[0]
+    hostmachine = toolProbe('uname -m').split('\n', 1)[0]
 
     if (hostos == 'FreeBSD'):
         hflags = '-DHOST_FREEBSD'
@@ -63,8 +62,10 @@ class Software():
                 ## m5 needs Python library.  The installed version of Python isn't
                 ## necessarily the version used by SCons, so we must invoke Python
                 ## to figure out the proper version.
-                m5_python_ver = os.popen('echo "import sys\nsys.stdout.write(sys.version[:3])" | python').read()
-                m5_python_exec_prefix = os.popen('echo "import sys\nsys.stdout.write(sys.exec_prefix)" | python').read()
+                m5_python_ver = toolProbe('echo "import sys\nsys.stdout.write(sys.version[:3])" | python',
+                                          tool='python', envVars=['PYTHONHOME'])
+                m5_python_exec_prefix = toolProbe('echo "import sys\nsys.stdout.write(sys.exec_prefix)" | python',
+                                                  tool='python', envVars=['PYTHONHOME'])
                 inc_paths += [ os.path.join(m5_python_exec_prefix, 'include', 'python' + m5_python_ver) ]
 
                 cc_flags += ' -DTRACING_ON=1'
@@ -269,14 +270,12 @@ class Software():
                     module.putObjectCode('GIVEN_LOGS', logs)
 
                 # dump graph representation. 
-                pickleHandle = open(str(target[0]), 'wb')
-                pickle.dump(fullLIGraph, pickleHandle, protocol=-1)
-                pickleHandle.close()
+                writeLIGraph(fullLIGraph, str(target[0]))
 
                 if (self.pipeline_debug != 0):
                     print "CPP Initial Graph is: " + str(fullLIGraph) + ": " + sys.version +"\n"
 
             # Setup the graph dump
-            dumpGraph = self.env.Command(li_graph, all_logs, dump_lim_graph)
+            dumpGraph = self.env.Command([li_graph, liGraphFilePath(li_graph)], all_logs, dump_lim_graph)
 
             moduleList.topDependency += [dumpGraph]
@@ -74,7 +74,7 @@ def generateXST(moduleList, module, xstTemplate):
                 XSTFile.write(moduleList.env['DEFS'][token.name])
             # 3. Search the AWB parameters or DIE.
             else:  
-                XSTFile.write(moduleList.getAWBParam(moduleList.moduleList,token.name))
+                XSTFile.write(moduleList.getAWBParamString(moduleList.moduleList,token.name))
         else:
             #we got a string
             XSTFile.write(token)
@@ -626,9 +626,9 @@ def buildXSTTopLevel(moduleList, firstPassGraph):
 #   buildNetlists then invokes these functions as part of a parallel build process.
 #
 def buildNetlists(moduleList, userModuleBuilder, platformModuleBuilder):
-    # We load this graph in to memory several times. 
-    # TODO: load this graph once. 
-    firstPassLIGraph = wrapper_gen_tool.getFirstPassLIGraph()
+    # Only a few attributes of each module are needed here, so the
+    # graph is opened rather than loaded.
+    firstPassLIGraph = wrapper_gen_tool.openFirstPassLIGraph()
 
     DEBUG = model.getBuildPipelineDebug(moduleList) 
 
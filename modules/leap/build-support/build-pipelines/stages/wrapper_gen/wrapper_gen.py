@@ -1,11 +1,10 @@
 import os
-import cPickle as pickle
 import traceback
 
 import model
 from model import Module, get_build_path
 import config
-from li_module import LIGraph, LIModule
+from li_module import LIGraph, LIModule, loadLIGraph, openLIGraph
 
 import wrapper_gen_tool
 import bsv_tool
@@ -280,15 +279,42 @@ def getFirstPassLIGraph():
 
     if (os.path.isfile(firstPassLIGraph)):
         # We got a valid LI graph from the first pass.
-        pickle_handle = open(firstPassLIGraph, 'rb')
-        first_pass_graph = pickle.load(pickle_handle)
-        pickle_handle.close()
+        first_pass_graph = loadLIGraph(firstPassLIGraph)
         _cacheFirstPassLIGraph = first_pass_graph
         
         return first_pass_graph
 
     return None
 
+##
+## openFirstPassLIGraph() --
+##   Like getFirstPassLIGraph(), but for callers that only look up a few
+##   modules.  Modules of an LI graph file are loaded on demand.  Only
+##   the modules map of the result may be used.
+##
+_cacheOpenFirstPassLIGraph = None
+
+def openFirstPassLIGraph():
+    global _cacheFirstPassLIGraph
+    global _cacheOpenFirstPassLIGraph
+    if (_cacheFirstPassLIGraph != None):
+        return _cacheFirstPassLIGraph
+    if (_cacheOpenFirstPassLIGraph != None):
+        return _cacheOpenFirstPassLIGraph
+
+    firstPassLIGraph = "lim.li"
+
+    if (os.path.isfile(firstPassLIGraph)):
+        first_pass_graph = openLIGraph(firstPassLIGraph)
+        # Pickled graphs are loaded whole.  Share them.
+        if (isinstance(first_pass_graph, LIGraph)):
+            _cacheFirstPassLIGraph = first_pass_graph
+        else:
+            _cacheOpenFirstPassLIGraph = first_pass_graph
+        return first_pass_graph
+
+    return None
+
 ##
 ## validateFirstPassLIGraph() -- Checks a moduleList against the first
 ##   pass graph.  This is a helpful assertion/invariant in the backend.
@@ -662,7 +688,7 @@ class WrapperGen():
     TMP_BSC_DIR = moduleList.env['DEFS']['TMP_BSC_DIR']
     topModulePath = get_build_path(moduleList, moduleList.topModule)
     # The LIM compiler uniquifies synthesis boundary names  
-    uidOffset = int(moduleList.getAWBParam('wrapper_gen_tool', 'MODULE_UID_OFFSET'))
+    uidOffset = moduleList.getAWBParamInt('wrapper_gen_tool', 'MODULE_UID_OFFSET')
 
     # We only inject the platform wrapper in first pass builds.  In
     # the second pass, we import the first pass object code.  It may
@@ -700,8 +726,6 @@ class WrapperGen():
     first_pass_LI_graph = getFirstPassLIGraph()
     if(first_pass_LI_graph is None):
         moduleList.insertModule(platform_module)
-        moduleList.graphize()
-        moduleList.graphizeSynth()
 
         # Sprinkle more files expected by the two-pass build.  
         generateWrapperStub(moduleList, platform_module)
@@ -742,7 +766,7 @@ class WrapperGen():
     ## AWB configuration file, since Bluespec can't test the value of
     ## a preprocessor variable.
     try:
-      n_top_clocks = int(moduleList.getAWBParam('physical_platform', 'N_TOP_LEVEL_CLOCKS'))
+      n_top_clocks = moduleList.getAWBParamInt('physical_platform', 'N_TOP_LEVEL_CLOCKS')
       if (n_top_clocks == 0):
         sys.stderr.write("Error: N_TOP_LEVEL_CLOCKS may not be 0 due to Bluespec preprocessor\n")
         sys.stderr.write("       limitations.  To eliminate top-level clocks, remove the AWB\n")
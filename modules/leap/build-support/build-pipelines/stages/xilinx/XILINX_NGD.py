@@ -26,7 +26,7 @@ class NGD():
 
         # user ucf may be overridden by our area group ucf.  Put our
         # generated ucf first.
-        moduleList.topModule.moduleDependency['UCF'].insert(0,area_group_file)
+        moduleList.topModule.moduleDependency['UCF'] = [area_group_file] + moduleList.topModule.moduleDependency['UCF']
         def area_group_ucf_closure(moduleList):
 
              def area_group_ucf(target, source, env):
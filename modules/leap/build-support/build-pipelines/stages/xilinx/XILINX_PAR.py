@@ -9,13 +9,12 @@ def getXilinxVersion():
     # What is the Xilinx Tool version?
     xilinx_version = 0
     
-    xilinx_ostream = os.popen('par -help')
+    xilinx_output = toolProbe('par -help', envVars=['XILINX'])
     ver_regexp = re.compile('^Release ([0-9]+).([0-9]+)')
-    for ln in xilinx_ostream.readlines():
+    for ln in xilinx_output.splitlines(True):
         m = ver_regexp.match(ln)
         if (m):
             xilinx_version = 10*int(m.group(1)) + int(m.group(2))
-    xilinx_ostream.close()
 
     if xilinx_version == 0:
         print "Failed to get Xilinx par version, is it in your path?"
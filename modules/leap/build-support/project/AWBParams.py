@@ -3,37 +3,202 @@
 # This file is intended as a common interface to AWB parameters
 # types, so that they can be emitted in various formats.
 
+import os
+import sys
+import imp
+import hashlib
+import cPickle as pickle
+
+import Utils
+
+##
+## AWB parameter snapshot.
+##
+## leap-configure writes each module's parameters to the config.py of
+## the module's python package.  Loading them by importing the packages
+## runs every package's __init__, which imports all of the module's SCons
+## libraries, on every SCons invocation.
+##
+## Instead, the parameters of all modules are kept in one snapshot file
+## in the build directory.  A module's entry records the path and md5
+## digest of its config.py and its parameters.  An entry is reused as
+## long as the digest of the config.py found for the module matches.
+## Otherwise config.py is evaluated on its own, without importing the
+## package, and the snapshot is saved again.
+##
+## Parameters are kept pickled per module in the snapshot and are only
+## unpickled when they are first asked for.
+##
+
+AWB_PARAMS_SNAPSHOT = '.awb_params_snapshot'
+
+AWB_PARAMS_SNAPSHOT_VERSION = 1
+
+noParams = pickle.dumps({}, -1)
+
+
+##
+## ModuleParams --
+##   The AWB parameters of one module.  names lists the parameters.
+##   load() returns the dictionary of parameter values, unpickling it on
+##   the first call.  The dictionary returned is the module's:  changes
+##   to it (command-line overrides) are seen by later calls.
+##
+class ModuleParams:
+
+    def __init__(self, names, pickledParams):
+        self.names = names
+        self.pickledParams = pickledParams
+        self.params = None
+
+    def load(self):
+        if (self.params is None):
+            self.params = pickle.loads(self.pickledParams)
+        return self.params
+
+
+##
+## AWBParamSnapshot --
+##   The snapshot of all modules' parameters (see above).
+##
+class AWBParamSnapshot:
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.entries = {}
+        self.changed = False
+
+        try:
+            handle = open(fileName, 'rb')
+            snapshot = pickle.load(handle)
+            handle.close()
+            if ((snapshot['version'] == AWB_PARAMS_SNAPSHOT_VERSION) and
+                (snapshot['path'] == sys.path)):
+                self.entries = snapshot['modules']
+        except Exception:
+            # No snapshot yet, or an unreadable one.  Start over.
+            self.entries = {}
+
+    ##
+    ## moduleParams --
+    ##   The ModuleParams of a module.  Modules without a config.py have
+    ##   no parameters.
+    ##
+    def moduleParams(self, moduleName):
+        try:
+            (handle, packagePath, description) = imp.find_module(moduleName)
+        except ImportError:
+            return ModuleParams((), noParams)
+        if (handle is not None):
+            handle.close()
+        if (description[2] != imp.PKG_DIRECTORY):
+            return ModuleParams((), noParams)
+
+        try:
+            configPath = os.path.join(packagePath, 'config.py')
+            handle = open(configPath, 'rb')
+            config = handle.read()
+            handle.close()
+        except IOError:
+            return ModuleParams((), noParams)
+
+        digest = hashlib.md5(config).hexdigest()
+        entry = self.entries.get(moduleName)
+        if ((entry is None) or (entry[0] != configPath) or (entry[1] != digest)):
+            configGlobals = {}
+            exec compile(config, configPath, 'exec') in configGlobals
+            params = configGlobals['awbParams']
+            entry = (configPath, digest, tuple(params.keys()), pickle.dumps(params, -1))
+            self.entries[moduleName] = entry
+            self.changed = True
+
+        return ModuleParams(entry[2], entry[3])
+
+    def save(self):
+        if (not self.changed):
+            return
+
+        # The snapshot is only a cache.  Failing to save it is harmless.
+        try:
+            handle = open(self.fileName + '.tmp', 'wb')
+            pickle.dump({'version': AWB_PARAMS_SNAPSHOT_VERSION,
+                         'path': list(sys.path),
+                         'modules': self.entries},
+                        handle, protocol=-1)
+            handle.close()
+            os.rename(self.fileName + '.tmp', self.fileName)
+            self.changed = False
+        except (IOError, OSError):
+            pass
+
+    def clean(self):
+        try:
+            os.unlink(self.fileName)
+        except OSError:
+            pass
+
+
 class AWBParams:
 
     def __init__(self, moduleList):
         self.moduleList = moduleList
         self.awbParams = {}
+        # Parameter name -> set of names of the modules defining it.
+        self.paramIndex = {}
+        # Module name -> position in parse order.
+        self.parseOrder = {}
+        # Converted values of the typed accessors.
+        self.typedParams = {}
+        self.snapshot = AWBParamSnapshot(AWB_PARAMS_SNAPSHOT)
 
   
     def parseModuleAWBParams(self, module):
-        self.awbParams[module.name] = module.parseAWBParams()
+        if (module.name in self.awbParams):
+            for param in self.awbParams[module.name].names:
+                self.paramIndex[param].discard(module.name)
+
+        self.awbParams[module.name] = self.snapshot.moduleParams(module.name)
+        module.parseAWBParams(self.awbParams[module.name])
+
+        for param in self.awbParams[module.name].names:
+            self.paramIndex.setdefault(param, set()).add(module.name)
+        self.parseOrder[module.name] = len(self.parseOrder)
+        self.typedParams = {}
+
+    ##
+    ## saveSnapshot --
+    ##   Called once all modules' parameters have been parsed.
+    ##
+    def saveSnapshot(self):
+        if self.moduleList.env.GetOption('clean'):
+            self.snapshot.clean()
+        else:
+            self.snapshot.save()
 
     ##
     ## getAWBParam -- 
     ##
     ##   Looks for an AWB parameter, and returns either the parameter
     ##   or throws an error if the parameter is not found.  This
-    ##   function takes either a scalar or iterable argument.
+    ##   function takes either a scalar or iterable argument.  Modules
+    ##   may be given by name or as Module objects.
     ##    
     def getAWBParam(self, moduleName, param):
+        # Only the modules defining the parameter need be looked at.
+        definedIn = self.paramIndex.get(param, ())
+
         if (hasattr(moduleName, '__iter__') and not isinstance(moduleName, basestring)):
             ## moduleName is a list.  Look in each module, returning the first match.
-            for m in moduleName:
-                try:
-                    return self.awbParams[m][param]
-                except:
-                    pass
+            if (len(definedIn) != 0):
+                for m in moduleName:
+                    m = moduleKey(m)
+                    if (m in definedIn):
+                        return self.awbParams[m].load()[param]
         else:  
             ## moduleName is just a string
-            try:
-                return self.awbParams[moduleName][param]
-            except:
-                pass
+            m = moduleKey(moduleName)
+            if (m in definedIn):
+                return self.awbParams[m].load()[param]
 
         raise Exception(param + " not in modules: " + str(moduleName))
 
@@ -48,6 +213,50 @@ class AWBParams:
             return self.getAWBParam(moduleName, param)
         except:
             return None
+
+
+    ##
+    ## findAWBParam --
+    ##   Looks for an AWB parameter in any module, returning its value in
+    ##   the first module parsed that defines it.  Throws an error if no
+    ##   module defines the parameter.
+    ##
+    def findAWBParam(self, param):
+        definedIn = self.paramIndex.get(param, ())
+        if (len(definedIn) == 0):
+            raise Exception(param + " not in any module")
+        first = min(definedIn, key=self.parseOrder.get)
+        return self.awbParams[first].load()[param]
+
+
+    ##
+    ## Typed accessors --
+    ##   getAWBParam, converting the value to an int, bool, string or
+    ##   (space separated) list.  Each value is converted once.  Errors
+    ##   are those of getAWBParam or of the conversion.
+    ##
+    def getAWBParamInt(self, moduleName, param):
+        return self.getTypedAWBParam(moduleName, param, int)
+
+    def getAWBParamBool(self, moduleName, param):
+        return self.getTypedAWBParam(moduleName, param, paramBool)
+
+    def getAWBParamString(self, moduleName, param):
+        return self.getTypedAWBParam(moduleName, param, str)
+
+    def getAWBParamList(self, moduleName, param):
+        return list(self.getTypedAWBParam(moduleName, param, paramList))
+
+    def getTypedAWBParam(self, moduleName, param, convert):
+        if (hasattr(moduleName, '__iter__') and not isinstance(moduleName, basestring)):
+            modules = tuple([moduleKey(m) for m in moduleName])
+        else:
+            modules = moduleKey(moduleName)
+
+        key = (modules, param, convert)
+        if (not key in self.typedParams):
+            self.typedParams[key] = convert(self.getAWBParam(modules, param))
+        return self.typedParams[key]
     
 
     ##
@@ -62,8 +271,9 @@ class AWBParams:
         for namespace in self.awbParams:
             namespaceString = '{ "' + namespace + '" '  
             paramStrings = []
-            for param in self.awbParams[namespace]:
-                paramStrings.append('{"' + param + '" "' + str(self.awbParams[namespace][param]) +'"}')
+            params = self.awbParams[namespace].load()
+            for param in params:
+                paramStrings.append('{"' + param + '" "' + str(params[param]) +'"}')
                 
 
             namespaceString += ' { ' + ' '.join(paramStrings) + '} }'
@@ -101,4 +311,79 @@ class AWBParams:
         fileHandle.write('    return [getAWBParamsHelper $awbParams $argsList]\n')
         fileHandle.write('}\n')
 
+
+
+    ##
+    ## emitParametersTCLDict -- 
+    ##   Builds the same Tcl representation of the AWB params and the same
+    ##   getAWBParams accessor as emitParametersTCL, but stores the params
+    ##   as nested Tcl dicts.  Lookups are hashed instead of searching the
+    ##   lists.  Needs Tcl 8.5.  The file is only written if its contents
+    ##   change.
+    ##    
+    def emitParametersTCLDict(self, fileName):
+        namespaces = []
+        for namespace in sorted(self.awbParams):
+            params = self.awbParams[namespace].load()
+            paramStrings = [tclListElement(param) + ' ' + tclListElement(str(params[param])) for param in sorted(params)]
+            namespaces.append('    ' + tclListElement(namespace) + ' {' + ' '.join(paramStrings) + '}\n')
+
+        tcl = ' set awbParams {\n' + ''.join(namespaces) + '}\n\n'
+
+        tcl += 'proc getAWBParams { argsList } {\n'
+        tcl += '    global awbParams\n'
+        tcl += '    if { [llength $argsList] == 0 } {\n'
+        tcl += '        set argsList [list ""]\n'
+        tcl += '    }\n'
+        tcl += '    set searchResult $awbParams\n'
+        tcl += '    foreach searchName $argsList {\n'
+        tcl += '        if { [catch {dict exists $searchResult $searchName} found] || !$found } {\n'
+        tcl += '            set searchResult ""\n'
+        tcl += '        } else {\n'
+        tcl += '            set searchResult [dict get $searchResult $searchName]\n'
+        tcl += '        }\n'
+        tcl += '        puts "$searchName -> $searchResult"\n'
+        tcl += '    }\n'
+        tcl += '    return $searchResult\n'
+        tcl += '}\n'
+
+        Utils.write_if_changed(fileName, tcl)
+
       
+
+
+##
+## tclListElement --
+##   A string as an element of a Tcl list.  Characters special to the
+##   list parser are escaped with backslashes, which also keeps the
+##   braces of the enclosing list balanced.
+##
+tclSpecialChars = {'\\': '\\\\', '{': '\\{', '}': '\\}', '[': '\\[', ']': '\\]', '$': '\\$',
+                   '"': '\\"', ';': '\\;', ' ': '\\ ', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+
+def tclListElement(value):
+    if (value == ''):
+        return '{}'
+    return ''.join([tclSpecialChars.get(c, c) for c in value])
+
+##
+## moduleKey --
+##   The name of a module given by name or as a Module object.
+##
+def moduleKey(module):
+    if (isinstance(module, basestring)):
+        return module
+    return getattr(module, 'name', module)
+
+##
+## paramBool --
+##   Boolean parameters are usually 0 or 1, but may be given as strings on
+##   the command line.
+##
+def paramBool(value):
+    if (isinstance(value, basestring)):
+        return (not value.strip().strip('"').lower() in ['', '0', 'false', 'no', 'off'])
+    return bool(value)
+
+def paramList(value):
+    return tuple(str(value).split())
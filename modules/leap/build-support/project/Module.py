@@ -5,8 +5,20 @@ import CommandLine
 import Source
 import Utils
 
+##
+## Module --
+##   A module of the design.  Module lists may hold thousands of modules,
+##   so modules keep their fields in slots and intern their names and
+##   paths.  Annotations belong in the attributes dictionary.
+##
 class Module(ProjectDependency.ProjectDependency):
 
+  __slots__ = ('name', 'buildPath', 'parent', 'childArray', 'liIgnore',
+               'platformModule', 'dependsFile', 'interfaceType', 'extraImports',
+               'boundaryName', 'attributes', 'isSynthBoundary',
+               'synthBoundaryModule', 'synthBoundaryUID', 'synthParent',
+               'synthChildArray', 'moduleDependency')
+
   # Global counter for generating synthesis boundary UIDs
   lastSynthId = 0
 
@@ -17,9 +29,9 @@ class Module(ProjectDependency.ProjectDependency):
  
   
   def __init__(self, name, synthBoundary, buildPath, parent, childArray, synthParent, synthChildArray, sources, platformModule=False, boundaryName=None):
-    self.name = name
-    self.buildPath = buildPath
-    self.parent = parent
+    self.name = Source.internPath(name)
+    self.buildPath = Source.internPath(buildPath)
+    self.parent = Source.internPath(parent)
     self.childArray = childArray
     self.liIgnore = False
     self.platformModule = platformModule
@@ -31,7 +43,7 @@ class Module(ProjectDependency.ProjectDependency):
     if(boundaryName is None):
         self.boundaryName = self.name   
     else:
-        self.boundaryName = boundaryName  
+        self.boundaryName = Source.internPath(boundaryName)
 
     self.attributes = {}
 
@@ -52,7 +64,7 @@ class Module(ProjectDependency.ProjectDependency):
     else:
       self.synthBoundaryModule = ""
 
-    self.synthParent = synthParent
+    self.synthParent = Source.internPath(synthParent)
     self.synthChildArray = synthChildArray
     ProjectDependency.ProjectDependency.__init__(self)
     # grab the deps from source lists. 
@@ -62,11 +74,15 @@ class Module(ProjectDependency.ProjectDependency):
     self.moduleDependency = sources 
 
 
-    # Annotate source objects with path information
+    # Annotate source objects with path information.  Intern the paths
+    # given as strings, which repeat across modules.
     for sourceType in self.moduleDependency:
-        for source in self.moduleDependency[sourceType]:
+        sourceList = self.moduleDependency[sourceType]
+        for (i, source) in enumerate(sourceList):
             if (isinstance(source, Source.Source)):
-                source.attributes['buildPath'] = buildPath
+                source.attributes['buildPath'] = self.buildPath
+            elif ((type(source) is str) and isinstance(sourceList, list)):
+                sourceList[i] = intern(source)
           
     # Make empty EMPTY_params_override Bluespec and C files.  When a module
     # has no overrides, its override file will link to this file.  We could
@@ -85,15 +101,15 @@ class Module(ProjectDependency.ProjectDependency):
   def getDependencies(self, key):
     # we must check to see if the dependencies actually exist.                                                                                                                                                                              
     # generally we have to make sure to remove duplicates                                                                                                                                                                                   
-    allDeps = []
+    allDeps = ProjectDependency.DependencyList()
     if(self.moduleDependency.has_key(key)):
       for dep in self.moduleDependency[key]:
-        if(allDeps.count(dep) == 0):
+        if(not allDeps.contains(dep)):
           allDeps.extend(dep if isinstance(dep, list) else [dep])
 
     # Return a list of unique entries, in the process converting SCons                                                                                                                                                                      
     # dependence entries to strings.                                                                  
-    return list(set([dep for dep in ProjectDependency.convertDependencies(allDeps)]))
+    return list(set([dep for dep in ProjectDependency.convertDependencies(allDeps.deps)]))
 
   # it would be nice to fix this so that we don't need Wrapper name.
   def wrapperName(self):
@@ -127,47 +143,39 @@ class Module(ProjectDependency.ProjectDependency):
   ##
   ## parseAWBParams --
   ##   AWB parameters are stored in leap-configure in each module's config.py.
-  ##   Load them here as a dictionary, allow for replacement of parameter
-  ##   values on the build command line.
+  ##   AWBParams loads them (see AWBParams.ModuleParams).  Allow for
+  ##   replacement of parameter values on the build command line.  The
+  ##   values are only loaded here if the command line names a parameter.
   ##
-  def parseAWBParams(self):
+  def parseAWBParams(self, moduleParams):
     found_override = False;
     hw_path = 'hw/include/awb/provides/' + self.name + '_params_override.bsh'
     sw_path = 'sw/include/awb/provides/' + self.name + '_params_override.h'
 
-    try:
-      p = __import__(self.name + '.config')
-
-      # Replace with command line arguments
-      for k, v in p.config.awbParams.iteritems():
-        if k in arguments and v != arguments[k]:
+    # Replace with command line arguments
+    overrides = []
+    for k in moduleParams.names:
+      if k in arguments:
+        params = moduleParams.load()
+        v = params[k]
+        if v != arguments[k]:
           # Force the type of the override to match the type of the original
           if type(v) is str:
             new_val = str(arguments[k])
           else:
             new_val = int(arguments[k])
 
-          # Generate the header files if this is the first override
-          # for the module.
-          if not found_override:
-            found_override = self.initOverrideFiles(hw_path, sw_path)
-
           # Replace the old value with the new one
-          p.config.awbParams[k] = new_val
-          self.overrideAWBParam(k, new_val, type(v) is str)
-
-      params = p.config.awbParams
+          params[k] = new_val
+          overrides.append((k, new_val, type(v) is str))
 
-    except ImportError:
-      # Should check whether module exists or whether it is some other error
-      params = {}
+    if overrides:
+      found_override = self.writeOverrideFiles(hw_path, sw_path, overrides)
 
     if not found_override and emitOverrideFiles:
       self.linkToEmptyOverrideFile('EMPTY_params_override.bsh', hw_path)
       self.linkToEmptyOverrideFile('EMPTY_params_override.h', sw_path)
 
-    return params
-
   def cleanAWBParams(self):    
     hw_path = 'hw/include/awb/provides/' + self.name + '_params_override.bsh'
     sw_path = 'sw/include/awb/provides/' + self.name + '_params_override.h'
@@ -200,10 +208,13 @@ class Module(ProjectDependency.ProjectDependency):
 
 
   ##
-  ## initOverrideFiles --
-  ##   Initialize override include files for a single module.
+  ## writeOverrideFiles --
+  ##   AWB parameter values were overridden on the SCons command line.  Write
+  ##   the new values to the override include files of a single module.
+  ##   Files already holding the same overrides are left alone, so that
+  ##   their timestamps only change along with the overrides.
   ##
-  def initOverrideFiles(self, hw_path, sw_path):
+  def writeOverrideFiles(self, hw_path, sw_path, overrides):
     if not emitOverrideFiles:
       return False
 
@@ -213,65 +224,35 @@ class Module(ProjectDependency.ProjectDependency):
     if self.name == 'build_pipeline':
       return False
 
-    # Generate parameter override header files
-    try:
-      os.unlink(hw_path)
-    except:
-      None
-    param_bsh = open(hw_path, 'w')
-    param_bsh.write('//\n')
-    param_bsh.write('// AWB parameter overrides generated by Module.py Python build rules\n')
-    param_bsh.write('//\n\n')
-    param_bsh.close()
-
-    try:
-      os.unlink(sw_path)
-    except:
-      None
-    param_h = open(sw_path, 'w')
-    param_h.write('//\n')
-    param_h.write('// AWB parameter overrides generated by Module.py Python build rules\n')
-    param_h.write('//\n\n')
-    param_h.close()
+    header = '//\n'
+    header += '// AWB parameter overrides generated by Module.py Python build rules\n'
+    header += '//\n\n'
+    param_bsh = header
+    param_h = header
 
-    return True
+    for (param, value, is_str) in overrides:
+      # Make sure string is quoted
+      value = str(value)
+      if is_str:
+        if (value[0] != '"' or value[-1] != '"'):
+          value = '"' + value + '"'
 
+      print 'Overriding AWB parameter ' + self.name + '.' + param + ': ' + value
 
-  ##
-  ## overrideAWBParam --
-  ##   AWB parameter value was overridden on the SCons command line.  Add the
-  ##   new value to the override include files.
-  ##
-  def overrideAWBParam(self, param, value, is_str):
-    if not emitOverrideFiles:
-      return
+      param_bsh += '`undef ' + param + '\n'
+      param_bsh += '`undef ' + param + '_Z\n'
+      param_bsh += '`define ' + param + ' ' + value + '\n'
+      if (value == 0 or value == '0'):
+        param_bsh += '`define ' + param + '_Z 0\n'
 
-    # Don't override build pipeline parameters in order to avoid rebuilding
-    # sources.  We don't want to force recompilation due to the
-    # BUILD_PIPELINE_DEBUG switch change.
-    if self.name == 'build_pipeline':
-      return
-
-    # Make sure string is quoted
-    value = str(value)
-    if is_str:
-      if (value[0] != '"' or value[-1] != '"'):
-        value = '"' + value + '"'
+      param_h += '#undef ' + param + '\n'
+      param_h += '#define ' + param + ' ' + value + '\n'
 
-    print 'Overriding AWB parameter ' + self.name + '.' + param + ': ' + value
+    updateOverrideFile(hw_path, param_bsh)
+    updateOverrideFile(sw_path, param_h)
 
-    param_bsh = open('hw/include/awb/provides/' + self.name + '_params_override.bsh', 'a')
-    param_bsh.write('`undef ' + param + '\n')
-    param_bsh.write('`undef ' + param + '_Z\n')
-    param_bsh.write('`define ' + param + ' ' + value + '\n')
-    if (value == 0 or value == '0'):
-      param_bsh.write('`define ' + param + '_Z 0\n')
-    param_bsh.close()
+    return True
 
-    param_h = open('sw/include/awb/provides/' + self.name + '_params_override.h', 'a')
-    param_h.write('#undef ' + param + '\n')
-    param_h.write('#define ' + param + ' ' + value + '\n')
-    param_h.close()
 
   ## Base object methods
   def __str__(self): return str(self.name)
@@ -286,6 +267,18 @@ class Module(ProjectDependency.ProjectDependency):
   def __hash__(self): return self.name.__hash__()
 
 
+##
+## updateOverrideFile --
+##   Write an override include file, unless it already holds the text.
+##   Files without overrides are links to an empty file, which must be
+##   replaced rather than written through.
+##
+def updateOverrideFile(path, text):
+  if os.path.islink(path):
+    os.unlink(path)
+  Utils.write_if_changed(path, text)
+
+
 ##
 ## initAWBParamParser --
 ##   Perpare for AWB parameter parsing.
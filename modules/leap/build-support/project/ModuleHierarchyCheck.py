@@ -0,0 +1,202 @@
+##
+## Differential check of the incremental module graphs (ModuleHierarchy in
+## ModuleList.py) against graphs rebuilt from the whole module list.
+##
+## Random module trees are inserted into a ModuleList a few modules at a
+## time, parents often after their children, through insertModule().
+## After insertions the module graph and the synthesis boundary graph
+## are compared with graphs built from the module list as graphize() and
+## graphizeSynth() built them before:  nodes, children in order,
+## topological orders, synthesis boundary children and descendents.  Run
+## it from any directory, with SCons and python-graph on the Python path:
+##
+##   python ModuleHierarchyCheck.py [trials] [first seed]
+##
+
+import os
+import imp
+import sys
+import types
+import random
+
+# The sources in this directory form the build's model package
+# (site_scons/model).
+if (not 'model' in sys.modules):
+    sys.modules['model'] = imp.new_module('model')
+    sys.modules['model'].__path__ = [os.path.dirname(os.path.abspath(__file__))]
+
+import pygraph.algorithms.sorting
+
+import model.ModuleList as ModuleList
+import model.Module as Module
+
+
+##
+## rebuiltGraph --
+##   The graph of a module list as graphize() (parentField 'parent') and
+##   graphizeSynth() ('synthParent') built it:  every module against
+##   every other module.
+##
+def rebuiltGraph(modules, parentField):
+    graph = ModuleList.newDigraph()
+    graph.add_nodes(modules)
+    for module in modules:
+        for child in modules:
+            if (module.name == getattr(child, parentField)):
+                ModuleList.addEdge(graph, module, child)
+    return graph
+
+
+def syntheticModule(name, parent, synthParent, isSynthBoundary):
+    module = Module.Module.__new__(Module.Module)
+    module.name = name
+    module.buildPath = name
+    module.parent = parent
+    module.synthParent = synthParent
+    module.isSynthBoundary = isSynthBoundary
+    module.moduleDependency = {}
+    module.attributes = {}
+    return module
+
+
+def emptyModuleList(modules):
+    moduleList = types.InstanceType(ModuleList.ModuleList)
+    moduleList.dependencyIndex = {}
+    moduleList.descendentIndex = {}
+    moduleList.dependencyGeneration = 0
+    moduleList.topModule = syntheticModule('top', '', '', True)
+    moduleList.moduleList = list(modules)
+    moduleList.modules = {'top': moduleList.topModule}
+    for module in modules:
+        moduleList.modules[module.name] = module
+    return moduleList
+
+
+def graphDescription(graph):
+    return [(id(node), [id(child) for child in graph.neighbors(node)]) for node in graph.nodes()]
+
+
+def ids(modules):
+    return [id(module) for module in modules]
+
+
+##
+## compareGraphs --
+##   Compare the graphs of a module list with rebuilt ones.  Returns the
+##   list of differences found.
+##
+def compareGraphs(moduleList):
+    modules = [moduleList.topModule] + moduleList.moduleList
+    reference = emptyModuleList(moduleList.moduleList)
+    reference.topModule = moduleList.topModule
+    reference.graph = rebuiltGraph(modules, 'parent')
+    reference.graphSynth = rebuiltGraph(filter(ModuleList.checkSynth, modules), 'synthParent')
+
+    differences = []
+    if (graphDescription(reference.graph) != graphDescription(moduleList.graph)):
+        differences.append('module graph')
+    if (graphDescription(reference.graphSynth) != graphDescription(moduleList.graphSynth)):
+        differences.append('synthesis boundary graph')
+    if (ids(pygraph.algorithms.sorting.topological_sorting(reference.graph)) != ids(moduleList.topologicalOrder())):
+        differences.append('topological order')
+
+    # Callers reverse the order they are given in place.
+    moduleList.topologicalOrderSynth().reverse()
+    if (ids(pygraph.algorithms.sorting.topological_sorting(reference.graphSynth)) != ids(moduleList.topologicalOrderSynth())):
+        differences.append('synthesis boundary topological order')
+
+    for module in modules:
+        if (ids(reference.getSynthBoundaryDescendentsHelper(True, module)) != ids(moduleList.getSynthBoundaryDescendents(module))):
+            differences.append('descendents of ' + module.name)
+        if (module.isSynthBoundary and (ids(reference.getSynthBoundaryChildren(module)) != ids(moduleList.getSynthBoundaryChildren(module)))):
+            differences.append('synthesis boundary children of ' + module.name)
+    return differences
+
+
+##
+## randomTrial --
+##   Module i names a parent among the top module and modules j < i, so
+##   the hierarchy is acyclic.  Some parents do not exist.  Modules are
+##   inserted in random order, one or a few at a time.
+##
+def randomTrial(seed):
+    rng = random.Random(seed)
+    total = rng.randint(1, 40)
+
+    def randomParent(i):
+        if (rng.random() < 0.05):
+            return 'missing'
+        return rng.choice(['top'] + ['m' + str(j) for j in range(i)])
+
+    modules = [syntheticModule('m' + str(i), randomParent(i), randomParent(i), rng.random() < 0.4)
+               for i in range(total)]
+    rng.shuffle(modules)
+
+    first = rng.randint(0, total)
+    moduleList = emptyModuleList(modules[:first])
+    moduleList.graphize()
+    moduleList.graphizeSynth()
+    differences = compareGraphs(moduleList)
+
+    pending = modules[first:]
+    while (pending and not differences):
+        if (rng.random() < 0.5):
+            moduleList.insertModule(pending.pop(0))
+        else:
+            count = rng.randint(0, 5)
+            moduleList.insertModule(pending[:count])
+            pending = pending[count:]
+        if (rng.random() < 0.3):
+            differences = compareGraphs(moduleList)
+
+    if (not differences):
+        differences = compareGraphs(moduleList)
+    return differences
+
+
+##
+## duplicateNames --
+##   The graphs hold the first module inserted under a name.  Later
+##   modules of the same name are in the module list only.
+##
+def duplicateNames():
+    first = [syntheticModule('a' + str(i), 'top', 'top', True) for i in range(5)]
+    moduleList = emptyModuleList(first)
+    moduleList.graphize()
+    moduleList.graphizeSynth()
+    moduleList.insertModule([syntheticModule('a' + str(i), 'top', 'top', True) for i in range(5)] +
+                            [syntheticModule('b', 'a1', 'a1', True)])
+    moduleList.insertModule(syntheticModule('a2', 'b', 'b', False))
+
+    nodes = dict([(node.name, node) for node in moduleList.graph.nodes()])
+    return ((ids([nodes[module.name] for module in first]) == ids(first)) and
+            ([child.name for child in moduleList.graph.neighbors(first[1])] == ['b']) and
+            (moduleList.graph.neighbors(nodes['b']) == []) and
+            (len(moduleList.topologicalOrderSynth()) == 7))
+
+
+def main(argv):
+    trials = 2000
+    firstSeed = 0
+    if (len(argv) > 1):
+        trials = int(argv[1])
+    if (len(argv) > 2):
+        firstSeed = int(argv[2])
+
+    failures = 0
+    for seed in range(firstSeed, firstSeed + trials):
+        differences = randomTrial(seed)
+        if (differences):
+            failures += 1
+            print 'seed ' + str(seed) + ': ' + ', '.join(differences) + ' differ'
+
+    if (not duplicateNames()):
+        failures += 1
+        print 'duplicate module names: graphs differ'
+
+    print str(trials) + ' trials, ' + str(failures) + ' failures'
+    return (failures != 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -103,6 +103,9 @@ class ModuleList:
     self.apmFile = env['DEFS']['APM_FILE']
     self.moduleList = []
     self.modules = {} # Convenient dictionary
+    self.dependencyIndex = {}
+    self.descendentIndex = {}
+    self.dependencyGeneration = 0
     self.awbParamsObj = AWBParams.AWBParams(self)
     self.isDependsBuild = (CommandLine.getCommandLineTargets(self) == [ 'depends-init' ])
 
@@ -157,6 +160,8 @@ class ModuleList:
     Module.initAWBParamParser(arguments, emit_override_params)
 
     for module in sorted(modulePickle):
+      self.trackDependencies(module)
+
       # Loading module parameters delayed to here in order to support
       # command-line overrides.  Build a dictionary indexed by module name.
       self.awbParamsObj.parseModuleAWBParams(module)
@@ -183,6 +188,8 @@ class ModuleList:
       module.moduleDependency['NGC'] = givenNGCs
       module.moduleDependency['VHD'] = givenVHDs
 
+    self.awbParamsObj.saveSnapshot()
+
     for module in self.synthBoundaries():
       # each module has a generated bsv
       module.moduleDependency['VERILOG'] = ['hw/' + module.buildPath + '/.bsc/' + module.wrapperName() + '.v'] + givenVerilogs
@@ -231,7 +238,7 @@ class ModuleList:
     # set up build target for various views of the AWB Parameters.
     def parameter_tcl_closure(moduleList, paramTclFile):
          def parameter_tcl(target, source, env):
-             self.awbParamsObj.emitParametersTCL(paramTclFile)
+             self.awbParamsObj.emitParametersTCLDict(paramTclFile)
          return parameter_tcl
 
     paramTclFile = self.compileDirectory + '/params.xdc'
@@ -244,6 +251,10 @@ class ModuleList:
         parameter_tcl_closure(self, paramTclFile)
         )                             
 
+    # The emitter leaves an unchanged file alone.  Keep SCons from
+    # removing it first.
+    self.env.Precious(paramTclFile)
+
 
   def getAWBModule(self, moduleName):
       return self.modules[moduleName]
@@ -254,26 +265,72 @@ class ModuleList:
   def getAWBParamSafe(self, moduleName, param):
       return self.awbParamsObj.getAWBParamSafe(moduleName, param)
 
+  def findAWBParam(self, param):
+      return self.awbParamsObj.findAWBParam(param)
+
+  def getAWBParamInt(self, moduleName, param):
+      return self.awbParamsObj.getAWBParamInt(moduleName, param)
+
+  def getAWBParamBool(self, moduleName, param):
+      return self.awbParamsObj.getAWBParamBool(moduleName, param)
+
+  def getAWBParamString(self, moduleName, param):
+      return self.awbParamsObj.getAWBParamString(moduleName, param)
+
+  def getAWBParamList(self, moduleName, param):
+      return self.awbParamsObj.getAWBParamList(moduleName, param)
+
+  ##
+  ## Dependency index --
+  ##   The build stages ask the same dependency queries over and over,
+  ##   e.g. every synthesis Tcl script asks for all GIVEN_VIVADO_TCL_*
+  ##   dependencies.  Query results are kept per (query, key, scope) and
+  ##   reused until a module's dependency map changes the key (see
+  ##   ProjectDependency.DependencyMap) or the module list or the module
+  ##   graph changes.  Modules get DependencyMaps when they are loaded or
+  ##   inserted.
+  ##
+  def indexedDependencies(self, query, key, scope, compute):
+      index = (query, key, getattr(scope, 'name', None))
+      version = (self.dependencyGeneration,
+                 ProjectDependency.DependencyMap.versions.get(key, 0))
+      entry = self.dependencyIndex.get(index)
+      # Scopes are indexed by module name.  Make sure it is the same module.
+      if ((entry is None) or (entry[0] != version) or (entry[1] is not scope)):
+          entry = (version, scope, compute())
+          self.dependencyIndex[index] = entry
+      return list(entry[2])
+
+  def invalidateDependencyIndex(self):
+      self.dependencyGeneration += 1
+      self.dependencyIndex = {}
+      self.descendentIndex = {}
+
+  def trackDependencies(self, module):
+      if (not isinstance(module.moduleDependency, ProjectDependency.DependencyMap)):
+          module.moduleDependency = ProjectDependency.DependencyMap(module.moduleDependency)
+
   def getAllDependencies(self, key):
       # we must check to see if the dependencies actually exist.
       # generally we have to make sure to remove duplicates
-      allDeps = [] 
-      if (self.topModule.moduleDependency.has_key(key)):
-          for dep in self.topModule.moduleDependency[key]:
-              if (allDeps.count(dep) == 0):
-                  allDeps.extend(dep if isinstance(dep, list) else [dep])
-      for module in self.moduleList:
-          if (module.moduleDependency.has_key(key)):
-              for dep in module.moduleDependency[key]: 
-                  if (allDeps.count(dep) == 0):
-                      allDeps.extend(dep if isinstance(dep, list) else [dep])
+      def compute():
+          allDeps = ProjectDependency.DependencyList()
+          for module in [self.topModule] + self.moduleList:
+              if (module.moduleDependency.has_key(key)):
+                  for dep in module.moduleDependency[key]:
+                      if (not allDeps.contains(dep)):
+                          allDeps.extend(dep if isinstance(dep, list) else [dep])
+
+          # Return a list of unique entries, in the process converting SCons
+          # dependence entries to strings.
+          return list(set(ProjectDependency.convertDependencies(allDeps.deps)))
+
+      allDeps = self.indexedDependencies('all', key, None, compute)
 
       if (len(allDeps) == 0 and CommandLine.getBuildPipelineDebug(self) > 1):
           sys.stderr.write("Warning: no dependencies were found")
 
-      # Return a list of unique entries, in the process converting SCons
-      # dependence entries to strings.
-      return list(set(ProjectDependency.convertDependencies(allDeps)))
+      return allDeps
 
   def getDependencies(self, module, key):
     allDeps = module.getDependencies(key)
@@ -285,24 +342,30 @@ class ModuleList:
 
 
   def getModuleDependenciesWithPaths(self, module, key):
-    allDeps = [] 
-    if(module.moduleDependency.has_key(key)):
-      for dep in module.moduleDependency[key]: 
-        if(allDeps.count(dep) == 0):
-          allDeps.append(module.buildPath + '/' + dep)
-    return allDeps
+    def compute():
+      allDeps = [] 
+      # Duplicates are checked against the paths already emitted, as
+      # they always have been.
+      paths = set()
+      if(module.moduleDependency.has_key(key)):
+        for dep in module.moduleDependency[key]: 
+          if(not dep in paths):
+            allDeps.append(module.buildPath + '/' + dep)
+            paths.add(allDeps[-1])
+      return allDeps
+
+    return self.indexedDependencies('paths', key, module, compute)
 
   def getAllDependenciesWithPaths(self, key):
     # we must check to see if the dependencies actually exist.
     # generally we have to make sure to remove duplicates
-    allDeps = [] 
-    if(self.topModule.moduleDependency.has_key(key)):
-      for dep in self.topModule.moduleDependency[key]:
-        if(allDeps.count(dep) == 0):
-          allDeps.append(self.topModule.buildPath + '/' + dep)
+    def compute():
+      allDeps = []
+      for module in [self.topModule] + self.moduleList:
+        allDeps += self.getModuleDependenciesWithPaths(module,key)
+      return allDeps
 
-    for module in self.moduleList:
-      allDeps += self.getModuleDependenciesWithPaths(module,key)
+    allDeps = self.indexedDependencies('all paths', key, None, compute)
 
     if(len(allDeps) == 0 and CommandLine.getBuildPipelineDebug(self) > 1):
       sys.stderr.write("Warning: no dependencies were found")
@@ -316,13 +379,16 @@ class ModuleList:
     allDesc = self.getSynthBoundaryDescendents(module)
 
     # grab my deps
-    # use hash to reduce memory usage
-    allDeps = []
-    for desc in allDesc:
-      if(desc.moduleDependency.has_key(key)):
-        for dep in desc.moduleDependency[key]:
-          if(allDeps.count(dep) == 0):
-            allDeps.extend([dep] if isinstance(dep, str) else dep)
+    def compute():
+      allDeps = ProjectDependency.DependencyList()
+      for desc in allDesc:
+        if(desc.moduleDependency.has_key(key)):
+          for dep in desc.moduleDependency[key]:
+            if(not allDeps.contains(dep)):
+              allDeps.extend([dep] if isinstance(dep, str) else dep)
+      return allDeps.deps
+
+    allDeps = self.indexedDependencies('synth', key, module, compute)
 
     if(len(allDeps) == 0 and CommandLine.getBuildPipelineDebug(self) > 1):
       sys.stderr.write("Warning: no dependencies were found")
@@ -336,7 +402,12 @@ class ModuleList:
   # get everyone below this synth boundary
   # this is a recursive call
   def getSynthBoundaryDescendents(self, module):
-    return self.getSynthBoundaryDescendentsHelper(True, module)
+    if(not module.name in self.descendentIndex):
+      self.descendentIndex[module.name] = (module, self.getSynthBoundaryDescendentsHelper(True, module))
+    (indexed, descendents) = self.descendentIndex[module.name]
+    if(indexed is not module):
+      return self.getSynthBoundaryDescendentsHelper(True, module)
+    return list(descendents)
            
   ### FIX ME
   def getSynthBoundaryDescendentsHelper(self, ignoreSynth, module): 
@@ -358,72 +429,34 @@ class ModuleList:
   # original representation of the module tree, which will be helpful in 
   # gathering the sources of various modules.  The second is a tree of synthesis
   # boundaries, helpful, obviously, in actually constructing things.  
-  
-  def graphize(self):
-    try:
-      self.graph = pygraph.digraph()
-    except (NameError, AttributeError):
-      self.graph = digraph()   
+  #
+  # Both are kept as ModuleHierarchy objects (see below), which
+  # graphize() and graphizeSynth() build from the module list and which
+  # insertModule() extends as modules are added.
 
-    modules = [self.topModule] + self.moduleList
-    # first, we must add all the nodes. Only then can we add all the edges
-    self.graph.add_nodes(modules)
-
-    # here we have a strictly directed graph, so we need only insert directed edges
-    for module in modules:
-      def checkParent(child):
-        if module.name == child.parent:
-          return True
-        else:
-          return False
-
-      children = filter(checkParent, modules)
-      for child in children:
-        # due to compatibility issues, we need these try catch to pick the 
-        # right function prototype.
-        try:
-          self.graph.add_edge(module,child) 
-        except TypeError:
-          self.graph.add_edge((module,child)) 
+  def graphize(self):
+    self.invalidateDependencyIndex()
+    self.hierarchy = ModuleHierarchy('parent')
+    self.hierarchy.insert([self.topModule] + self.moduleList)
+    self.graph = self.hierarchy.graph
   # and this concludes the graph build
 
 
   # returns a dependency based topological sort of the source tree 
   def topologicalOrder(self):
-       return pygraph.algorithms.sorting.topological_sorting(self.graph)
+    return self.hierarchy.topologicalOrder()
 
   def graphizeSynth(self):
-    try:
-      self.graphSynth = pygraph.digraph()
-    except (NameError, AttributeError):
-      self.graphSynth = digraph()
-    modulesUnfiltered = [self.topModule] + self.moduleList
-    # first, we must add all the nodes. Only then can we add all the edges
+    self.hierarchySynth = ModuleHierarchy('synthParent')
     # filter by synthesis boundaries
-    modules = filter(checkSynth, modulesUnfiltered)
-    self.graphSynth.add_nodes(modules)
-
-    # here we have a strictly directed graph, so we need only insert directed edges
-    for module in modules:
-      def checkParent(child):
-        if module.name == child.synthParent:
-          return True
-        else:
-          return False
-
-      children = filter(checkParent, modules)
-      for child in children:
-        #print "Adding p: " + module.name + " c: " + child.name
-        try:
-          self.graphSynth.add_edge(module,child) 
-        except TypeError:
-          self.graphSynth.add_edge((module,child)) 
+    self.hierarchySynth.insert(filter(checkSynth, [self.topModule] + self.moduleList))
+    self.graphSynth = self.hierarchySynth.graph
   # and this concludes the graph build
 
 
   ## Returns a dependency based topological sort of the source tree 
   def topologicalOrderSynth(self):
-    return pygraph.algorithms.sorting.topological_sorting(self.graphSynth)
+    return self.hierarchySynth.topologicalOrder()
 
   ## Return all modules that are synthesis boundaries.  This list does
   ## NOT include the top module.
@@ -431,16 +464,25 @@ class ModuleList:
     return filter(checkSynth, self.moduleList)
 
   ## Adds a new module to the module list.  This get used dynamically in the build tree.
+  ## The module graphs are extended with the new modules.
   def insertModule(self, newModule):
+      self.invalidateDependencyIndex()
       if(isinstance(newModule, list)):
           def assignMod(mod):
+             self.trackDependencies(mod)
              self.modules[mod.name] = mod
              return None
           self.moduleList += newModule
           map(assignMod, newModule)
+          newModules = newModule
       else:
+          self.trackDependencies(newModule)
           self.moduleList.append(newModule)
           self.modules[newModule.name] = newModule
+          newModules = [newModule]
+
+      self.hierarchy.insert(newModules)
+      self.hierarchySynth.insert(filter(checkSynth, newModules))
 
 ##
 ## Helper functions
@@ -449,3 +491,80 @@ class ModuleList:
 
 def checkSynth(module):
   return module.isSynthBoundary
+
+def newDigraph():
+  try:
+    return pygraph.digraph()
+  except (NameError, AttributeError):
+    return digraph()
+
+def addEdge(graph, parent, child):
+  # due to compatibility issues, we need these try catch to pick the 
+  # right function prototype.
+  try:
+    graph.add_edge(parent, child) 
+  except TypeError:
+    graph.add_edge((parent, child)) 
+
+##
+## ModuleHierarchy --
+##   A module tree as a pygraph digraph with an edge from each module to
+##   each of its children: the modules naming it (by the attribute
+##   parentField, 'parent' or 'synthParent') as their parent.  A module's
+##   neighbors are its children in the order they were inserted.
+##
+##   Children are looked up by parent name in an index rather than by
+##   scanning all modules, so inserting modules costs time proportional
+##   to the modules inserted and their children.  Inserting the modules
+##   of a list one batch at a time builds the same graph as inserting the
+##   whole list at once.  The topological order is kept until the next
+##   insertion.
+##
+##   Modules compare by name, so the graph holds one module of each name.
+##   Modules named like one already in the graph are not inserted.  The
+##   second pass of the build inserts such modules, standing in for
+##   those of the first pass.
+##
+class ModuleHierarchy():
+
+  def __init__(self, parentField):
+    self.parentField = parentField
+    self.graph = newDigraph()
+    self.nodes = {}      # module name -> module
+    self.children = {}   # module name -> modules naming it as parent
+    self.order = None
+
+  def insert(self, modules):
+    inserted = []
+    for module in modules:
+      if (not module.name in self.nodes):
+        self.nodes[module.name] = module
+        inserted.append(module)
+
+    if (len(inserted) == 0):
+      return
+    self.order = None
+
+    # first, we must add all the nodes. Only then can we add all the edges
+    self.graph.add_nodes(inserted)
+    for module in inserted:
+      self.children.setdefault(getattr(module, self.parentField), []).append(module)
+
+    # Edges to the new modules from parents already in the graph.  New
+    # modules follow all others, so they go at the end of the parents'
+    # child lists.
+    insertedNames = set([module.name for module in inserted])
+    for module in inserted:
+      parentName = getattr(module, self.parentField)
+      if ((parentName in self.nodes) and (not parentName in insertedNames)):
+        addEdge(self.graph, self.nodes[parentName], module)
+
+    # Edges from the new modules to all of their children.
+    for module in inserted:
+      for child in self.children.get(module.name, []):
+        addEdge(self.graph, module, child)
+
+  def topologicalOrder(self):
+    if (self.order is None):
+      self.order = pygraph.algorithms.sorting.topological_sorting(self.graph)
+    return list(self.order)
@@ -0,0 +1,165 @@
+##
+## Benchmark of the ModuleList dependency index at configure time.
+##
+## Synthetic module lists of n modules, about a fifth of them synthesis
+## boundaries, are asked the queries the synthesis stages make for each
+## boundary: the GIVEN_VIVADO_TCL_* and GIVEN_VERILOGS paths, PARAM_TCL,
+## VERILOG_LIB and the boundary's GIVEN_BSVS.  The queries are timed with
+## the index and with the index dropped before every query, which is the
+## cost of answering them without it.  Finally each boundary's
+## VERILOG_LIB list is extended the way BSVUtils does it, through
+## Utils.dictionary_list_create_append(), and the query that follows is
+## timed and checked to see the new entry.
+##
+## Run it from any directory, with SCons and python-graph on the Python
+## path:
+##
+##   python ModuleListBench.py [n ...]
+##
+
+import os
+import imp
+import sys
+import time
+import types
+import random
+import shutil
+import tempfile
+
+# The sources in this directory form the build's model package
+# (site_scons/model).
+if (not 'model' in sys.modules):
+    sys.modules['model'] = imp.new_module('model')
+    sys.modules['model'].__path__ = [os.path.dirname(os.path.abspath(__file__))]
+
+import model.ModuleList as ModuleList
+import model.Module as Module
+import model.Utils as Utils
+
+TCL_KEYS = ['GIVEN_VIVADO_TCL_DEFINITIONS', 'GIVEN_VIVADO_TCL_SYNTHESISS',
+            'GIVEN_VIVADO_TCL_HEADERS', 'GIVEN_VIVADO_TCL_FUNCTIONS', 'GIVEN_VERILOGS']
+
+# Stop timing the unindexed queries after this many seconds and
+# extrapolate.
+BUDGET = 60.0
+
+
+def syntheticModuleList(n, seed):
+    rng = random.Random(seed)
+    moduleList = types.InstanceType(ModuleList.ModuleList)
+    moduleList.getAWBParam = lambda moduleName, param: 0
+    moduleList.dependencyIndex = {}
+    moduleList.descendentIndex = {}
+    moduleList.dependencyGeneration = 0
+
+    givenVerilogs = ['given' + str(i) + '.v' for i in range(20)]
+    def sources(name):
+        deps = {'VERILOG': givenVerilogs,
+                'GIVEN_BSVS': [name + '_' + str(i) + '.bsv' for i in range(4)],
+                'VERILOG_LIB': ['lib' + str(rng.randrange(50)) + '.v' for i in range(3)],
+                'GIVEN_VERILOGS': ['v' + str(rng.randrange(n)) + '.v' for i in range(2)]}
+        if (rng.random() < 0.05):
+            deps['GIVEN_VIVADO_TCL_DEFINITIONS'] = ['definitions.tcl']
+        return deps
+
+    moduleList.topModule = Module.Module('top', ['top'], 'top', '', [], '', [], sources('top'))
+    moduleList.moduleList = []
+    moduleList.modules = {'top': moduleList.topModule}
+    synthParents = {'top': 'top'}
+    for m in range(n):
+        name = 'm' + str(m)
+        parent = 'top'
+        if (m >= 10):
+            parent = 'm' + str(rng.randrange(m))
+        boundary = []
+        if (rng.random() < 0.2):
+            boundary = [name]
+        module = Module.Module(name, boundary, 'path/' + name, parent, [],
+                               synthParents[parent], [], sources(name))
+        synthParents[name] = synthParents[parent]
+        if (boundary):
+            synthParents[name] = name
+        moduleList.moduleList.append(module)
+        moduleList.modules[name] = module
+
+    for module in [moduleList.topModule] + moduleList.moduleList:
+        moduleList.trackDependencies(module)
+    moduleList.graphize()
+    moduleList.graphizeSynth()
+    return moduleList
+
+
+def boundaryQueries(moduleList, boundary, dropIndex):
+    def query(function, *args):
+        if (dropIndex):
+            moduleList.invalidateDependencyIndex()
+        return function(*args)
+
+    for key in TCL_KEYS:
+        query(moduleList.getAllDependenciesWithPaths, key)
+    query(moduleList.getAllDependencies, 'PARAM_TCL')
+    query(moduleList.getAllDependencies, 'VERILOG_LIB')
+    query(moduleList.getSynthBoundaryDependencies, boundary, 'GIVEN_BSVS')
+
+
+def timeQueries(moduleList, dropIndex):
+    boundaries = moduleList.synthBoundaries()
+    start = time.time()
+    done = 0
+    for boundary in boundaries:
+        boundaryQueries(moduleList, boundary, dropIndex)
+        done += 1
+        if (time.time() - start > BUDGET):
+            break
+    return ((time.time() - start) * len(boundaries) / max(done, 1), done < len(boundaries))
+
+
+def timeUpdates(moduleList):
+    boundaries = moduleList.synthBoundaries()
+    start = time.time()
+    for boundary in boundaries:
+        newLib = boundary.name + '_lib.v'
+        Utils.dictionary_list_create_append(boundary.moduleDependency, 'VERILOG_LIB', newLib)
+        if (not newLib in moduleList.getAllDependencies('VERILOG_LIB')):
+            raise Exception('VERILOG_LIB query missed ' + newLib)
+    return (time.time() - start) / max(len(boundaries), 1)
+
+
+##
+## scratchBuildDirectory --
+##   Enter a new, empty build directory.  Modules write their empty
+##   parameter override files under the current directory.
+##
+def scratchBuildDirectory():
+    workDir = tempfile.mkdtemp()
+    os.chdir(workDir)
+    os.makedirs('hw/include/awb/provides')
+    os.makedirs('sw/include/awb/provides')
+    return workDir
+
+
+def main(argv):
+    sizes = [100, 1000, 10000]
+    if (len(argv) > 1):
+        sizes = [int(n) for n in argv[1:]]
+
+    workDir = scratchBuildDirectory()
+    try:
+        print '%6s %10s %12s %12s %14s' % ('n', 'boundaries', 'indexed', 'unindexed', 'per update')
+        footnote = False
+        for n in sizes:
+            moduleList = syntheticModuleList(n, 1)
+            indexed = timeQueries(moduleList, False)[0]
+            (unindexed, extrapolated) = timeQueries(moduleList, True)
+            updated = timeUpdates(moduleList)
+            print '%6d %10d %11.4fs %11.2fs%s %13.4fs' % (n, len(moduleList.synthBoundaries()), indexed, unindexed,
+                                                         ['', '*'][extrapolated], updated)
+            footnote = footnote or extrapolated
+        if (footnote):
+            print '* extrapolated from the first ' + str(int(BUDGET)) + 's'
+    finally:
+        shutil.rmtree(workDir)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -1,10 +1,15 @@
 # -*-Python-*-
 import SCons.Node
-from compiler.ast import flatten
+import SCons.Node.FS
 
 import Source
 
-class ProjectDependency:
+# Base of the build pipeline objects holding dependencies.  It has no
+# slots of its own, so that subclasses may choose to use slots (Module)
+# or not.
+class ProjectDependency(object):
+
+    __slots__ = ()
 
     def dump(self):
         print "Deps: \n"     
@@ -20,38 +25,130 @@ class ProjectDependency:
         # but this is needed to make the inheritance happy 
         self.moduleDependency = {}
 
-    
+
+# The dependency map of a module (its moduleDependency).  ModuleList
+# caches dependency queries over many modules, so every change to a map
+# bumps a version number kept for the changed key, shared by all maps.
+# Lists held by a map must not be changed in place: store a new list
+# instead (d[key] = d[key] + [dep]), or call touched(key) after the
+# change, for it to be seen.
+class DependencyMap(dict):
+
+    versions = {}
+
+    def touched(self, key):
+        DependencyMap.versions[key] = DependencyMap.versions.get(key, 0) + 1
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self.touched(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.touched(key)
+
+    def update(self, *args, **kwargs):
+        changes = dict(*args, **kwargs)
+        dict.update(self, changes)
+        for key in changes:
+            self.touched(key)
+
+    def setdefault(self, key, value=None):
+        if (not key in self):
+            self[key] = value
+        return self[key]
+
+    def pop(self, key, *default):
+        if (key in self):
+            self.touched(key)
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        (key, value) = dict.popitem(self)
+        self.touched(key)
+        return (key, value)
+
+    def clear(self):
+        for key in self.keys():
+            self.touched(key)
+        dict.clear(self)
+
+
+# An ordered list of dependencies, built up the way the dependency
+# queries always have: a dependency is added only if the list does not
+# already hold an equal entry.  Membership is answered from a set for
+# hashable entries (file names, sources and SCons nodes) instead of by
+# scanning the list, which made gathering dependencies quadratic.
+class DependencyList:
+
+    def __init__(self):
+        self.deps = []
+        self.hashed = set()
+        self.unhashable = []
+
+    def contains(self, dep):
+        try:
+            return dep in self.hashed
+        except TypeError:
+            # Lists of dependencies can only be equal to other lists.
+            return dep in self.unhashable
+
+    def extend(self, deps):
+        for dep in deps:
+            self.deps.append(dep)
+            try:
+                self.hashed.add(dep)
+            except TypeError:
+                self.unhashable.append(dep)
+
+
 
 # This function is used to scrub the project dependency lists into a
 # true list of file names.  It takes in a list of containing a mix of
 # python base types and SCons types and attempts to distill these into
 # a single list of files.
+#
+# Dependency lists nest arbitrarily (e.g. lists of the NodeLists returned
+# by SCons builders), so the walk keeps a stack of the lists still being
+# read instead of recursing.  Entries keep their order.  Strings and
+# Source objects are kept as they are and SCons file nodes become their
+# paths.  A node's path may change while SConscripts are read (e.g. once
+# a builder makes it a target in a variant directory), so paths are only
+# remembered for the duration of one call.
 def convertDependencies(depList):
+    converted = []
+    nodePaths = {}
 
-    # This function deals with nested types. It returns either an
-    # empty list of a list containing a singleton string. Since types
-    # can be recursive, this function is also recursive. 
-    def filterRecursive(depObj):
-        if(isinstance(depObj, list)):
-            return map(filterRecursive, depObj)
-        elif (isinstance(depObj, str)):
-            return [depObj]
-        # is it a source object?
-        elif(isinstance(depObj, Source.Source)):
-            return [depObj]
-        elif (isinstance(depObj, SCons.Node.NodeList)):
-            return map(filterRecursive, depObj)
-        # A precursor to FS.Entry.
-        elif (isinstance(depObj, SCons.Node.FS.Entry)):
-            return [str(depObj)]        
-        elif (isinstance(depObj, SCons.Node.FS.File)):
-            return [str(depObj)]    
+    pending = [iter([depList])]
+    while pending:
+        for depObj in pending[-1]:
+            if (isinstance(depObj, str) or isinstance(depObj, Source.Source)):
+                converted.append(depObj)
+            elif (isinstance(depObj, list)):
+                pending.append(iter(depObj))
+                break
+            elif (isinstance(depObj, SCons.Node.NodeList)):
+                # Walk the UserList's own list, which iterates much faster.
+                pending.append(iter(depObj.data))
+                break
+            # FS.Entry is a precursor to FS.File.
+            elif (isinstance(depObj, SCons.Node.FS.Entry) or isinstance(depObj, SCons.Node.FS.File)):
+                path = nodePaths.get(depObj)
+                if (path is None):
+                    path = str(depObj)
+                    nodePaths[depObj] = path
+                converted.append(path)
+            else:
+                raise UnknownDependency(depObj)
         else:
-            print "I don't know what to do with " + str(depObj) + ' type ' + str(type(depObj))
-            exit(0)        
+            pending.pop()
+
+    return converted
 
 
-    depList = filterRecursive(depList)        
-    depList = flatten(depList)
+class UnknownDependency(Exception):
+    def __init__(self, arg):
+        self.msg = "I don't know what to do with " + str(arg) + ' type ' + str(type(arg))
 
-    return depList
+    def __str__(self):
+        return self.msg
@@ -11,6 +11,8 @@
 
 import os
 import re
+import sys
+import hashlib
 
 ##
 ## Is seekLeaf a leaf file (without suffix) in the list files?
@@ -23,39 +25,86 @@ def findFileFromLeap(seekLeaf, files):
             return fn
     return None
 
+##
+## Index of the files in a list by leaf name (without suffix).  As with
+## findFileFromLeap(), the first file wins when leaf names repeat.
+##
+def leafIndex(files):
+    index = {}
+    for fn in files:
+        base = os.path.splitext(os.path.split(fn)[1])[0]
+        if (not base in index):
+            index[base] = fn
+    return index
+
 ##
 ## Generate a sorted list based on depth first sort so leaves wind up first
 ## in the list.
 ##
+## The walk keeps its own stack, so long import chains don't hit Python's
+## recursion limit.  Import cycles are reported.  The files of a cycle are
+## sorted in the order the walk reaches them, as they always have been.
+##
 def genDepthSortList(fn, sorted, deps, processed):
-    if (not fn in processed):
-        processed[fn] = 1
-        if (fn in deps):
-            for d in deps[fn]:
-                genDepthSortList(d, sorted, deps, processed)
-        sorted += [fn]
+    if (fn in processed):
+        return
+
+    processed[fn] = 1
+    stack = [(fn, iter(deps.get(fn, [])))]
+    active = set([fn])
+    while stack:
+        (cur, pending) = stack[-1]
+        for d in pending:
+            if (not d in processed):
+                processed[d] = 1
+                stack.append((d, iter(deps.get(d, []))))
+                active.add(d)
+                break
+            elif (d in active and d != cur):
+                cycle = [s[0] for s in stack]
+                cycle = cycle[cycle.index(d):] + [d]
+                sys.stderr.write("Warning: package import cycle: " +
+                                 " -> ".join(cycle) + "\n")
+        else:
+            stack.pop()
+            active.remove(cur)
+            sorted += [cur]
+
+
+## Regular expression to find import statements, one per line
+importPattern = re.compile(r'^[^\S\n]*import[^\S\n]+(\w*)::', re.MULTILINE)
+
+## Imported package names by MD5 of the importing file's text.
+importCache = {}
+
+##
+## The packages imported by a file, in order.
+##
+def scanImports(fn):
+    f = open(fn, 'r')
+    text = f.read()
+    f.close()
+
+    key = hashlib.md5(text).digest()
+    if (not key in importCache):
+        importCache[key] = importPattern.findall(text)
+    return importCache[key]
 
 
 def sortPkgList(fNames):
-    ## Regular expression to find import statements
-    p = re.compile(r'\s*import\s+(\w*)::.*')
     deps = {}
     processed = {}
+    index = leafIndex(fNames)
 
     ## Walk through all files and record dependence on all imports
     for fn in fNames:
-        f = open(fn, 'r')
-        for line in f:
-            m = p.match(line)
-            if m:
-                dep = findFileFromLeap(m.group(1), fNames)
-                if dep:
-                    if (fn in deps):
-                        deps[fn] += [dep]
-                    else:
-                        deps[fn] = [dep]
-
-        f.close()
+        for pkg in scanImports(fn):
+            dep = index.get(pkg)
+            if dep:
+                if (fn in deps):
+                    deps[fn] += [dep]
+                else:
+                    deps[fn] = [dep]
 
     sorted = []
     for fn in fNames:
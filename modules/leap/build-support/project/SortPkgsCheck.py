@@ -0,0 +1,215 @@
+##
+## Differential check of SortPkgs.sortPkgList() against the recursive sort
+## it replaced.
+##
+## Random package sets are written to a scratch directory:  files spread
+## over several directories, with repeated leaf names, imports written in
+## the forms found in Bluespec and SystemVerilog sources, imports of
+## packages not in the set and, in some sets, import cycles.  Both sorts
+## must give the same order, on a cold and on a warm import scan cache.
+## The cycle warnings must name real cycles, and appear exactly for the
+## sets that have cycles.  A long import chain checks that the walk does
+## not depend on the recursion limit.  Run it from any directory:
+##
+##   python SortPkgsCheck.py [trials] [first seed]
+##
+
+import os
+import re
+import sys
+import shutil
+import random
+import tempfile
+import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import SortPkgs
+
+IMPORT_FORMS = ['import %s::*;', '  import %s :: *;', '\timport %s::foo;', 'import %s::*; // x',
+                'import  %s::*;\r', '// import %s::*;', 'imported %s::*;', '  \timport\t%s::*;']
+
+
+##
+## recursiveSortPkgList --
+##   sortPkgList() as it was:  a line-by-line scan, a linear search for
+##   each import and a recursive depth-first walk.
+##
+def recursiveSortPkgList(fNames):
+    p = re.compile(r'\s*import\s+(\w*)::.*')
+    deps = {}
+    processed = {}
+
+    def genDepthSortList(fn, sorted):
+        if (not fn in processed):
+            processed[fn] = 1
+            if (fn in deps):
+                for d in deps[fn]:
+                    genDepthSortList(d, sorted)
+            sorted += [fn]
+
+    for fn in fNames:
+        f = open(fn, 'r')
+        for line in f:
+            m = p.match(line)
+            if m:
+                dep = SortPkgs.findFileFromLeap(m.group(1), fNames)
+                if dep:
+                    deps.setdefault(fn, []).append(dep)
+        f.close()
+
+    sorted = []
+    for fn in fNames:
+        genDepthSortList(fn, sorted)
+    return (sorted, deps)
+
+
+def writePackages(directory, seed):
+    rng = random.Random(seed)
+    count = rng.randint(1, 30)
+    cyclic = (rng.random() < 0.4)
+    names = ['pkg' + str(rng.randrange(count + 5)) for i in range(count)]
+
+    files = []
+    for (i, name) in enumerate(names):
+        subdirectory = os.path.join(directory, 'dir' + str(i % 4))
+        if (not os.path.isdir(subdirectory)):
+            os.makedirs(subdirectory)
+        fn = os.path.join(subdirectory, name + rng.choice(['.bsv', '.sv', '.bsh']))
+        if (fn in files):
+            continue
+
+        lines = ['// ' + name, 'package ' + name + ';']
+        for k in range(rng.randint(0, 5)):
+            if (cyclic):
+                imported = rng.choice(names + ['Vector'])
+            else:
+                imported = rng.choice(names[:i] + ['Vector'])
+            lines.append(rng.choice(IMPORT_FORMS) % imported)
+        handle = open(fn, 'w')
+        handle.write('\n'.join(lines) + '\n')
+        handle.close()
+        files.append(fn)
+
+    rng.shuffle(files)
+    return files
+
+
+##
+## hasCycle --
+##   Does a dependence graph, restricted to distinct files, have a cycle?
+##
+def hasCycle(deps):
+    state = {}
+    for start in deps:
+        if (start in state):
+            continue
+        state[start] = 'active'
+        stack = [(start, iter(deps.get(start, [])))]
+        while stack:
+            (fn, pending) = stack[-1]
+            for d in pending:
+                if (d == fn):
+                    continue
+                if (state.get(d) == 'active'):
+                    return True
+                if (not d in state):
+                    state[d] = 'active'
+                    stack.append((d, iter(deps.get(d, []))))
+                    break
+            else:
+                state[fn] = 'done'
+                stack.pop()
+    return False
+
+
+##
+## sortWithWarnings --
+##   sortPkgList() and the cycles it warned about.
+##
+def sortWithWarnings(files):
+    stderr = sys.stderr
+    sys.stderr = StringIO.StringIO()
+    try:
+        order = SortPkgs.sortPkgList(files)
+        warnings = sys.stderr.getvalue()
+    finally:
+        sys.stderr = stderr
+
+    prefix = 'Warning: package import cycle: '
+    cycles = [line[len(prefix):].split(' -> ') for line in warnings.splitlines() if line.startswith(prefix)]
+    return (order, cycles)
+
+
+def checkPackageSet(directory, seed):
+    files = writePackages(directory, seed)
+    (expected, deps) = recursiveSortPkgList(files)
+
+    differences = []
+    SortPkgs.importCache.clear()
+    for cache in ['cold', 'warm']:
+        (order, cycles) = sortWithWarnings(files)
+        if (order != expected):
+            differences.append('order (' + cache + ' cache)')
+
+    for cycle in cycles:
+        if ((len(cycle) < 3) or (cycle[0] != cycle[-1]) or
+            [(a, b) for (a, b) in zip(cycle, cycle[1:]) if not b in deps.get(a, [])]):
+            differences.append('warning of a non-cycle ' + ' -> '.join(cycle))
+    if (hasCycle(deps) != (len(cycles) != 0)):
+        differences.append('cycle warnings')
+    return differences
+
+
+def checkLongChain(directory, length):
+    os.makedirs(directory)
+    files = []
+    for i in range(length):
+        fn = os.path.join(directory, 'chain' + str(i) + '.sv')
+        handle = open(fn, 'w')
+        if (i > 0):
+            handle.write('import chain' + str(i - 1) + '::*;\n')
+        handle.close()
+        files.append(fn)
+    files.reverse()
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(length * 2 + 100)
+    try:
+        expected = recursiveSortPkgList(files)[0]
+    finally:
+        sys.setrecursionlimit(limit)
+    return (SortPkgs.sortPkgList(files) == expected)
+
+
+def main(argv):
+    trials = 1000
+    firstSeed = 0
+    if (len(argv) > 1):
+        trials = int(argv[1])
+    if (len(argv) > 2):
+        firstSeed = int(argv[2])
+
+    workDir = tempfile.mkdtemp()
+    try:
+        failures = 0
+        for seed in range(firstSeed, firstSeed + trials):
+            directory = os.path.join(workDir, str(seed))
+            differences = checkPackageSet(directory, seed)
+            shutil.rmtree(directory)
+            if (differences):
+                failures += 1
+                print 'seed ' + str(seed) + ': ' + ', '.join(differences) + ' differ'
+
+        if (not checkLongChain(os.path.join(workDir, 'chain'), 5000)):
+            failures += 1
+            print 'import chain of 5000 packages: order differs'
+    finally:
+        shutil.rmtree(workDir)
+
+    print str(trials) + ' package sets, ' + str(failures) + ' failures'
+    return (failures != 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -11,16 +11,27 @@ import SCons.Node.FS
 
 import model
 
-class Source():
+##
+## Source --
+##   A file of the build.  Large designs hold many thousands of these, so
+##   sources keep their fields in slots and intern their path strings,
+##   which repeat across modules.  The derived paths are computed once.
+##   The fields are not expected to change after a source is created.
+##
+##   The arguments default to None only so that sources pickled by older
+##   versions of this class still load.
+##
+class Source(object):
 
-    # Cache of path to root
-    __to_root = None
+    __slots__ = ('file', 'attributes', 'buildDir', '_fromRoot', '_fromBld')
 
-    def __init__(self, fileName, attributes):
+    def __init__(self, fileName=None, attributes=None):
         # .file is the path from the top of the build tree
-        self.file = fileName
+        self.file = internPath(fileName)
         self.attributes = attributes 
-        self.buildDir = model.buildDir
+        self.buildDir = internPath(model.buildDir)
+        self._fromRoot = None
+        self._fromBld = None
 
     ## Base object methods
     def __str__(self):
@@ -28,27 +39,48 @@ class Source():
         #print "Converting " + str(self.file) 
         return str(self.file)
 
+    ## Sources are pickled (e.g. in LI graph object code) by their fields.
+    def __getstate__(self):
+        return {'file': self.file,
+                'attributes': self.attributes,
+                'buildDir': self.buildDir}
+
+    def __setstate__(self, state):
+        self.file = internPath(state.get('file'))
+        self.attributes = state.get('attributes')
+        self.buildDir = internPath(state.get('buildDir', ''))
+        self._fromRoot = None
+        self._fromBld = None
+
 
     ## The working directory in pass 1 of SCons compilations is the
     ## sub-directory containing the SConstruct file.  The LIM compiler
     ## uses multiple phases and multiple subdirectories.  Return
     ## the path relative to some pass of the LIM flow.
     def from_bld(self):
-        __to_root = '../' * len(model.buildDir.split(os.path.sep))
+        # The answer depends on the current pass's build directory.
+        if ((self._fromBld is None) or (self._fromBld[0] != model.buildDir)):
+            __to_root = pathToRoot(model.buildDir)
+
+            if (os.path.isabs(str(self.file))):
+                path = str(self.file)
+            elif (__to_root == ''):
+                path = str(self.file)
+            else:
+                path = __to_root + self.from_root()
 
-        if (os.path.isabs(str(self.file))):
-            return str(self.file)
-        elif (__to_root == ''):
-            return str(self.file)
-        else:
-            return __to_root + self.from_root()
+            self._fromBld = (model.buildDir, path)
+
+        return self._fromBld[1]
 
     ## The path from the top of the build tree in the LIM compiler flow.
     def from_root(self):
-        if (self.buildDir == ''):
-            return str(self.file)
-        else:
-            return str(self.buildDir) + '/' + str(self.file)
+        if (self._fromRoot is None):
+            if (self.buildDir == ''):
+                self._fromRoot = str(self.file)
+            else:
+                self._fromRoot = str(self.buildDir) + '/' + str(self.file)
+        return self._fromRoot
 
     def dump(self):
         return 'File: ' + str(self.file) + '\n' + \
@@ -56,6 +88,20 @@ class Source():
                '\tbuildDir:   ' + str(self.buildDir)
 
 
+def internPath(path):
+    if (type(path) is str):
+        return intern(path)
+    return path
+
+# Paths from each pass's build directory to the root of the build tree
+pathsToRoot = {}
+
+def pathToRoot(buildDir):
+    if (not buildDir in pathsToRoot):
+        pathsToRoot[buildDir] = '../' * len(buildDir.split(os.path.sep))
+    return pathsToRoot[buildDir]
+
+
 ##
 ## This function should be replaced by proper descriptions of paths in the
 ## first place.  Given a path it searches for places the path might be found
@@ -95,11 +141,10 @@ def findBuildPath(fileHandle, modulePath):
                                  env['DEFS']['ROOT_DIR_SW'] + '/' + modulePath,
                                  'iface/src/rrr/' + modulePath]
 
-                for p in try_prefixes:
-                    n = p + '/' + file_name
-                    if (os.path.exists(root_dir_path + n)):
-                        file_obj = root_dir.File(n)
-                        break
+                n = buildPathCache.first([p + '/' + file_name for p in try_prefixes],
+                                         root_dir_path)
+                if (n is not None):
+                    file_obj = root_dir.File(n)
 
             if (not file_obj): raise FileNotFound(file_name)
 
@@ -130,3 +175,78 @@ class FileNotFound(Exception):
 
     def __str__(self):
         return repr(self.msg)
+
+
+##
+## BuildPathCache --
+##   findBuildPath() searches a list of directories for files given by
+##   base name.  Testing every candidate with os.path.exists() costs
+##   thousands of stat calls per build, which adds up on NFS workspaces.
+##   The cache instead reads each searched directory once per phase and
+##   answers from the listing.  Callers reset() the cache at the start of
+##   a phase, so the listings are those of the files present when the
+##   phase starts, which are the files its lookups name.  Only a search
+##   that finds no candidate rereads the candidates' directories, to
+##   find files generated after their directory was listed.
+##
+##   Statistics count the candidate paths tested (each a stat call
+##   before) and the directory listings read.
+##
+class BuildPathCache():
+
+    def __init__(self):
+        self.listings = {}
+        self.probes = 0
+        self.reads = 0
+
+    ##
+    ## reset --
+    ##   Forget all listings.  Called at the start of a phase.
+    ##
+    def reset(self):
+        self.listings = {}
+
+    def read(self, directory):
+        self.reads += 1
+        try:
+            self.listings[directory] = frozenset(os.listdir(directory or '.'))
+        except OSError:
+            self.listings[directory] = frozenset()
+
+    def exists(self, path):
+        (directory, name) = os.path.split(path)
+        if (not directory in self.listings):
+            self.read(directory)
+        return name in self.listings[directory]
+
+    ##
+    ## first --
+    ##   Return the first of the candidate paths (relative to root) listed
+    ##   in its directory, or None.  When no candidate is listed, the
+    ##   candidates' directories are read again before giving up.
+    ##
+    def first(self, paths, root=''):
+        found = self.firstListed(paths, root)
+        if (found is None):
+            for directory in set([os.path.dirname(root + path) for path in paths]):
+                self.read(directory)
+            found = self.firstListed(paths, root)
+
+        if (found is None):
+            self.probes += len(paths)
+            return None
+        self.probes += found + 1
+        return paths[found]
+
+    def firstListed(self, paths, root):
+        for (i, path) in enumerate(paths):
+            if (self.exists(root + path)):
+                return i
+        return None
+
+    def report(self):
+        return 'Build path lookups: ' + str(self.probes) + ' candidate paths tested with ' + \
+               str(self.reads) + ' directory listings read'
+
+
+buildPathCache = BuildPathCache()
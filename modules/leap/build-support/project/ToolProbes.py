@@ -0,0 +1,178 @@
+##
+## Tool probes --
+##
+## The build pipeline asks the host's tools about themselves on every
+## SCons invocation:  bsc and gcc versions, awb-resolver settings, uname
+## and the Python used by m5.  Each question costs a subprocess launch.
+##
+## toolProbe() answers a probe (a shell command) from a cache kept in
+## the build directory across invocations.  A cached answer is reused
+## as long as nothing it may depend on has changed:
+##   - the command line,
+##   - the path, size and modification time of the tool binary,
+##   - the values of the environment variables named by the caller,
+##   - the size and modification time of any files named by the caller
+##     (e.g. configuration files the tool reads).
+##
+## Only the standard output of a probe is cached, as os.popen() returned
+## it.  Probes of tools that cannot be found, and checked probes that
+## fail, are not cached.
+##
+## Running SCons with REPROBE=1 (or cleaning) discards the cache.
+##
+
+import os
+import sys
+import subprocess
+import cPickle as pickle
+
+TOOL_PROBE_CACHE = '.tool_probe_cache'
+
+TOOL_PROBE_CACHE_VERSION = 1
+
+
+##
+## ToolProbeCache --
+##   The probe cache of the build directory.  Statistics count the
+##   probes of this invocation answered from the cache (avoided launches)
+##   and those that were run.
+##
+class ToolProbeCache():
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.probes = {}
+        self.hits = 0
+        self.launches = 0
+
+        try:
+            handle = open(fileName, 'rb')
+            cache = pickle.load(handle)
+            handle.close()
+            if (cache['version'] == TOOL_PROBE_CACHE_VERSION):
+                self.probes = cache['probes']
+        except Exception:
+            # No cache yet, or an unreadable one.  Start over.
+            self.probes = {}
+
+    ##
+    ## probe --
+    ##   The output of a shell command.  tool is the binary the command
+    ##   runs, by default the first word of the command.  If check is set
+    ##   a failing command raises subprocess.CalledProcessError, as
+    ##   subprocess.check_output() would.
+    ##
+    def probe(self, cmd, tool=None, envVars=[], files=[], check=False):
+        if (tool is None):
+            tool = cmd.split()[0]
+
+        toolPath = findTool(tool)
+        if (toolPath is None):
+            self.launches += 1
+            return runProbe(cmd, check)
+
+        key = (cmd,
+               (toolPath, fileSignature(toolPath)),
+               tuple([(var, os.environ.get(var)) for var in envVars]),
+               tuple([(f, fileSignature(f)) for f in files]))
+
+        if (key in self.probes):
+            self.hits += 1
+            return self.probes[key]
+
+        self.launches += 1
+        output = runProbe(cmd, check)
+
+        # Keep only the newest answer for each command.
+        for oldKey in [k for k in self.probes if k[0] == cmd]:
+            del self.probes[oldKey]
+        self.probes[key] = output
+        self.save()
+
+        return output
+
+    def save(self):
+        # The cache is only a cache.  Failing to save it is harmless.
+        try:
+            handle = open(self.fileName + '.tmp', 'wb')
+            pickle.dump({'version': TOOL_PROBE_CACHE_VERSION,
+                         'probes': self.probes},
+                        handle, protocol=-1)
+            handle.close()
+            os.rename(self.fileName + '.tmp', self.fileName)
+        except (IOError, OSError):
+            pass
+
+    def invalidate(self):
+        self.probes = {}
+        try:
+            os.unlink(self.fileName)
+        except OSError:
+            pass
+
+    def report(self):
+        return 'Tool probes: ' + str(self.launches) + ' run, ' + \
+               str(self.hits) + ' answered from the cache (subprocess launches avoided)'
+
+
+def runProbe(cmd, check):
+    probe = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
+    output = probe.communicate()[0]
+    if (check and probe.returncode != 0):
+        raise subprocess.CalledProcessError(probe.returncode, cmd, output)
+    return output
+
+
+##
+## findTool --
+##   The path of a tool binary, searching PATH for bare names.  None if
+##   the tool does not exist.
+##
+def findTool(tool):
+    if (os.path.dirname(tool) != ''):
+        if (os.path.isfile(tool)):
+            return os.path.abspath(tool)
+        return None
+
+    for directory in os.environ.get('PATH', '').split(os.pathsep):
+        path = os.path.join(directory, tool)
+        if (os.path.isfile(path) and os.access(path, os.X_OK)):
+            return os.path.abspath(path)
+    return None
+
+
+def fileSignature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime)
+    except OSError:
+        return None
+
+
+probeCache = None
+
+def getToolProbeCache():
+    global probeCache
+    if (probeCache is None):
+        probeCache = ToolProbeCache(TOOL_PROBE_CACHE)
+    return probeCache
+
+##
+## toolProbe --
+##   The output of a probe command, from the cache when possible.  See
+##   ToolProbeCache.probe.
+##
+def toolProbe(cmd, tool=None, envVars=[], files=[], check=False):
+    return getToolProbeCache().probe(cmd, tool, envVars, files, check)
+
+##
+## initToolProbes --
+##   Called once the build's command line is known.  REPROBE=1 and
+##   cleaning discard cached probes.
+##
+def initToolProbes(arguments, clean):
+    if (clean or int(arguments.get('REPROBE', 0))):
+        getToolProbeCache().invalidate()
+
+def toolProbeReport():
+    return getToolProbeCache().report()
@@ -15,6 +15,7 @@ import SCons.Errors
 
 import model
 import Source
+import ToolProbes
 
 ##
 ## clean_split --
@@ -27,6 +28,26 @@ def clean_split(list, sep=':'):
     else:
         return [list]
 
+##
+## write_if_changed --
+##     Write text to a file unless the file already holds it, leaving the
+##     file's timestamp alone.  Returns True if the file was written.
+##
+def write_if_changed(path, text):
+    try:
+        f = open(path, 'r')
+        old_text = f.read()
+        f.close()
+        if (old_text == text):
+            return False
+    except IOError:
+        pass
+
+    f = open(path, 'w')
+    f.write(text)
+    f.close()
+    return True
+
 ##
 ## rebase_directory --
 ##     Rebase directory (d) that is a reference relative to the root build
@@ -75,10 +96,31 @@ def execute(cmd, shell=True):
 
 ##
 ## awb_resolver --
-##     Ask awb-resolver for some info.  Return the first line.
+##     Ask awb-resolver for some info.  Return the first line.  Answers
+##     come from the tool probe cache until the workspace configuration
+##     changes.
 ##
 def awb_resolver(arg):
-    return one_line_cmd("awb-resolver " + arg)
+    output = ToolProbes.toolProbe("awb-resolver " + arg,
+                                  envVars=['AWBLOCAL'],
+                                  files=awb_workspace_config(),
+                                  check=True)
+    return output.split('\n', 1)[0]
+
+##
+## awb_workspace_config --
+##     The workspace configuration file (awb.config) found by searching up
+##     from the current directory, as a list holding zero or one path.
+##
+def awb_workspace_config():
+    d = os.path.abspath(os.curdir)
+    while True:
+        if os.path.isfile(os.path.join(d, 'awb.config')):
+            return [ os.path.join(d, 'awb.config') ]
+        parent = os.path.dirname(d)
+        if (parent == d):
+            return []
+        d = parent
 
 
 ##
@@ -96,15 +138,11 @@ def getGccVersion():
 
     # Read through output of 'gcc --version'
 
-    gcc_ostream = os.popen('gcc --version')
-
-    for ln in gcc_ostream.readlines():
+    for ln in ToolProbes.toolProbe('gcc --version').splitlines(True):
         m = ver_regexp.match(ln)
         if (m):
            gcc_version = int(m.group(1))*10000 + int(m.group(2))*100 + int(m.group(3))
 
-    gcc_ostream.close()
-
     # Fail if we didn't find anything
 
     if gcc_version == 0:
@@ -164,7 +202,9 @@ def rebase_if_not_abspath(path, start=os.curdir, sep=''):
 ##
 def dictionary_list_create_append(dictionary, key, value):
     if (key in dictionary):
-        dictionary[key].append(value)
+        # Store a new list, so that dictionaries tracking changes (module
+        # dependency maps) see the change.
+        dictionary[key] = dictionary[key] + [value]
     else:
         if(isinstance(value,list)):
             dictionary[key] = value